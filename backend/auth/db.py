@@ -0,0 +1,375 @@
+'''Пул соединений с PostgreSQL, который переживает тёплые вызовы функции.
+
+Если задан DATABASE_READ_URL (список строк подключения через запятую),
+GET-запросы читают с реплик: read_pool() выбирает реплику по кругу или с
+наименьшей задержкой (DB_READ_STRATEGY) и пропускает реплики с лагом
+больше DB_REPLICA_MAX_LAG секунд. После записи пользователя его чтения
+DB_STICKY_SECONDS секунд идут в primary: note_write() запоминает
+вызывающего в инстансе (ключ — sessions.caller_key) и отдаёт клиенту
+заголовок X-Last-Write, который клиент возвращает в следующих запросах.
+Соединения реплик открываются только на чтение; checkout() при
+недоступной реплике берёт соединение из primary.
+
+Модуль одинаковый во всех функциях backend/: каждая функция деплоится
+отдельно, поэтому общий код лежит копией рядом с index.py.
+'''
+import json
+import os
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+POOL_LOG_STATS = os.environ.get('DB_POOL_LOG_STATS') == '1'
+READ_STRATEGY = os.environ.get('DB_READ_STRATEGY', 'round_robin')
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', '5'))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', '5'))
+STICKY_SECONDS = float(os.environ.get('DB_STICKY_SECONDS', '10'))
+
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    pass
+
+
+class ConnectionPool:
+    '''Ограниченный пул с проверкой соединения при выдаче.
+
+    Свободное соединение, простоявшее дольше POOL_PING_AFTER секунд,
+    проверяется запросом SELECT 1; разорванные соединения выбрасываются
+    и заменяются новыми. С readonly=True соединения открываются только на
+    чтение (пулы реплик).
+    '''
+
+    def __init__(self, dsn, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT, readonly=False):
+        self.dsn = dsn
+        self.readonly = readonly
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'reconnects': 0,
+            'waits': 0,
+            'wait_ms': 0.0,
+            'connect_ms': 0.0,
+        }
+
+    def getconn(self):
+        '''Свободное соединение проверяется уже после выхода из-под блокировки:
+        медленный SELECT 1 не должен задерживать другие getconn и putconn.'''
+        started = time.monotonic()
+        while True:
+            with self._cond:
+                conn = None
+                while True:
+                    if self._idle:
+                        conn, released_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        raise PoolTimeout('No free database connection in pool')
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+            if conn is None:
+                break
+            healthy = self._is_healthy(conn, released_at)
+            with self._cond:
+                if healthy:
+                    self._stats['hits'] += 1
+                    self._stats['wait_ms'] += (time.monotonic() - started) * 1000
+                    return conn
+                self._discard(conn)
+                self._stats['reconnects'] += 1
+                self._cond.notify()
+
+        connect_started = time.monotonic()
+        try:
+            conn = psycopg2.connect(self.dsn)
+            if self.readonly:
+                conn.set_session(readonly=True)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        now = time.monotonic()
+        with self._cond:
+            self._stats['misses'] += 1
+            self._stats['connect_ms'] += (now - connect_started) * 1000
+            self._stats['wait_ms'] += (connect_started - started) * 1000
+        return conn
+
+    def putconn(self, conn):
+        '''Возвращает соединение в пул, откатив незавершённую транзакцию.'''
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        with self._cond:
+            if conn.closed or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+        return stats
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def _is_healthy(self, conn, released_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < POOL_PING_AFTER:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    '''Лениво создаёт пул уровня модуля; None, если DATABASE_URL не задан.'''
+    global _pool
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        return None
+    if _pool is None or _pool.dsn != dsn:
+        with _pool_lock:
+            if _pool is None or _pool.dsn != dsn:
+                if _pool is not None:
+                    _pool.closeall()
+                _pool = ConnectionPool(dsn)
+    return _pool
+
+
+class Replica:
+    '''Пул реплики с замером лага и сглаженной задержкой запроса проверки.'''
+
+    def __init__(self, dsn):
+        self.pool = ConnectionPool(dsn, readonly=True)
+        self.lag = 0.0
+        self.latency_ms = None
+        self.healthy = True
+        self.checked_at = None
+
+    def check(self):
+        '''Обновляет лаг и задержку не чаще раза в REPLICA_CHECK_INTERVAL секунд.'''
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < REPLICA_CHECK_INTERVAL:
+            return
+        self.checked_at = now
+        try:
+            conn = self.pool.getconn()
+        except psycopg2.Error:
+            self.healthy = False
+            return
+        try:
+            started = time.monotonic()
+            with conn.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                lag = cursor.fetchone()[0]
+            conn.rollback()
+            latency_ms = (time.monotonic() - started) * 1000
+            self.lag = float(lag or 0)
+            self.latency_ms = latency_ms if self.latency_ms is None else 0.8 * self.latency_ms + 0.2 * latency_ms
+            self.healthy = True
+        except psycopg2.Error:
+            self.healthy = False
+        finally:
+            self.pool.putconn(conn)
+
+    def usable(self):
+        self.check()
+        return self.healthy and self.lag <= REPLICA_MAX_LAG
+
+    def mark_down(self):
+        '''Реплика не отдала соединение: не выбирать её до следующей проверки.'''
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+class ReadRouter:
+    '''Выбор реплики для чтения; None — читать из primary.'''
+
+    def __init__(self, dsns, strategy=READ_STRATEGY):
+        self.dsns = dsns
+        self.strategy = strategy
+        self.replicas = [Replica(dsn) for dsn in dsns]
+        self._next = 0
+        self._lock = threading.Lock()
+        self._recent_writers = {}
+        self._stats = {'replica': 0, 'primary_sticky': 0, 'primary_fallback': 0}
+
+    def note_write(self, caller):
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writers[caller] = now + STICKY_SECONDS
+            if len(self._recent_writers) > 10000:
+                self._recent_writers = {k: v for k, v in self._recent_writers.items() if v > now}
+
+    def is_sticky(self, caller, last_write):
+        if last_write and time.time() - last_write < STICKY_SECONDS:
+            return True
+        if caller is None:
+            return False
+        with self._lock:
+            until = self._recent_writers.get(caller)
+        return until is not None and until > time.monotonic()
+
+    def choose(self, caller=None, last_write=None):
+        if self.is_sticky(caller, last_write):
+            self._count('primary_sticky')
+            return None
+        if self.strategy == 'least_latency':
+            candidates = sorted(self.replicas, key=lambda r: r.latency_ms if r.latency_ms is not None else 0)
+        else:
+            with self._lock:
+                start = self._next
+                self._next = (self._next + 1) % len(self.replicas)
+            candidates = self.replicas[start:] + self.replicas[:start]
+        for replica in candidates:
+            if replica.usable():
+                self._count('replica')
+                return replica.pool
+        self._count('primary_fallback')
+        return None
+
+    def fail_over(self, pool):
+        '''Пул реплики не отдал соединение: чтение уходит в primary.'''
+        for replica in self.replicas:
+            if replica.pool is pool:
+                replica.mark_down()
+        self._count('primary_fallback')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['replicas'] = [
+            {'lag': r.lag, 'latency_ms': round(r.latency_ms or 0, 2), 'healthy': r.healthy}
+            for r in self.replicas
+        ]
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+_router = None
+
+
+def get_router():
+    '''Лениво создаёт ReadRouter; None, если DATABASE_READ_URL не задан.'''
+    global _router
+    dsns = [dsn.strip() for dsn in os.environ.get('DATABASE_READ_URL', '').split(',') if dsn.strip()]
+    if not dsns:
+        return None
+    if _router is None or _router.dsns != dsns:
+        with _pool_lock:
+            if _router is None or _router.dsns != dsns:
+                _router = ReadRouter(dsns)
+    return _router
+
+
+def _request_header(event, name):
+    headers = event.get('headers') or {}
+    return headers.get(name) or headers.get(name.lower())
+
+
+def read_pool(event, caller=None):
+    '''Пул для чтения: реплика, если она есть, свежая и вызывающий не писал
+    недавно; иначе primary.'''
+    primary = get_pool()
+    router = get_router()
+    if router is None or primary is None:
+        return primary
+    try:
+        last_write = float(_request_header(event, 'X-Last-Write') or 0)
+    except ValueError:
+        last_write = 0
+    return router.choose(caller, last_write) or primary
+
+
+def checkout(pool):
+    '''Берёт соединение из pool и возвращает (pool, conn). Если реплика не
+    отдала соединение, оно берётся из primary.'''
+    primary = get_pool()
+    if pool is primary:
+        return pool, pool.getconn()
+    try:
+        return pool, pool.getconn()
+    except psycopg2.Error:
+        router = get_router()
+        if router is not None:
+            router.fail_over(pool)
+        return primary, primary.getconn()
+
+
+def on_primary(fn):
+    '''Выполняет fn(cursor) отдельным соединением primary, например когда
+    строки ещё нет на реплике.'''
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            return fn(cursor)
+    finally:
+        pool.putconn(conn)
+
+
+def note_write(response, caller):
+    '''После успешной записи закрепляет чтения вызывающего за primary.'''
+    router = get_router()
+    if router is None or response.get('statusCode', 500) >= 400:
+        return response
+    if caller is not None:
+        router.note_write(caller)
+    response.setdefault('headers', {})['X-Last-Write'] = f'{time.time():.3f}'
+    return response
+
+
+def log_stats(pool):
+    if POOL_LOG_STATS:
+        router = get_router()
+        print(json.dumps({'db_pool': pool.stats(), **({'db_read_router': router.stats()} if router else {})}))
@@ -1,56 +1,59 @@
 import json
-import os
 import re
 from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import hashlib
-import secrets
+import db
+import instrumentation
+import passwords
+import presence
+import sessions
+from responses import error_response, finalize, json_response, options_response
 
 def handler(event, context):
     '''API для регистрации и входа пользователей'''
-    
+    trace = instrumentation.start('auth', event)
+    response = dispatch(event)
+    with instrumentation.phase('serialize'):
+        response = finalize(event, response)
+    return instrumentation.finish(trace, response)
+
+def dispatch(event):
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
+        return options_response('GET, POST, OPTIONS')
+    
+    pool = db.get_pool()
+    if not pool:
         return error_response('Database connection not configured', 500)
     
-    conn = psycopg2.connect(dsn)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    with instrumentation.phase('connect'):
+        conn = pool.getconn()
+    cursor = conn.cursor(cursor_factory=instrumentation.TimedCursor)
     
     try:
         body = json.loads(event.get('body', '{}'))
         action = body.get('action')
         
         if action == 'register':
-            return handle_register(cursor, conn, body)
+            return db.note_write(handle_register(cursor, conn, body), None)
         elif action == 'login':
-            return handle_login(cursor, body)
-        elif action == 'check_token':
-            token = event.get('headers', {}).get('X-Auth-Token')
-            return handle_check_token(cursor, token)
+            return db.note_write(handle_login(cursor, conn, body), None)
+        elif action in ('check_token', 'heartbeat'):
+            return handle_check_token(cursor, conn, sessions.token_from_event(event))
+        elif action == 'logout':
+            return handle_logout(cursor, conn, sessions.token_from_event(event))
         else:
             return error_response('Invalid action', 400)
             
+    except passwords.HashingBusy as e:
+        return error_response(str(e), 503)
     except Exception as e:
-        conn.rollback()
         return error_response(str(e), 500)
     finally:
         cursor.close()
-        conn.close()
+        pool.putconn(conn)
+        db.log_stats(pool)
+        sessions.log_stats()
 
 def handle_register(cursor, conn, data):
     phone = data.get('phone', '').strip()
@@ -76,7 +79,7 @@ def handle_register(cursor, conn, data):
     if cursor.fetchone():
         return error_response('Пользователь с таким телефоном или email уже существует', 400)
     
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    password_hash = passwords.hash_password(password)
     
     cursor.execute('''
         INSERT INTO users (phone, email, password_hash, first_name, last_name, birth_date)
@@ -85,81 +88,69 @@ def handle_register(cursor, conn, data):
     ''', (phone, email, password_hash, first_name, last_name, birth_date))
     
     user = cursor.fetchone()
+    token = sessions.create_session(cursor, user['id'])
     conn.commit()
     
-    token = secrets.token_urlsafe(32)
-    
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'user': dict(user),
-            'token': token
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'user': user,
+        'token': token
+    })
 
-def handle_login(cursor, data):
+def handle_login(cursor, conn, data):
     login = data.get('login', '').strip()
     password = data.get('password', '').strip()
     
     if not login or not password:
         return error_response('Введите логин и пароль', 400)
     
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    
     cursor.execute('''
-        SELECT id, phone, email, first_name, last_name, birth_date, avatar_url, media_status, bio
+        SELECT id, phone, email, first_name, last_name, birth_date, avatar_url, media_status, bio, password_hash
         FROM users 
-        WHERE (phone = %s OR email = %s) AND password_hash = %s
-    ''', (login, login, password_hash))
+        WHERE phone = %s OR email = %s
+    ''', (login, login))
     
     user = cursor.fetchone()
     
     if not user:
+        passwords.verify_password(password, passwords.DUMMY_HASH)
         return error_response('Неверный логин или пароль', 401)
+    if not passwords.verify_password(password, user['password_hash']):
+        return error_response('Неверный логин или пароль', 401)
+    
+    stored_hash = user.pop('password_hash')
+    if passwords.needs_rehash(stored_hash):
+        cursor.execute('UPDATE users SET password_hash = %s WHERE id = %s',
+                       (passwords.hash_password(password), user['id']))
+    
+    token = sessions.create_session(cursor, user['id'])
+    conn.commit()
     
-    token = secrets.token_urlsafe(32)
-    
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'user': dict(user),
-            'token': token
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'user': user,
+        'token': token
+    })
 
-def handle_check_token(cursor, token):
+def handle_check_token(cursor, conn, token):
+    '''Проверка токена; заодно heartbeat присутствия (пишется пачкой в presence).'''
     if not token:
         return error_response('Token not provided', 401)
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({'valid': True}),
-        'isBase64Encoded': False
-    }
+    user_id = sessions.resolve(cursor, token)
+    if user_id is None:
+        return error_response('Недействительный токен', 401)
+    
+    presence.heartbeat(user_id)
+    presence.flush_if_due(cursor, conn)
+    
+    return json_response({'valid': True, 'user_id': user_id})
 
-def error_response(message, status_code):
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({'error': message}),
-        'isBase64Encoded': False
-    }
+def handle_logout(cursor, conn, token):
+    if not token:
+        return error_response('Token not provided', 401)
+    
+    sessions.revoke(cursor, token)
+    conn.commit()
+    
+    return json_response({'success': True})
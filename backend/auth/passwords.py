@@ -0,0 +1,87 @@
+'''Хэширование паролей через scrypt с параметрами, сохранёнными в самом хэше.
+
+Формат: scrypt$<n>$<r>$<p>$<соль base64>$<хэш base64>. Старые хэши —
+несолёный sha256 в hex — проверяются как раньше и перехэшируются при входе.
+
+Вычисления идут в ограниченном пуле потоков (hashlib.scrypt отпускает GIL),
+а число ожидающих проверок ограничено, чтобы всплеск входов не занял весь
+инстанс.
+'''
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '8'))
+WAIT_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '5'))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Хэш, с которым сверяется пароль при неизвестном логине: вход стоит
+# столько же scrypt, сколько вход существующего пользователя, и по
+# времени ответа нельзя узнать, зарегистрирован ли логин.
+DUMMY_HASH = 'scrypt${}${}${}${}${}'.format(
+    SCRYPT_N, SCRYPT_R, SCRYPT_P,
+    base64.b64encode(bytes(SALT_BYTES)).decode(), base64.b64encode(bytes(KEY_BYTES)).decode())
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=KEY_BYTES)
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=WAIT_TIMEOUT):
+        raise HashingBusy('Слишком много одновременных входов, попробуйте позже')
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def _hash(password, n, r, p):
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return 'scrypt${}${}${}${}${}'.format(
+        n, r, p, base64.b64encode(salt).decode(), base64.b64encode(key).decode())
+
+
+def _verify(password, stored):
+    if not stored.startswith('scrypt$'):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+    _, n, r, p, salt, key = stored.split('$')
+    candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, base64.b64decode(key))
+
+
+def hash_password(password, n=None, r=None, p=None):
+    return _run(_hash, password, n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P)
+
+
+def verify_password(password, stored):
+    return _run(_verify, password, stored)
+
+
+def needs_rehash(stored):
+    '''True для sha256-хэшей и scrypt с устаревшими параметрами.'''
+    if not stored.startswith('scrypt$'):
+        return True
+    _, n, r, p, _, _ = stored.split('$')
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
@@ -0,0 +1,148 @@
+'''Присутствие пользователей: last_seen по heartbeat и online по окну.
+
+Флаг users.online больше не пишется: пользователь онлайн, если его
+last_seen не старше PRESENCE_ONLINE_WINDOW секунд. Heartbeat (check_token
+в auth) только кладёт время в буфер инстанса; раз в
+PRESENCE_FLUSH_INTERVAL секунд или при PRESENCE_BUFFER_MAX записях буфер
+сбрасывается одним UPDATE ... FROM (VALUES ...), по строке на
+пользователя, сколько бы раз он ни пинговал.
+
+Для списка друзей last_seen читается через небольшой кэш в памяти
+(PRESENCE_CACHE_TTL, PRESENCE_CACHE_SIZE) и одним запросом на промахи.
+Окно должно быть больше интервала сброса плюс TTL кэша.
+
+Модуль одинаковый в backend/auth и backend/friends.
+'''
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+ONLINE_WINDOW = int(os.environ.get('PRESENCE_ONLINE_WINDOW', '120'))
+FLUSH_INTERVAL = float(os.environ.get('PRESENCE_FLUSH_INTERVAL', '15'))
+BUFFER_MAX = int(os.environ.get('PRESENCE_BUFFER_MAX', '5000'))
+CACHE_TTL = float(os.environ.get('PRESENCE_CACHE_TTL', '15'))
+CACHE_SIZE = int(os.environ.get('PRESENCE_CACHE_SIZE', '20000'))
+
+
+def online_sql(alias='u'):
+    '''SQL-выражение online для строки users с псевдонимом alias.'''
+    return f"COALESCE({alias}.last_seen > now() - interval '{ONLINE_WINDOW} seconds', false)"
+
+
+class HeartbeatBuffer:
+    '''user_id -> время последнего heartbeat (epoch) до ближайшего сброса.'''
+
+    def __init__(self):
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._seen)
+
+    def record(self, user_id, seen=None):
+        with self._lock:
+            self._seen[int(user_id)] = seen or time.time()
+
+    def due(self):
+        with self._lock:
+            return bool(self._seen) and (
+                len(self._seen) >= BUFFER_MAX or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+            )
+
+    def drain(self):
+        with self._lock:
+            seen, self._seen = self._seen, {}
+            self._flushed_at = time.monotonic()
+        return seen
+
+
+class LastSeenCache:
+    '''LRU с TTL: user_id -> last_seen (epoch или None).'''
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+        return found
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+buffer = HeartbeatBuffer()
+cache = LastSeenCache()
+
+
+def heartbeat(user_id):
+    buffer.record(user_id)
+
+
+def flush(cursor):
+    '''Пишет накопленные heartbeat одним UPDATE; возвращает число строк.'''
+    from psycopg2.extras import execute_values
+    seen = buffer.drain()
+    if not seen:
+        return 0
+    execute_values(cursor, '''
+        UPDATE users u
+        SET last_seen = to_timestamp(v.seen)::timestamp
+        FROM (VALUES %s) AS v(id, seen)
+        WHERE u.id = v.id AND (u.last_seen IS NULL OR u.last_seen < to_timestamp(v.seen)::timestamp)
+    ''', list(seen.items()), template='(%s::int, %s::float8)', page_size=len(seen))
+    cache.set_many(seen)
+    return cursor.rowcount
+
+
+def flush_if_due(cursor, conn):
+    if buffer.due():
+        flush(cursor)
+        conn.commit()
+
+
+def attach(cursor, users):
+    '''Проставляет online и last_seen строкам users из кэша и одним запросом на промахи.'''
+    if not users:
+        return
+    ids = [user['id'] for user in users]
+    seen = cache.get_many(ids)
+    missing = [user_id for user_id in ids if user_id not in seen]
+    if missing:
+        cursor.execute('''
+            SELECT id, EXTRACT(EPOCH FROM now() - last_seen) AS idle
+            FROM users
+            WHERE id = ANY(%s)
+        ''', (missing,))
+        now = time.time()
+        loaded = {row['id']: None if row['idle'] is None else now - float(row['idle']) for row in cursor.fetchall()}
+        cache.set_many(loaded)
+        seen.update(loaded)
+    now = time.time()
+    for user in users:
+        last_seen = seen.get(user['id'])
+        user['online'] = last_seen is not None and now - last_seen < ONLINE_WINDOW
+        user['last_seen'] = datetime.fromtimestamp(last_seen, timezone.utc) if last_seen is not None else None
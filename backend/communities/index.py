@@ -0,0 +1,315 @@
+import base64
+import binascii
+import heapq
+import itertools
+import json
+import batch
+import db
+import instrumentation
+import sessions
+from responses import error_response, finalize, json_response, options_response
+from datetime import datetime
+
+def handler(event, context):
+    '''API для сообществ: список, вступление и выход, лента сообщества и лента «мои сообщества»'''
+    trace = instrumentation.start('communities', event)
+    response = dispatch(event)
+    with instrumentation.phase('serialize'):
+        response = finalize(event, response)
+    return instrumentation.finish(trace, response)
+
+def dispatch(event):
+    method = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return options_response('GET, POST, OPTIONS')
+    
+    pool = db.get_pool()
+    if not pool:
+        return error_response('Database not configured', 500)
+    if method == 'GET':
+        params = event.get('queryStringParameters') or {}
+        pool = db.read_pool(event, sessions.caller_key(event, params.get('user_id')))
+    
+    with instrumentation.phase('connect'):
+        pool, conn = db.checkout(pool)
+    cursor = conn.cursor(cursor_factory=instrumentation.TimedCursor)
+    
+    try:
+        if method == 'GET':
+            return get_communities_or_feed(cursor, event)
+        elif method == 'POST':
+            body = json.loads(event.get('body', '{}'))
+            action = body.get('action')
+    
+            try:
+                body['user_id'] = sessions.authenticate(cursor, event, body.get('user_id'))
+            except sessions.AuthError as e:
+                return error_response(str(e), 401)
+    
+            if action == 'batch':
+                response = batch.run(cursor, conn, body, ACTIONS)
+            elif action in ACTIONS:
+                response = ACTIONS[action](cursor, conn, body)
+            else:
+                return error_response('Invalid action', 400)
+            return db.note_write(response, sessions.caller_key(event, body['user_id']))
+        else:
+            return error_response('Method not allowed', 405)
+    
+    except Exception as e:
+        return error_response(str(e), 500)
+    finally:
+        cursor.close()
+        pool.putconn(conn)
+        db.log_stats(pool)
+        sessions.log_stats()
+
+def get_communities_or_feed(cursor, event):
+    params = event.get('queryStringParameters', {}) or {}
+    limit = int(params.get('limit', 20))
+    
+    after = None
+    if params.get('cursor'):
+        try:
+            after = decode_cursor(params['cursor'])
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+    
+    if params.get('feed') == 'my':
+        try:
+            user_id = sessions.authenticate(cursor, event, params.get('user_id'))
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        if not user_id:
+            return error_response('user_id required', 400)
+        return get_my_feed(cursor, user_id, after, limit)
+    
+    if params.get('community_id'):
+        return get_community_feed(cursor, params['community_id'], after, limit)
+    
+    return list_communities(cursor, params, after, limit)
+
+def encode_cursor(first, row_id):
+    raw = json.dumps([first.isoformat() if isinstance(first, datetime) else first, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    '''Разбирает непрозрачный cursor в пару (created_at или members_count, id)'''
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        first, row_id = json.loads(raw)
+        if isinstance(first, str):
+            first = datetime.fromisoformat(first)
+        return first, int(row_id)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+
+def list_communities(cursor, params, after, limit):
+    '''Сообщества по убыванию числа участников, опционально одной категории.
+    С user_id у каждого сообщества есть флаг is_member.'''
+    args = {'user_id': params.get('user_id'), 'category': params.get('category'), 'limit': limit}
+    
+    seek = ''
+    if after:
+        args['c_count'], args['c_id'] = after
+        seek = 'AND (COALESCE(c.members_count, 0), c.id) < (%(c_count)s, %(c_id)s)'
+    
+    cursor.execute(f'''
+        SELECT c.id, c.name, c.category, c.description, c.avatar_emoji,
+               COALESCE(c.members_count, 0) AS members_count,
+               EXISTS (
+                   SELECT 1 FROM community_members cm
+                   WHERE cm.community_id = c.id AND cm.user_id = %(user_id)s
+               ) AS is_member
+        FROM communities c
+        WHERE (%(category)s::text IS NULL OR c.category = %(category)s) {seek}
+        ORDER BY COALESCE(c.members_count, 0) DESC, c.id DESC
+        LIMIT %(limit)s
+    ''', args)
+    communities = cursor.fetchall()
+    
+    next_cursor = None
+    if communities and len(communities) == limit:
+        next_cursor = encode_cursor(communities[-1]['members_count'], communities[-1]['id'])
+    
+    return json_response({
+        'communities': communities,
+        'next_cursor': next_cursor
+    })
+
+POST_COLUMNS = '''
+    p.*, u.first_name, u.last_name, u.avatar_url,
+    c.name AS community_name, c.avatar_emoji AS community_avatar_emoji
+'''
+
+def feed_response(posts, limit):
+    next_cursor = None
+    if posts and len(posts) == limit:
+        next_cursor = encode_cursor(posts[-1]['created_at'], posts[-1]['id'])
+    
+    return json_response({
+        'posts': posts,
+        'next_cursor': next_cursor
+    })
+
+def get_community_feed(cursor, community_id, after, limit):
+    '''Лента одного сообщества по индексу (community_id, created_at, id).'''
+    seek = 'AND (p.created_at, p.id) < (%(created_at)s, %(post_id)s)' if after else ''
+    cursor.execute(f'''
+        SELECT {POST_COLUMNS}
+        FROM community_posts p
+        JOIN users u ON u.id = p.user_id
+        JOIN communities c ON c.id = p.community_id
+        WHERE p.community_id = %(community_id)s {seek}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %(limit)s
+    ''', {
+        'community_id': community_id,
+        'created_at': after[0] if after else None,
+        'post_id': after[1] if after else None,
+        'limit': limit
+    })
+    
+    return feed_response(cursor.fetchall(), limit)
+
+def get_my_feed(cursor, user_id, after, limit):
+    '''Лента из всех сообществ пользователя.
+
+    Для каждого сообщества берётся не больше limit последних (created_at, id)
+    после cursor — это index-only scan по (community_id, created_at, id).
+    Отсортированные потоки сливаются k-way merge через кучу, которая
+    останавливается на limit элементах, и только посты страницы читаются
+    целиком.'''
+    seek = 'AND (p.created_at, p.id) < (%(created_at)s, %(post_id)s)' if after else ''
+    cursor.execute(f'''
+        SELECT cm.community_id, p.id, p.created_at
+        FROM community_members cm
+        CROSS JOIN LATERAL (
+            SELECT p.id, p.created_at
+            FROM community_posts p
+            WHERE p.community_id = cm.community_id {seek}
+            ORDER BY p.created_at DESC, p.id DESC
+            LIMIT %(limit)s
+        ) p
+        WHERE cm.user_id = %(user_id)s
+        ORDER BY cm.community_id, p.created_at DESC, p.id DESC
+    ''', {
+        'user_id': user_id,
+        'created_at': after[0] if after else None,
+        'post_id': after[1] if after else None,
+        'limit': limit
+    })
+    streams = [list(rows) for _, rows in itertools.groupby(cursor.fetchall(), key=lambda row: row['community_id'])]
+    merged = heapq.merge(*streams, key=lambda row: (row['created_at'], row['id']), reverse=True)
+    ids = [row['id'] for row in itertools.islice(merged, limit)]
+    if not ids:
+        return feed_response([], limit)
+    
+    cursor.execute(f'''
+        SELECT {POST_COLUMNS}
+        FROM community_posts p
+        JOIN users u ON u.id = p.user_id
+        JOIN communities c ON c.id = p.community_id
+        WHERE p.id = ANY(%s)
+    ''', (ids,))
+    by_id = {post['id']: post for post in cursor.fetchall()}
+    
+    return feed_response([by_id[post_id] for post_id in ids if post_id in by_id], limit)
+
+def join_community(cursor, conn, data):
+    '''Вступление и счётчик members_count меняются одним запросом: счётчик
+    растёт, только если строка участника действительно вставлена.'''
+    user_id = data.get('user_id')
+    community_id = data.get('community_id')
+    
+    if not user_id or not community_id:
+        return error_response('user_id и community_id обязательны', 400)
+    
+    cursor.execute('''
+        WITH joined AS (
+            INSERT INTO community_members (community_id, user_id)
+            SELECT id, %(user_id)s FROM communities WHERE id = %(community_id)s
+            ON CONFLICT (community_id, user_id) DO NOTHING
+            RETURNING community_id
+        )
+        UPDATE communities c
+        SET members_count = COALESCE(c.members_count, 0) + (SELECT COUNT(*) FROM joined)
+        WHERE c.id = %(community_id)s
+        RETURNING c.members_count, (SELECT COUNT(*) FROM joined) > 0 AS joined
+    ''', {'user_id': user_id, 'community_id': community_id})
+    result = cursor.fetchone()
+    
+    if not result:
+        conn.rollback()
+        return error_response('Сообщество не найдено', 404)
+    
+    conn.commit()
+    
+    return json_response({'success': True, **result})
+
+def leave_community(cursor, conn, data):
+    user_id = data.get('user_id')
+    community_id = data.get('community_id')
+    
+    if not user_id or not community_id:
+        return error_response('user_id и community_id обязательны', 400)
+    
+    cursor.execute('''
+        WITH removed AS (
+            DELETE FROM community_members
+            WHERE community_id = %(community_id)s AND user_id = %(user_id)s
+            RETURNING community_id
+        )
+        UPDATE communities c
+        SET members_count = GREATEST(COALESCE(c.members_count, 0) - (SELECT COUNT(*) FROM removed), 0)
+        WHERE c.id = %(community_id)s
+        RETURNING c.members_count, (SELECT COUNT(*) FROM removed) > 0 AS was_member
+    ''', {'user_id': user_id, 'community_id': community_id})
+    result = cursor.fetchone()
+    
+    if not result:
+        conn.rollback()
+        return error_response('Сообщество не найдено', 404)
+    
+    conn.commit()
+    
+    return json_response({'success': True, **result})
+
+def create_community_post(cursor, conn, data):
+    '''Пост в сообщество; писать могут только участники.'''
+    user_id = data.get('user_id')
+    community_id = data.get('community_id')
+    content = data.get('content', '').strip()
+    media_urls = data.get('media_urls', [])
+    
+    if not user_id or not community_id or not content:
+        return error_response('user_id, community_id и content обязательны', 400)
+    
+    cursor.execute('''
+        INSERT INTO community_posts (community_id, user_id, content, media_urls)
+        SELECT %(community_id)s, %(user_id)s, %(content)s, %(media_urls)s
+        WHERE EXISTS (
+            SELECT 1 FROM community_members
+            WHERE community_id = %(community_id)s AND user_id = %(user_id)s
+        )
+        RETURNING id, community_id, user_id, content, media_urls, created_at
+    ''', {'community_id': community_id, 'user_id': user_id, 'content': content, 'media_urls': media_urls})
+    post = cursor.fetchone()
+    
+    if not post:
+        conn.rollback()
+        return error_response('Писать могут только участники сообщества', 403)
+    
+    conn.commit()
+    
+    return json_response({
+        'success': True,
+        'post': post
+    })
+
+ACTIONS = {
+    'join': join_community,
+    'leave': leave_community,
+    'post': create_community_post
+}
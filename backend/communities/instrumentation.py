@@ -0,0 +1,130 @@
+'''Замеры времени внутри handler: соединение, SQL-запросы, сериализация.
+
+Доля замеряемых вызовов задаётся INSTRUMENT_SAMPLE_RATE (0..1, по
+умолчанию 0). Для замеренного вызова в лог пишется одна JSON-строка с
+временем по фазам и по каждому запросу, а в ответ добавляется заголовок
+Server-Timing.
+
+Модуль одинаковый во всех функциях backend/.
+'''
+import contextvars
+import json
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from psycopg2.extras import RealDictCursor
+
+SAMPLE_RATE = float(os.environ.get('INSTRUMENT_SAMPLE_RATE', '0'))
+SQL_PREVIEW_CHARS = 160
+
+_current = contextvars.ContextVar('instrumentation_trace', default=None)
+
+
+class Trace:
+    def __init__(self, function, action):
+        self.function = function
+        self.action = action
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = []
+
+    def add_phase(self, name, ms):
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def add_query(self, sql, ms, rows):
+        self.queries.append({'sql': normalize_sql(sql), 'ms': round(ms, 3), 'rows': rows})
+        self.add_phase('db', ms)
+
+    def finish(self, response):
+        total = (time.perf_counter() - self.started) * 1000
+        timings = [f'{name};dur={ms:.2f}' for name, ms in self.phases.items()]
+        timings.append(f'total;dur={total:.2f}')
+        headers = response.setdefault('headers', {})
+        headers['Server-Timing'] = ', '.join(timings)
+        headers['Timing-Allow-Origin'] = '*'
+        print(json.dumps({
+            'function': self.function,
+            'action': self.action,
+            'status': response.get('statusCode'),
+            'total_ms': round(total, 3),
+            **{f'{name}_ms': round(ms, 3) for name, ms in self.phases.items()},
+            'query_count': len(self.queries),
+            'queries': self.queries
+        }, ensure_ascii=False))
+        return response
+
+
+def normalize_sql(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode()
+    return re.sub(r'\s+', ' ', str(sql)).strip()[:SQL_PREVIEW_CHARS]
+
+
+def action_name(event):
+    method = event.get('httpMethod', 'GET')
+    if method == 'POST':
+        try:
+            return f"POST {json.loads(event.get('body') or '{}').get('action')}"
+        except (TypeError, ValueError, AttributeError):
+            return 'POST ?'
+    params = event.get('queryStringParameters') or {}
+    if params.get('since'):
+        return f'{method} since'
+    mode = params.get('view') or params.get('feed') or ('search' if params.get('search') else None)
+    return f'{method} {mode}' if mode else method
+
+
+def start(function, event):
+    '''Начинает замер вызова с вероятностью SAMPLE_RATE; иначе None.'''
+    if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+        _current.set(None)
+        return None
+    trace = Trace(function, action_name(event))
+    _current.set(trace)
+    return trace
+
+
+def finish(trace, response):
+    _current.set(None)
+    if trace is None:
+        return response
+    return trace.finish(response)
+
+
+@contextmanager
+def phase(name):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_phase(name, (time.perf_counter() - started) * 1000)
+
+
+class TimedCursor(RealDictCursor):
+    '''RealDictCursor, который при активном замере записывает каждый запрос.'''
+
+    def execute(self, query, vars=None):
+        trace = _current.get()
+        if trace is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            trace.add_query(query, (time.perf_counter() - started) * 1000, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        trace = _current.get()
+        if trace is None:
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            trace.add_query(query, (time.perf_counter() - started) * 1000, self.rowcount)
@@ -0,0 +1,118 @@
+'''Общий слой ответов: JSON-сериализация, сжатие и ETag.
+
+orjson используется, если установлен, иначе стандартный json; в обоих
+случаях даты отдаются в ISO-формате, а строки RealDictCursor сериализуются
+как есть, без копирования в dict. finalize() вызывается на выходе handler и
+по заголовкам запроса сжимает тело (br/gzip) и отвечает 304 на If-None-Match.
+
+Модуль одинаковый во всех функциях backend/.
+'''
+import base64
+import decimal
+import gzip
+import hashlib
+import json
+import os
+from datetime import date, datetime
+import instrumentation
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*', 'Access-Control-Expose-Headers': 'X-Last-Write'}
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return str(value)
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default).decode()
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def json_response(payload, status_code=200, headers=None):
+    with instrumentation.phase('serialize'):
+        body = dumps(payload)
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            **CORS_HEADERS,
+            **(headers or {})
+        },
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def error_response(message, status_code):
+    return json_response({'error': message}, status_code)
+
+
+def options_response(methods):
+    return {
+        'statusCode': 200,
+        'headers': {
+            **CORS_HEADERS,
+            'Access-Control-Allow-Methods': methods,
+            'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, If-None-Match, X-Last-Write'
+        },
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+
+def _request_header(event, name):
+    headers = event.get('headers') or {}
+    return headers.get(name) or headers.get(name.lower()) or ''
+
+
+def _accepted_encodings(event):
+    return {part.split(';')[0].strip().lower() for part in _request_header(event, 'Accept-Encoding').split(',')}
+
+
+def finalize(event, response):
+    '''Добавляет ETag/304 для успешных GET и сжимает тело по Accept-Encoding.'''
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded') or not body:
+        return response
+    headers = response.setdefault('headers', {})
+
+    if event.get('httpMethod') == 'GET' and response.get('statusCode') == 200:
+        etag = '"{}"'.format(hashlib.sha1(body.encode()).hexdigest())
+        headers['ETag'] = etag
+        if etag in {tag.strip() for tag in _request_header(event, 'If-None-Match').split(',')}:
+            response['statusCode'] = 304
+            response['body'] = ''
+            return response
+
+    raw = body.encode()
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return response
+    encodings = _accepted_encodings(event)
+    if brotli is not None and 'br' in encodings:
+        compressed, encoding = brotli.compress(raw, quality=4), 'br'
+    elif 'gzip' in encodings:
+        compressed, encoding = gzip.compress(raw, compresslevel=5), 'gzip'
+    else:
+        return response
+    headers['Content-Encoding'] = encoding
+    headers['Vary'] = 'Accept-Encoding'
+    response['body'] = base64.b64encode(compressed).decode()
+    response['isBase64Encoded'] = True
+    return response
@@ -0,0 +1,98 @@
+'''Действие batch: несколько под-действий за один вызов на одном соединении.
+
+Режимы:
+- atomic (по умолчанию) — всё в одной транзакции; первая ошибка откатывает
+  пакет целиком;
+- savepoint — каждый элемент в своей точке сохранения; ошибочные элементы
+  откатываются, остальные фиксируются.
+
+Модуль одинаковый в backend/posts, backend/friends, backend/messages и backend/communities.
+'''
+import json
+import os
+from responses import error_response, json_response
+
+MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '100'))
+
+
+class BatchConnection:
+    '''Соединение для под-действий: commit откладывается до конца пакета,
+    rollback откатывает только текущий элемент. В atomic rollback лишь
+    помечает пакет отменённым: действие возвращает свой ответ, а пакет
+    откатывается целиком после него.'''
+
+    def __init__(self, conn, cursor, savepoints):
+        self._conn = conn
+        self._cursor = cursor
+        self._savepoints = savepoints
+        self.aborted = False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        if not self._savepoints:
+            self.aborted = True
+            return
+        self._cursor.execute('ROLLBACK TO SAVEPOINT batch_item')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def run(cursor, conn, data, actions):
+    items = data.get('items')
+    mode = data.get('mode', 'atomic')
+
+    if not isinstance(items, list) or not items:
+        return error_response('items должен быть непустым списком', 400)
+    if len(items) > MAX_ITEMS:
+        return error_response(f'Не больше {MAX_ITEMS} действий в одном batch', 400)
+    if mode not in ('atomic', 'savepoint'):
+        return error_response('mode должен быть atomic или savepoint', 400)
+
+    savepoints = mode == 'savepoint'
+    batch_conn = BatchConnection(conn, cursor, savepoints)
+    results = []
+
+    for index, item in enumerate(items):
+        action = actions.get(item.get('action')) if isinstance(item, dict) else None
+        if action is None:
+            response = error_response('Invalid action', 400)
+        else:
+            item = dict(item)
+            if data.get('user_id'):
+                item['user_id'] = data['user_id']
+            if savepoints:
+                cursor.execute('SAVEPOINT batch_item')
+            try:
+                response = action(cursor, batch_conn, item)
+            except Exception as e:
+                if not savepoints:
+                    raise
+                cursor.execute('ROLLBACK TO SAVEPOINT batch_item')
+                response = error_response(str(e), 500)
+
+        if not savepoints and (batch_conn.aborted or response['statusCode'] >= 400):
+            conn.rollback()
+            failed = response if response['statusCode'] >= 400 else error_response('Действие отменено', 400)
+            return json_response({
+                'success': False,
+                'failed_index': index,
+                'status': failed['statusCode'],
+                'error': json.loads(failed['body']).get('error')
+            }, failed['statusCode'])
+
+        if savepoints:
+            if response['statusCode'] >= 400:
+                cursor.execute('ROLLBACK TO SAVEPOINT batch_item')
+            else:
+                cursor.execute('RELEASE SAVEPOINT batch_item')
+        results.append({'index': index, 'status': response['statusCode'], 'body': json.loads(response['body'])})
+
+    conn.commit()
+
+    return json_response({
+        'success': all(r['status'] < 400 for r in results),
+        'results': results
+    })
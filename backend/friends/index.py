@@ -1,31 +1,40 @@
+import base64
+import binascii
 import json
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import batch
+import db
+import instrumentation
+import presence
+import sessions
+import suggestions
+import sync
+import timeline
+from responses import error_response, finalize, json_response, options_response
 
 def handler(event, context):
     '''API для управления друзьями: поиск, добавление, удаление, запросы'''
-    
+    trace = instrumentation.start('friends', event)
+    response = dispatch(event)
+    with instrumentation.phase('serialize'):
+        response = finalize(event, response)
+    return instrumentation.finish(trace, response)
+
+def dispatch(event):
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
+        return options_response('GET, POST, PUT, DELETE, OPTIONS')
+    
+    pool = db.get_pool()
+    if not pool:
         return error_response('Database not configured', 500)
+    if method == 'GET' and not sync.wants_wait(event):
+        params = event.get('queryStringParameters') or {}
+        pool = db.read_pool(event, sessions.caller_key(event, params.get('user_id')))
     
-    conn = psycopg2.connect(dsn)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    with instrumentation.phase('connect'):
+        pool, conn = db.checkout(pool)
+    cursor = conn.cursor(cursor_factory=instrumentation.TimedCursor)
     
     try:
         if method == 'GET':
@@ -34,25 +43,28 @@ def handler(event, context):
             body = json.loads(event.get('body', '{}'))
             action = body.get('action')
             
-            if action == 'add':
-                return add_friend(cursor, conn, body)
-            elif action == 'accept':
-                return accept_friend(cursor, conn, body)
-            elif action == 'reject':
-                return reject_friend(cursor, conn, body)
-            elif action == 'remove':
-                return remove_friend(cursor, conn, body)
+            try:
+                body['user_id'] = sessions.authenticate(cursor, event, body.get('user_id'))
+            except sessions.AuthError as e:
+                return error_response(str(e), 401)
+            
+            if action == 'batch':
+                response = batch.run(cursor, conn, body, ACTIONS)
+            elif action in ACTIONS:
+                response = ACTIONS[action](cursor, conn, body)
             else:
                 return error_response('Invalid action', 400)
+            return db.note_write(response, sessions.caller_key(event, body['user_id']))
         else:
             return error_response('Method not allowed', 405)
             
     except Exception as e:
-        conn.rollback()
         return error_response(str(e), 500)
     finally:
         cursor.close()
-        conn.close()
+        pool.putconn(conn)
+        db.log_stats(pool)
+        sessions.log_stats()
 
 def get_friends_or_search(cursor, event):
     params = event.get('queryStringParameters', {}) or {}
@@ -60,63 +72,350 @@ def get_friends_or_search(cursor, event):
     search = params.get('search', '').strip()
     
     if search:
-        query = '''
-            SELECT id, phone, email, first_name, last_name, avatar_url, online
-            FROM users
-            WHERE (first_name ILIKE %s OR last_name ILIKE %s OR phone LIKE %s)
-            AND id != %s
-            LIMIT 20
-        '''
-        search_pattern = f'%{search}%'
-        cursor.execute(query, (search_pattern, search_pattern, search_pattern, user_id or 0))
-        users = cursor.fetchall()
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'users': [dict(u) for u in users]
-            }, default=str),
-            'isBase64Encoded': False
-        }
+        try:
+            viewer_id = sessions.authenticate(cursor, event, user_id)
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        return search_users(cursor, search, viewer_id, params)
+    
+    if params.get('view') == 'suggestions':
+        try:
+            viewer_id = sessions.authenticate(cursor, event, user_id)
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        if not viewer_id:
+            return error_response('user_id required', 400)
+        return get_suggestions(cursor, viewer_id, params)
+    
+    if params.get('view') == 'relations':
+        try:
+            viewer_id = sessions.authenticate(cursor, event, user_id)
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        if not viewer_id:
+            return error_response('user_id required', 400)
+        return get_relations(cursor, viewer_id, params)
+    
+    if params.get('since'):
+        try:
+            viewer_id = sessions.authenticate(cursor, event, user_id)
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        if not viewer_id:
+            return error_response('user_id required', 400)
+        return get_changes(cursor, viewer_id, params)
     
     if not user_id:
         return error_response('user_id required', 400)
     
-    query = '''
-        SELECT u.id, u.first_name, u.last_name, u.avatar_url, u.online, f.status
+    if params.get('count_only'):
+        return count_friends(cursor, user_id)
+    
+    return list_friends(cursor, user_id, params)
+
+ACCEPTED_FRIEND_IDS_SQL = '''
+    SELECT friend_id AS id FROM friends WHERE user_id = %(user_id)s AND status = 'accepted'
+    UNION ALL
+    SELECT user_id AS id FROM friends WHERE friend_id = %(user_id)s AND status = 'accepted'
+'''
+
+# Отношение к каждому id из targets: 'self', 'friend', 'request_sent',
+# 'request_received' или 'none', и число общих друзей. Нужны CTE
+# my_friends (ACCEPTED_FRIEND_IDS_SQL) и targets со столбцом id.
+RELATIONS_CTES = '''
+    links AS (
+        SELECT f.friend_id AS id, f.status, 'request_sent' AS pending_relation
         FROM friends f
-        JOIN users u ON (f.friend_id = u.id OR f.user_id = u.id)
-        WHERE (f.user_id = %s OR f.friend_id = %s) AND u.id != %s
-        AND f.status = 'accepted'
+        WHERE f.user_id = %(user_id)s AND f.friend_id IN (SELECT id FROM targets)
+        UNION ALL
+        SELECT f.user_id AS id, f.status, 'request_received' AS pending_relation
+        FROM friends f
+        WHERE f.friend_id = %(user_id)s AND f.user_id IN (SELECT id FROM targets)
+    ),
+    mutual AS (
+        SELECT e.id, COUNT(*) AS mutual_count
+        FROM (
+            SELECT f.user_id AS id, f.friend_id AS via FROM friends f
+            WHERE f.user_id IN (SELECT id FROM targets) AND f.status = 'accepted'
+            UNION ALL
+            SELECT f.friend_id AS id, f.user_id AS via FROM friends f
+            WHERE f.friend_id IN (SELECT id FROM targets) AND f.status = 'accepted'
+        ) e
+        WHERE e.via IN (SELECT id FROM my_friends)
+        GROUP BY e.id
+    ),
+    relations AS (
+        SELECT DISTINCT ON (t.id) t.id,
+               CASE
+                   WHEN t.id = %(user_id)s THEN 'self'
+                   WHEN l.status = 'accepted' THEN 'friend'
+                   WHEN l.status = 'pending' THEN l.pending_relation
+                   ELSE 'none'
+               END AS relation,
+               COALESCE(m.mutual_count, 0) AS mutual_count
+        FROM targets t
+        LEFT JOIN links l ON l.id = t.id
+        LEFT JOIN mutual m ON m.id = t.id
+        ORDER BY t.id, l.status = 'accepted' DESC NULLS LAST
+    )
+'''
+
+SEARCH_CANDIDATES = 500
+MAX_RELATION_IDS = 500
+
+def search_users(cursor, search, user_id, params):
+    '''Поиск людей по префиксу «имя фамилия», похожести (pg_trgm) и телефону.
+
+    Из индекса берутся SEARCH_CANDIDATES самых похожих, затем они
+    ранжируются: друзья, друзья друзей, остальные. Отношение и число общих
+    друзей для страницы считаются в том же запросе.'''
+    limit = int(params.get('limit', 20))
+    term = search.lower()
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    args = {
+        'user_id': int(user_id or 0),
+        'q': term,
+        'prefix': f'{escaped}%',
+        'word_prefix': f'% {escaped}%',
+        'phone': f'%{escaped}%',
+        'pool': SEARCH_CANDIDATES,
+        'limit': limit
+    }
+    
+    seek = ''
+    if params.get('cursor'):
+        try:
+            args['c_degree'], args['c_score'], args['c_id'] = decode_cursor(params['cursor'], (int, float, int))
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+        seek = 'WHERE (degree, -score, id) > (%(c_degree)s, -%(c_score)s::float8, %(c_id)s)'
+    
+    query = f'''
+        WITH my_friends AS ({ACCEPTED_FRIEND_IDS_SQL}),
+        candidates AS (
+            SELECT u.id, u.phone, u.email, u.first_name, u.last_name, u.avatar_url,
+                   {presence.online_sql('u')} AS online,
+                   similarity(u.search_name, %(q)s)::float8 AS score
+            FROM users u
+            WHERE (u.search_name LIKE %(prefix)s OR u.search_name LIKE %(word_prefix)s
+                   OR u.search_name %% %(q)s OR u.phone LIKE %(phone)s)
+            AND u.id != %(user_id)s
+            ORDER BY score DESC, u.id
+            LIMIT %(pool)s
+        ),
+        ranked AS (
+            SELECT c.*,
+                   CASE
+                       WHEN c.id IN (SELECT id FROM my_friends) THEN 0
+                       WHEN EXISTS (
+                           SELECT 1 FROM friends f
+                           WHERE f.user_id = c.id AND f.status = 'accepted'
+                           AND f.friend_id IN (SELECT id FROM my_friends)
+                           UNION ALL
+                           SELECT 1 FROM friends f
+                           WHERE f.friend_id = c.id AND f.status = 'accepted'
+                           AND f.user_id IN (SELECT id FROM my_friends)
+                       ) THEN 1
+                       ELSE 2
+                   END AS degree
+            FROM candidates c
+        ),
+        targets AS (
+            SELECT * FROM ranked
+            {seek}
+            ORDER BY degree, score DESC, id
+            LIMIT %(limit)s
+        ),
+        {RELATIONS_CTES}
+        SELECT t.*, r.relation, r.mutual_count
+        FROM targets t
+        JOIN relations r ON r.id = t.id
+        ORDER BY t.degree, t.score DESC, t.id
     '''
-    cursor.execute(query, (user_id, user_id, user_id))
-    friends = cursor.fetchall()
+    cursor.execute(query, args)
+    users = cursor.fetchall()
     
-    query_requests = '''
-        SELECT u.id, u.first_name, u.last_name, u.avatar_url, f.created_at
-        FROM friends f
-        JOIN users u ON f.user_id = u.id
-        WHERE f.friend_id = %s AND f.status = 'pending'
+    next_cursor = None
+    if users and len(users) == limit:
+        last = users[-1]
+        next_cursor = encode_cursor([last['degree'], last['score'], last['id']])
+    
+    return json_response({
+        'users': users,
+        'next_cursor': next_cursor
+    })
+
+def encode_cursor(values):
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(value, types):
+    '''Разбирает непрозрачный cursor в кортеж значений типов types'''
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError('invalid cursor')
+        return tuple(cast(item) for cast, item in zip(types, values))
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+
+def relations(cursor, user_id, ids):
+    '''Отношение user_id к каждому из ids и число общих друзей одним запросом.'''
+    cursor.execute(f'''
+        WITH my_friends AS ({ACCEPTED_FRIEND_IDS_SQL}),
+        targets AS (SELECT DISTINCT unnest(%(ids)s::int[]) AS id),
+        {RELATIONS_CTES}
+        SELECT id, relation, mutual_count FROM relations
+    ''', {'user_id': user_id, 'ids': list(ids)})
+    return cursor.fetchall()
+
+def get_relations(cursor, user_id, params):
+    '''Пакетный статус отношений для списка ids=1,2,3 (до MAX_RELATION_IDS).'''
+    try:
+        ids = [int(item) for item in params.get('ids', '').split(',') if item.strip()]
+    except ValueError:
+        return error_response('Неверный список ids', 400)
+    
+    if not ids:
+        return error_response('ids required', 400)
+    if len(ids) > MAX_RELATION_IDS:
+        return error_response(f'Не больше {MAX_RELATION_IDS} ids за запрос', 400)
+    
+    return json_response({
+        'relations': relations(cursor, user_id, ids)
+    })
+
+def get_suggestions(cursor, user_id, params):
+    '''«Возможно, вы знакомы»: страница из friend_suggestions, которую
+    пересчитывает suggestions.py; cursor — (score, id) последнего кандидата.'''
+    limit = int(params.get('limit', 20))
+    args = {'user_id': user_id, 'limit': limit}
+    
+    seek = ''
+    if params.get('cursor'):
+        try:
+            args['c_score'], args['c_id'] = decode_cursor(params['cursor'], (int, int))
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+        seek = 'AND (s.score < %(c_score)s OR (s.score = %(c_score)s AND s.candidate_id > %(c_id)s))'
+    
+    cursor.execute(f'''
+        SELECT u.id, u.first_name, u.last_name, u.avatar_url, {presence.online_sql('u')} AS online,
+               s.mutual_count, s.shared_interests, s.score
+        FROM friend_suggestions s
+        JOIN users u ON u.id = s.candidate_id
+        WHERE s.user_id = %(user_id)s {seek}
+        ORDER BY s.score DESC, s.candidate_id
+        LIMIT %(limit)s
+    ''', args)
+    users = cursor.fetchall()
+    
+    next_cursor = None
+    if users and len(users) == limit:
+        next_cursor = encode_cursor([users[-1]['score'], users[-1]['id']])
+    
+    return json_response({
+        'users': users,
+        'next_cursor': next_cursor
+    })
+
+def list_friends(cursor, user_id, params):
+    '''Список друзей по возрастанию id; limit и cursor (id последнего друга)
+    включают постраничную выдачу, без limit возвращается весь список.
+    Входящие заявки отдаются только на первой странице, без cursor.
+    online и last_seen берутся из кэша присутствия.'''
+    limit = int(params['limit']) if params.get('limit') else None
+    try:
+        after_id = int(params.get('cursor') or 0)
+    except ValueError:
+        return error_response('Неверный cursor', 400)
+    
+    query = f'''
+        SELECT u.id, u.first_name, u.last_name, u.avatar_url, 'accepted' AS status
+        FROM ({ACCEPTED_FRIEND_IDS_SQL}) fr
+        JOIN users u ON u.id = fr.id
+        WHERE fr.id > %(after_id)s AND fr.id != %(user_id)s
+        ORDER BY fr.id
+        LIMIT %(limit)s
     '''
-    cursor.execute(query_requests, (user_id,))
-    requests = cursor.fetchall()
-    
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'friends': [dict(f) for f in friends],
-            'requests': [dict(r) for r in requests]
-        }, default=str),
-        'isBase64Encoded': False
+    cursor.execute(query, {'user_id': user_id, 'after_id': after_id, 'limit': limit})
+    friends = cursor.fetchall()
+    presence.attach(cursor, friends)
+    
+    next_cursor = str(friends[-1]['id']) if limit and friends and len(friends) == limit else None
+    result = {
+        'friends': friends,
+        'next_cursor': next_cursor
     }
+    
+    if not after_id:
+        query_requests = '''
+            SELECT u.id, u.first_name, u.last_name, u.avatar_url, f.created_at
+            FROM friends f
+            JOIN users u ON f.user_id = u.id
+            WHERE f.friend_id = %s AND f.status = 'pending'
+            ORDER BY f.created_at DESC
+        '''
+        cursor.execute(query_requests, (user_id,))
+        result['requests'] = cursor.fetchall()
+    
+    return json_response(result)
+
+COUNTS_SQL = f'''
+    SELECT
+        (SELECT COUNT(*) FROM ({ACCEPTED_FRIEND_IDS_SQL}) fr) AS friends_count,
+        (SELECT COUNT(*) FROM friends WHERE friend_id = %(user_id)s AND status = 'pending') AS requests_count
+'''
+
+def count_friends(cursor, user_id):
+    cursor.execute(COUNTS_SQL, {'user_id': user_id})
+    counts = cursor.fetchone()
+    
+    return json_response(counts)
+
+def get_changes(cursor, user_id, params):
+    '''Режим since: входящие заявки после водяного знака (xid, id) из sync и
+    текущие счётчики. С wait ждёт NOTIFY от add_friend, адресованного
+    этому пользователю.'''
+    if params['since'] == 'latest':
+        since = [sync.snapshot_xmin(cursor), 0]
+    else:
+        try:
+            since = sync.decode(params['since'], 2)
+        except ValueError:
+            return error_response('Неверный since', 400)
+    
+    snapshot = {}
+    
+    def fetch():
+        snapshot['xmin'] = sync.snapshot_xmin(cursor)
+        cursor.execute('''
+            SELECT f.id AS request_id, u.id, u.first_name, u.last_name, u.avatar_url, f.created_at,
+                   f.created_xid::text::bigint AS sync_xid, f.id AS sync_id
+            FROM friends f
+            JOIN users u ON f.user_id = u.id
+            WHERE f.friend_id = %s AND f.status = 'pending'
+            AND (f.created_xid, f.id) > (%s::text::xid8, %s)
+            ORDER BY f.created_xid, f.id
+            LIMIT %s
+        ''', (user_id, since[0], since[1], sync.LIMIT))
+        return cursor.fetchall()
+    
+    requests, has_more = [], False
+    if params['since'] != 'latest':
+        requests = sync.poll(cursor.connection, sync.FRIENDS_CHANNEL, sync.wait_seconds(params), fetch,
+                             relevant=lambda payload: payload == str(user_id))
+        since, has_more = sync.advance(since, requests, snapshot['xmin'])
+    
+    cursor.execute(COUNTS_SQL, {'user_id': user_id})
+    
+    return json_response({
+        'requests': requests,
+        'counts': cursor.fetchone(),
+        'since': sync.encode(since),
+        'has_more': has_more
+    })
 
 def add_friend(cursor, conn, data):
     user_id = data.get('user_id')
@@ -125,33 +424,28 @@ def add_friend(cursor, conn, data):
     if not user_id or not friend_id:
         return error_response('user_id и friend_id обязательны', 400)
     
-    cursor.execute('''
-        SELECT id FROM friends 
-        WHERE (user_id = %s AND friend_id = %s) OR (user_id = %s AND friend_id = %s)
-    ''', (user_id, friend_id, friend_id, user_id))
-    
-    if cursor.fetchone():
+    relation = relations(cursor, user_id, [friend_id])[0]['relation']
+    if relation == 'self':
+        return error_response('Нельзя добавить в друзья самого себя', 400)
+    if relation != 'none':
         return error_response('Заявка уже существует', 400)
     
     cursor.execute('''
         INSERT INTO friends (user_id, friend_id, status)
-        VALUES (%s, %s, 'pending')
+        SELECT %s, id, 'pending' FROM users WHERE id = %s
     ''', (user_id, friend_id))
+    if not cursor.rowcount:
+        conn.rollback()
+        return error_response('Пользователь не найден', 404)
     
+    suggestions.forget(cursor, user_id, friend_id)
+    sync.notify(cursor, sync.FRIENDS_CHANNEL, friend_id)
     conn.commit()
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'message': 'Заявка в друзья отправлена'
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'message': 'Заявка в друзья отправлена'
+    })
 
 def accept_friend(cursor, conn, data):
     user_id = data.get('user_id')
@@ -166,20 +460,15 @@ def accept_friend(cursor, conn, data):
         WHERE user_id = %s AND friend_id = %s AND status = 'pending'
     ''', (friend_id, user_id))
     
+    if cursor.rowcount:
+        timeline.backfill(cursor, user_id, friend_id)
+    
     conn.commit()
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'message': 'Заявка принята'
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'message': 'Заявка принята'
+    })
 
 def reject_friend(cursor, conn, data):
     user_id = data.get('user_id')
@@ -195,18 +484,10 @@ def reject_friend(cursor, conn, data):
     
     conn.commit()
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'message': 'Заявка отклонена'
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'message': 'Заявка отклонена'
+    })
 
 def remove_friend(cursor, conn, data):
     user_id = data.get('user_id')
@@ -220,28 +501,17 @@ def remove_friend(cursor, conn, data):
         WHERE (user_id = %s AND friend_id = %s) OR (user_id = %s AND friend_id = %s)
     ''', (user_id, friend_id, friend_id, user_id))
     
+    timeline.prune(cursor, user_id, friend_id)
     conn.commit()
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'message': 'Друг удален'
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'message': 'Друг удален'
+    })
 
-def error_response(message, status_code):
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({'error': message}),
-        'isBase64Encoded': False
-    }
+ACTIONS = {
+    'add': add_friend,
+    'accept': accept_friend,
+    'reject': reject_friend,
+    'remove': remove_friend
+}
@@ -0,0 +1,159 @@
+'''Серверные сессии: токены хранятся в таблице sessions в виде sha256-хэша.
+
+Проверка токена идёт через ограниченный LRU-кэш с TTL, поэтому частые
+токены не ходят в базу. Отзыв токена в этом инстансе сразу чистит кэш, в
+остальных запись живёт не дольше SESSION_CACHE_TTL секунд.
+
+Токен, выданный только что, может ещё не доехать до реплики, поэтому
+промах по токену на соединении реплики перепроверяется в primary.
+
+Модуль одинаковый в backend/auth, backend/communities, backend/friends, backend/messages и backend/posts.
+'''
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+import db
+
+SESSION_TTL_DAYS = int(os.environ.get('SESSION_TTL_DAYS', '30'))
+CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '60'))
+CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+LOG_STATS = os.environ.get('SESSION_CACHE_LOG_STATS') == '1'
+
+
+class AuthError(Exception):
+    pass
+
+
+class TokenCache:
+    '''LRU-кэш token_hash -> (user_id, годен до), ограниченный по размеру.'''
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key, user_id, expires_at):
+        valid_until = min(time.time() + self.ttl, expires_at)
+        with self._lock:
+            self._entries[key] = (user_id, valid_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+cache = TokenCache()
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_from_event(event):
+    headers = event.get('headers') or {}
+    return headers.get('X-Auth-Token') or headers.get('x-auth-token')
+
+
+def create_session(cursor, user_id):
+    '''Создаёт сессию и возвращает токен; коммит остаётся за вызывающим.'''
+    token = secrets.token_urlsafe(32)
+    cursor.execute('''
+        INSERT INTO sessions (user_id, token_hash, expires_at)
+        VALUES (%s, %s, now() + %s * interval '1 day')
+    ''', (user_id, hash_token(token), SESSION_TTL_DAYS))
+    return token
+
+
+def find_session(cursor, key):
+    cursor.execute('''
+        SELECT user_id, EXTRACT(EPOCH FROM expires_at - now()) AS expires_in
+        FROM sessions
+        WHERE token_hash = %s AND expires_at > now()
+    ''', (key,))
+    return cursor.fetchone()
+
+
+def resolve(cursor, token):
+    '''Возвращает user_id по действующему токену или None.'''
+    if not token:
+        return None
+    key = hash_token(token)
+    user_id = cache.get(key)
+    if user_id is not None:
+        return user_id
+    session = find_session(cursor, key)
+    if not session and cursor.connection.readonly:
+        session = db.on_primary(lambda primary: find_session(primary, key))
+    if not session:
+        return None
+    cache.put(key, session['user_id'], time.time() + float(session['expires_in']))
+    return session['user_id']
+
+
+def revoke(cursor, token):
+    key = hash_token(token)
+    cursor.execute('DELETE FROM sessions WHERE token_hash = %s', (key,))
+    cache.discard(key)
+    return cursor.rowcount > 0
+
+
+def caller_key(event, user_id=None):
+    '''Ключ вызывающего для закрепления чтений за primary: хэш токена, а у
+    старых клиентов без токена — переданный user_id.'''
+    token = token_from_event(event)
+    if token:
+        return hash_token(token)
+    return None if user_id is None else f'user:{user_id}'
+
+
+def authenticate(cursor, event, fallback_user_id=None):
+    '''Определяет пользователя запроса по X-Auth-Token.
+
+    Без токена возвращает fallback_user_id (старые клиенты передают user_id
+    в теле), если не включён REQUIRE_AUTH_TOKEN=1.
+    '''
+    token = token_from_event(event)
+    if token:
+        user_id = resolve(cursor, token)
+        if user_id is None:
+            raise AuthError('Недействительный токен')
+        return user_id
+    if os.environ.get('REQUIRE_AUTH_TOKEN') == '1':
+        raise AuthError('Требуется авторизация')
+    return fallback_user_id
+
+
+def log_stats():
+    if LOG_STATS:
+        print(json.dumps({'session_cache': cache.stats()}))
@@ -0,0 +1,186 @@
+'''Рекомендации «возможно, вы знакомы» поверх friends и user_interests.
+
+Офлайн-задача загружает граф принятых дружб в память как CSR: массив
+offsets (начало списка соседей по id пользователя) и массив neighbors с
+отсортированными id соседей, оба — array из целых. Для каждого
+пользователя кандидаты — друзья друзей; число общих друзей получается
+подсчётом кандидатов по спискам соседей его друзей, без запроса на
+пользователя. Интересы хранятся битовой маской на пользователя, общие
+интересы — число единиц в пересечении масок.
+
+score = SUGGESTIONS_MUTUAL_WEIGHT * общие друзья
+        + SUGGESTIONS_INTEREST_WEIGHT * общие интересы.
+
+Лучшие SUGGESTIONS_PER_USER кандидатов пишутся в friend_suggestions
+пачками по диапазонам user_id (DELETE + COPY в одной транзакции), так что
+читатели всегда видят полный список. API отдаёт страницу прямо из этой
+таблицы, а add_friend сразу убирает пару из рекомендаций через forget().
+
+Запуск: DATABASE_URL=... python suggestions.py [--chunk 20000]
+'''
+import heapq
+import io
+import os
+import time
+from array import array
+from collections import Counter
+from itertools import chain
+
+PER_USER = int(os.environ.get('SUGGESTIONS_PER_USER', '50'))
+MUTUAL_WEIGHT = int(os.environ.get('SUGGESTIONS_MUTUAL_WEIGHT', '10'))
+INTEREST_WEIGHT = int(os.environ.get('SUGGESTIONS_INTEREST_WEIGHT', '3'))
+# Друзья с большим числом друзей дают миллионы пар и почти ничего не значат
+HUB_DEGREE = int(os.environ.get('SUGGESTIONS_HUB_DEGREE', '5000'))
+
+
+def forget(cursor, user_id, friend_id):
+    '''Убирает пару из рекомендаций обоих после заявки в друзья.'''
+    cursor.execute('''
+        DELETE FROM friend_suggestions
+        WHERE (user_id = %s AND candidate_id = %s) OR (user_id = %s AND candidate_id = %s)
+    ''', (user_id, friend_id, friend_id, user_id))
+
+
+class Graph:
+    '''Граф принятых дружб в формате CSR.'''
+
+    def __init__(self, offsets, neighbors):
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    @classmethod
+    def load(cls, conn):
+        offsets = array('q', [0])
+        neighbors = array('i')
+        current = 0
+        with conn.cursor(name='suggestions_edges') as cursor:
+            cursor.itersize = 100_000
+            cursor.execute('''
+                SELECT user_id, friend_id FROM friends WHERE status = 'accepted'
+                UNION ALL
+                SELECT friend_id, user_id FROM friends WHERE status = 'accepted'
+                ORDER BY 1, 2
+            ''')
+            for user_id, friend_id in cursor:
+                while current < user_id:
+                    offsets.append(len(neighbors))
+                    current += 1
+                neighbors.append(friend_id)
+        offsets.append(len(neighbors))
+        return cls(offsets, neighbors)
+
+    def friends_of(self, user_id):
+        if user_id + 1 >= len(self.offsets):
+            return self.neighbors[0:0]
+        return self.neighbors[self.offsets[user_id]:self.offsets[user_id + 1]]
+
+    def degree(self, user_id):
+        if user_id + 1 >= len(self.offsets):
+            return 0
+        return self.offsets[user_id + 1] - self.offsets[user_id]
+
+
+def load_pending(conn):
+    '''Незакрытые заявки в обе стороны: таких кандидатов не предлагаем.'''
+    pending = {}
+    with conn.cursor(name='suggestions_pending') as cursor:
+        cursor.itersize = 100_000
+        cursor.execute("SELECT user_id, friend_id FROM friends WHERE status = 'pending'")
+        for user_id, friend_id in cursor:
+            pending.setdefault(user_id, set()).add(friend_id)
+            pending.setdefault(friend_id, set()).add(user_id)
+    return pending
+
+
+def load_interests(conn):
+    '''Битовая маска интересов на пользователя.'''
+    bits, masks = {}, {}
+    with conn.cursor(name='suggestions_interests') as cursor:
+        cursor.itersize = 100_000
+        cursor.execute('SELECT user_id, lower(interest) FROM user_interests')
+        for user_id, interest in cursor:
+            bit = bits.setdefault(interest, 1 << len(bits))
+            masks[user_id] = masks.get(user_id, 0) | bit
+    return masks
+
+
+def candidates(graph, pending, interests, user_id, per_user=PER_USER):
+    '''Лучшие кандидаты пользователя: (score, candidate_id, mutual, shared).'''
+    friends = graph.friends_of(user_id)
+    if not friends:
+        return []
+    counts = Counter(chain.from_iterable(
+        graph.friends_of(friend_id) for friend_id in friends if graph.degree(friend_id) <= HUB_DEGREE
+    ))
+    counts.pop(user_id, None)
+    for friend_id in chain(friends, pending.get(user_id, ())):
+        counts.pop(friend_id, None)
+    mask = interests.get(user_id, 0)
+    scored = []
+    for candidate_id, mutual in counts.items():
+        shared = bin(mask & interests.get(candidate_id, 0)).count('1')
+        scored.append((MUTUAL_WEIGHT * mutual + INTEREST_WEIGHT * shared, -candidate_id, mutual, shared))
+    return [(score, -neg_id, mutual, shared) for score, neg_id, mutual, shared in heapq.nlargest(per_user, scored)]
+
+
+def refresh(conn, chunk=20_000, per_user=PER_USER):
+    '''Пересчитывает friend_suggestions для всех пользователей; возвращает статистику.'''
+    started = time.perf_counter()
+    graph = Graph.load(conn)
+    pending = load_pending(conn)
+    interests = load_interests(conn)
+    loaded = time.perf_counter()
+
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users')
+        max_user_id = cursor.fetchone()[0]
+    conn.commit()
+
+    compute_s = write_s = 0.0
+    written = 0
+    for lo in range(1, max_user_id + 1, chunk):
+        hi = min(lo + chunk - 1, max_user_id)
+        step = time.perf_counter()
+        buffer = io.StringIO()
+        for user_id in range(lo, hi + 1):
+            for score, candidate_id, mutual, shared in candidates(graph, pending, interests, user_id, per_user):
+                buffer.write(f'{user_id}\t{candidate_id}\t{mutual}\t{shared}\t{score}\n')
+                written += 1
+        buffer.seek(0)
+        compute_s += time.perf_counter() - step
+
+        step = time.perf_counter()
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM friend_suggestions WHERE user_id BETWEEN %s AND %s', (lo, hi))
+            cursor.copy_expert('''
+                COPY friend_suggestions (user_id, candidate_id, mutual_count, shared_interests, score) FROM STDIN
+            ''', buffer)
+        conn.commit()
+        write_s += time.perf_counter() - step
+
+    return {
+        'users': max_user_id,
+        'edges': len(graph.neighbors) // 2,
+        'suggestions': written,
+        'load_s': round(loaded - started, 2),
+        'compute_s': round(compute_s, 2),
+        'write_s': round(write_s, 2),
+        'graph_mb': round((graph.offsets.itemsize * len(graph.offsets)
+                           + graph.neighbors.itemsize * len(graph.neighbors)) / 2 ** 20, 1),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Пересчёт friend_suggestions')
+    parser.add_argument('--chunk', type=int, default=20_000, help='пользователей в одной транзакции записи')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        print(json.dumps(refresh(conn, args.chunk)))
+    finally:
+        conn.close()
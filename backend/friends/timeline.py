@@ -0,0 +1,164 @@
+'''Материализованная домашняя лента (fan-out-on-write) поверх таблицы timelines.
+
+Включается переменной TIMELINE_MODE=materialized. Новый пост автора
+раскладывается в ленты всех его принятых друзей. Авторы, у которых друзей
+больше TIMELINE_FANOUT_LIMIT, записываются в timeline_pull_authors, и их
+посты подмешиваются при чтении (merge-on-read).
+
+Модуль одинаковый в backend/posts и backend/friends.
+'''
+import os
+
+BACKFILL_POSTS = int(os.environ.get('TIMELINE_BACKFILL_POSTS', '200'))
+
+FRIEND_IDS_SQL = '''
+    SELECT friend_id AS id FROM friends WHERE user_id = %(author_id)s AND status = 'accepted'
+    UNION ALL
+    SELECT user_id AS id FROM friends WHERE friend_id = %(author_id)s AND status = 'accepted'
+'''
+
+
+def enabled():
+    return os.environ.get('TIMELINE_MODE') == 'materialized'
+
+
+def fanout_limit():
+    return int(os.environ.get('TIMELINE_FANOUT_LIMIT', '1000'))
+
+
+def fan_out(cursor, post):
+    '''Кладёт пост в ленты друзей автора или помечает автора для merge-on-read.'''
+    if not enabled():
+        return
+    params = {'author_id': post['user_id'], 'post_id': post['id'], 'created_at': post['created_at'], 'limit': fanout_limit()}
+    cursor.execute(f'SELECT COUNT(*) AS cnt FROM ({FRIEND_IDS_SQL}) fr', params)
+    if cursor.fetchone()['cnt'] > params['limit']:
+        cursor.execute('''
+            INSERT INTO timeline_pull_authors (user_id) VALUES (%(author_id)s)
+            ON CONFLICT (user_id) DO NOTHING
+        ''', params)
+        return
+    cursor.execute(f'''
+        INSERT INTO timelines (user_id, post_id, author_id, created_at)
+        SELECT fr.id, %(post_id)s, %(author_id)s, %(created_at)s
+        FROM ({FRIEND_IDS_SQL}) fr
+        ON CONFLICT (user_id, post_id) DO NOTHING
+    ''', params)
+
+
+def backfill(cursor, user_id, friend_id):
+    '''После принятия заявки добавляет каждому последние посты другого.'''
+    if not enabled():
+        return
+    for reader, author in ((user_id, friend_id), (friend_id, user_id)):
+        cursor.execute('''
+            INSERT INTO timelines (user_id, post_id, author_id, created_at)
+            SELECT %(reader)s, p.id, p.user_id, p.created_at
+            FROM posts p
+            WHERE p.user_id = %(author)s
+            AND NOT EXISTS (SELECT 1 FROM timeline_pull_authors a WHERE a.user_id = %(author)s)
+            ORDER BY p.created_at DESC, p.id DESC
+            LIMIT %(limit)s
+            ON CONFLICT (user_id, post_id) DO NOTHING
+        ''', {'reader': reader, 'author': author, 'limit': BACKFILL_POSTS})
+
+
+def prune(cursor, user_id, friend_id):
+    '''После удаления из друзей убирает посты друг друга из лент.'''
+    if not enabled():
+        return
+    cursor.execute('''
+        DELETE FROM timelines
+        WHERE (user_id = %s AND author_id = %s) OR (user_id = %s AND author_id = %s)
+    ''', (user_id, friend_id, friend_id, user_id))
+
+
+def page_query(seek, columns='p.*, u.first_name, u.last_name, u.avatar_url',
+               authors='JOIN users u ON p.user_id = u.id'):
+    '''SQL страницы ленты: диапазон timelines плюс посты pull-авторов.
+
+    seek — True, если передан cursor; параметры: user_id, created_at,
+    post_id, window, limit, offset. columns и authors задают список
+    столбцов и JOIN с users (при кэше постов выбираются только id).
+    '''
+    timeline_seek = 'AND (t.created_at, t.post_id) < (%(created_at)s, %(post_id)s)' if seek else ''
+    pull_seek = 'AND (p.created_at, p.id) < (%(created_at)s, %(post_id)s)' if seek else ''
+    return f'''
+        SELECT {columns}
+        FROM (
+            (
+                SELECT t.post_id
+                FROM timelines t
+                WHERE t.user_id = %(user_id)s {timeline_seek}
+                ORDER BY t.created_at DESC, t.post_id DESC
+                LIMIT %(window)s
+            )
+            UNION
+            SELECT pp.id
+            FROM (
+                SELECT f.friend_id AS id FROM friends f
+                JOIN timeline_pull_authors a ON a.user_id = f.friend_id
+                WHERE f.user_id = %(user_id)s AND f.status = 'accepted'
+                UNION ALL
+                SELECT f.user_id AS id FROM friends f
+                JOIN timeline_pull_authors a ON a.user_id = f.user_id
+                WHERE f.friend_id = %(user_id)s AND f.status = 'accepted'
+            ) fr
+            CROSS JOIN LATERAL (
+                SELECT p.id
+                FROM posts p
+                WHERE p.user_id = fr.id {pull_seek}
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT %(window)s
+            ) pp
+        ) ids
+        JOIN posts p ON p.id = ids.post_id
+        {authors}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    '''
+
+
+def rebuild(cursor, per_author=BACKFILL_POSTS):
+    '''Полностью пересобирает timelines из friends и posts (первое включение).'''
+    limit = fanout_limit()
+    cursor.execute('TRUNCATE timelines')
+    cursor.execute('TRUNCATE timeline_pull_authors')
+    cursor.execute('''
+        INSERT INTO timeline_pull_authors (user_id)
+        SELECT id FROM (
+            SELECT user_id AS id FROM friends WHERE status = 'accepted'
+            UNION ALL
+            SELECT friend_id AS id FROM friends WHERE status = 'accepted'
+        ) e
+        GROUP BY id
+        HAVING COUNT(*) > %s
+    ''', (limit,))
+    cursor.execute('''
+        INSERT INTO timelines (user_id, post_id, author_id, created_at)
+        SELECT e.reader, p.id, p.user_id, p.created_at
+        FROM (
+            SELECT user_id AS reader, friend_id AS author FROM friends WHERE status = 'accepted'
+            UNION ALL
+            SELECT friend_id AS reader, user_id AS author FROM friends WHERE status = 'accepted'
+        ) e
+        CROSS JOIN LATERAL (
+            SELECT p.id, p.user_id, p.created_at
+            FROM posts p
+            WHERE p.user_id = e.author
+            ORDER BY p.created_at DESC, p.id DESC
+            LIMIT %s
+        ) p
+        WHERE NOT EXISTS (SELECT 1 FROM timeline_pull_authors a WHERE a.user_id = e.author)
+        ON CONFLICT (user_id, post_id) DO NOTHING
+    ''', (per_author,))
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    with conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        rebuild(cursor)
+    conn.close()
@@ -0,0 +1,328 @@
+import base64
+import binascii
+import json
+import batch
+import db
+import instrumentation
+import sessions
+from responses import error_response, finalize, json_response, options_response
+from datetime import datetime
+
+def handler(event, context):
+    '''API для сообщений: список чатов, история, отправка, прочтение'''
+    trace = instrumentation.start('messages', event)
+    response = dispatch(event)
+    with instrumentation.phase('serialize'):
+        response = finalize(event, response)
+    return instrumentation.finish(trace, response)
+
+def dispatch(event):
+    method = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return options_response('GET, POST, OPTIONS')
+    
+    pool = db.get_pool()
+    if not pool:
+        return error_response('Database not configured', 500)
+    if method == 'GET':
+        params = event.get('queryStringParameters') or {}
+        pool = db.read_pool(event, sessions.caller_key(event, params.get('user_id')))
+    
+    with instrumentation.phase('connect'):
+        pool, conn = db.checkout(pool)
+    cursor = conn.cursor(cursor_factory=instrumentation.TimedCursor)
+    
+    try:
+        if method == 'GET':
+            return get_chats_or_history(cursor, event)
+        elif method == 'POST':
+            body = json.loads(event.get('body', '{}'))
+            action = body.get('action')
+    
+            try:
+                body['user_id'] = sessions.authenticate(cursor, event, body.get('user_id'))
+            except sessions.AuthError as e:
+                return error_response(str(e), 401)
+    
+            if action == 'batch':
+                response = batch.run(cursor, conn, body, ACTIONS)
+            elif action in ACTIONS:
+                response = ACTIONS[action](cursor, conn, body)
+            else:
+                return error_response('Invalid action', 400)
+            return db.note_write(response, sessions.caller_key(event, body['user_id']))
+        else:
+            return error_response('Method not allowed', 405)
+    
+    except Exception as e:
+        return error_response(str(e), 500)
+    finally:
+        cursor.close()
+        pool.putconn(conn)
+        db.log_stats(pool)
+        sessions.log_stats()
+
+def get_chats_or_history(cursor, event):
+    params = event.get('queryStringParameters', {}) or {}
+    
+    try:
+        user_id = sessions.authenticate(cursor, event, params.get('user_id'))
+    except sessions.AuthError as e:
+        return error_response(str(e), 401)
+    if not user_id:
+        return error_response('user_id required', 400)
+    
+    if params.get('view') == 'history':
+        return get_history(cursor, user_id, params)
+    
+    return get_inbox(cursor, user_id, params)
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    '''Разбирает непрозрачный cursor в пару (created_at, id)'''
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+
+def get_inbox(cursor, user_id, params):
+    '''Чаты пользователя по последней активности с последним сообщением и
+    числом непрочитанных. Всё берётся из chat_members и chats.last_message_id,
+    поэтому стоимость зависит от limit, а не от числа сообщений.'''
+    limit = int(params.get('limit', 20))
+    args = {'user_id': user_id, 'limit': limit}
+    
+    seek = ''
+    if params.get('cursor'):
+        try:
+            args['c_at'], args['c_id'] = decode_cursor(params['cursor'])
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+        seek = 'AND (cm.last_message_at, cm.chat_id) < (%(c_at)s, %(c_id)s)'
+    
+    cursor.execute(f'''
+        SELECT c.id, c.name, c.is_group, cm.unread_count, cm.last_read_message_id, cm.last_message_at,
+               m.id AS last_message_id, m.sender_id AS last_sender_id,
+               m.content AS last_message, m.created_at AS last_message_created_at,
+               peer.id AS peer_id, peer.first_name AS peer_first_name,
+               peer.last_name AS peer_last_name, peer.avatar_url AS peer_avatar_url
+        FROM chat_members cm
+        JOIN chats c ON c.id = cm.chat_id
+        LEFT JOIN messages m ON m.id = c.last_message_id
+        LEFT JOIN LATERAL (
+            SELECT u.id, u.first_name, u.last_name, u.avatar_url
+            FROM chat_members o
+            JOIN users u ON u.id = o.user_id
+            WHERE o.chat_id = c.id AND o.user_id != cm.user_id AND NOT c.is_group
+            LIMIT 1
+        ) peer ON true
+        WHERE cm.user_id = %(user_id)s {seek}
+        ORDER BY cm.last_message_at DESC, cm.chat_id DESC
+        LIMIT %(limit)s
+    ''', args)
+    chats = cursor.fetchall()
+    
+    next_cursor = None
+    if chats and len(chats) == limit:
+        next_cursor = encode_cursor(chats[-1]['last_message_at'], chats[-1]['id'])
+    
+    return json_response({
+        'chats': chats,
+        'next_cursor': next_cursor
+    })
+
+def get_history(cursor, user_id, params):
+    '''История чата от новых к старым по индексу (chat_id, created_at, id).'''
+    chat_id = params.get('chat_id')
+    if not chat_id:
+        return error_response('chat_id required', 400)
+    
+    limit = int(params.get('limit', 50))
+    args = {'chat_id': chat_id, 'user_id': user_id, 'limit': limit}
+    
+    cursor.execute('''
+        SELECT last_read_message_id, unread_count
+        FROM chat_members
+        WHERE chat_id = %(chat_id)s AND user_id = %(user_id)s
+    ''', args)
+    member = cursor.fetchone()
+    if not member:
+        return error_response('Чат не найден', 404)
+    
+    seek = ''
+    if params.get('cursor'):
+        try:
+            args['c_at'], args['c_id'] = decode_cursor(params['cursor'])
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+        seek = 'AND (m.created_at, m.id) < (%(c_at)s, %(c_id)s)'
+    
+    cursor.execute(f'''
+        SELECT m.id, m.sender_id, m.content, m.created_at
+        FROM messages m
+        WHERE m.chat_id = %(chat_id)s {seek}
+        ORDER BY m.created_at DESC, m.id DESC
+        LIMIT %(limit)s
+    ''', args)
+    messages = cursor.fetchall()
+    
+    next_cursor = None
+    if messages and len(messages) == limit:
+        next_cursor = encode_cursor(messages[-1]['created_at'], messages[-1]['id'])
+    
+    return json_response({
+        'messages': messages,
+        'last_read_message_id': member['last_read_message_id'],
+        'unread_count': member['unread_count'],
+        'next_cursor': next_cursor
+    })
+
+def create_chat(cursor, conn, data):
+    '''Создаёт чат; для личного чата с одним собеседником возвращает уже
+    существующий.'''
+    user_id = data.get('user_id')
+    member_ids = sorted({int(m) for m in data.get('member_ids', [])} - {int(user_id or 0)})
+    is_group = bool(data.get('is_group')) or len(member_ids) > 1
+    
+    if not user_id or not member_ids:
+        return error_response('user_id и member_ids обязательны', 400)
+    
+    cursor.execute('SELECT COUNT(*) AS found FROM users WHERE id = ANY(%s)', (member_ids,))
+    if cursor.fetchone()['found'] != len(member_ids):
+        return error_response('Пользователь не найден', 404)
+    
+    if not is_group:
+        cursor.execute('''
+            SELECT c.id
+            FROM chat_members a
+            JOIN chat_members b ON b.chat_id = a.chat_id AND b.user_id = %s
+            JOIN chats c ON c.id = a.chat_id AND NOT c.is_group
+            WHERE a.user_id = %s
+            LIMIT 1
+        ''', (member_ids[0], user_id))
+        existing = cursor.fetchone()
+        if existing:
+            return json_response({'success': True, 'chat_id': existing['id'], 'created': False})
+    
+    cursor.execute('''
+        WITH chat AS (
+            INSERT INTO chats (name, is_group, created_by)
+            VALUES (%(name)s, %(is_group)s, %(user_id)s)
+            RETURNING id
+        ), members AS (
+            INSERT INTO chat_members (chat_id, user_id)
+            SELECT chat.id, m FROM chat, unnest(%(members)s::int[]) m
+        )
+        SELECT id FROM chat
+    ''', {'name': data.get('name'), 'is_group': is_group, 'user_id': user_id,
+          'members': [int(user_id)] + member_ids})
+    chat_id = cursor.fetchone()['id']
+    conn.commit()
+    
+    return json_response({'success': True, 'chat_id': chat_id, 'created': True})
+
+def send_message(cursor, conn, data):
+    '''Пишет сообщение и в том же запросе двигает chats.last_message_id и
+    счётчики непрочитанных остальных участников.'''
+    user_id = data.get('user_id')
+    chat_id = data.get('chat_id')
+    content = data.get('content', '').strip()
+    
+    if not user_id or not chat_id or not content:
+        return error_response('user_id, chat_id и content обязательны', 400)
+    
+    cursor.execute('''
+        WITH inserted AS (
+            INSERT INTO messages (sender_id, chat_id, content)
+            SELECT %(user_id)s, %(chat_id)s, %(content)s
+            WHERE EXISTS (
+                SELECT 1 FROM chat_members WHERE chat_id = %(chat_id)s AND user_id = %(user_id)s
+            )
+            RETURNING id, sender_id, chat_id, content, created_at
+        ), chat AS (
+            UPDATE chats c
+            SET last_message_id = GREATEST(COALESCE(c.last_message_id, 0), inserted.id)
+            FROM inserted
+            WHERE c.id = inserted.chat_id
+        ), members AS (
+            UPDATE chat_members cm
+            SET last_message_at = GREATEST(cm.last_message_at, inserted.created_at),
+                unread_count = cm.unread_count + CASE WHEN cm.user_id = inserted.sender_id THEN 0 ELSE 1 END,
+                last_read_message_id = CASE
+                    WHEN cm.user_id = inserted.sender_id THEN GREATEST(cm.last_read_message_id, inserted.id)
+                    ELSE cm.last_read_message_id
+                END
+            FROM inserted
+            WHERE cm.chat_id = inserted.chat_id
+        )
+        SELECT * FROM inserted
+    ''', {'user_id': user_id, 'chat_id': chat_id, 'content': content})
+    message = cursor.fetchone()
+    if not message:
+        conn.rollback()
+        return error_response('Чат не найден', 404)
+    conn.commit()
+    
+    return json_response({'success': True, 'message': message})
+
+def mark_read(cursor, conn, data):
+    '''Отмечает прочитанным всё до up_to_message_id (по умолчанию до
+    последнего сообщения чата) одним UPDATE участника. Непрочитанные
+    пересчитываются только по сообщениям после отметки. Строка участника
+    сначала блокируется: send_message тоже обновляет её, поэтому пересчёт
+    идёт уже после его коммита и видит новое сообщение.'''
+    user_id = data.get('user_id')
+    chat_id = data.get('chat_id')
+    
+    if not user_id or not chat_id:
+        return error_response('user_id и chat_id обязательны', 400)
+    
+    cursor.execute('''
+        SELECT 1 FROM chat_members
+        WHERE chat_id = %s AND user_id = %s
+        FOR UPDATE
+    ''', (chat_id, user_id))
+    if not cursor.fetchone():
+        conn.rollback()
+        return error_response('Чат не найден', 404)
+    
+    cursor.execute('''
+        WITH target AS (
+            SELECT m.id, m.created_at
+            FROM messages m
+            WHERE m.chat_id = %(chat_id)s
+            AND m.id = COALESCE(%(up_to)s, (SELECT last_message_id FROM chats WHERE id = %(chat_id)s))
+        )
+        UPDATE chat_members cm
+        SET last_read_message_id = t.id,
+            unread_count = (
+                SELECT COUNT(*) FROM messages m
+                WHERE m.chat_id = cm.chat_id
+                AND (m.created_at, m.id) > (t.created_at, t.id)
+                AND m.sender_id != cm.user_id
+            )
+        FROM target t
+        WHERE cm.chat_id = %(chat_id)s AND cm.user_id = %(user_id)s
+        AND t.id > cm.last_read_message_id
+        RETURNING cm.last_read_message_id, cm.unread_count
+    ''', {'chat_id': chat_id, 'user_id': user_id, 'up_to': data.get('up_to_message_id')})
+    state = cursor.fetchone()
+    conn.commit()
+    
+    return json_response({
+        'success': True,
+        'updated': state is not None,
+        **(state or {})
+    })
+
+ACTIONS = {
+    'create': create_chat,
+    'send': send_message,
+    'read': mark_read
+}
@@ -0,0 +1,179 @@
+'''Read-through кэш постов и карточек авторов для ленты.
+
+POST_CACHE=local — LRU с TTL в памяти инстанса; POST_CACHE=redis — внешний
+кэш по REDIS_URL (нужен пакет redis). Без переменной кэш выключен и лента
+читается одним запросом, как раньше.
+
+В режиме кэша запрос ленты возвращает только id постов, а тела постов и
+карточки авторов собираются через get_many из кэша и одним запросом на
+промахи. Записи, меняющие пост, удаляют его из кэша; в других инстансах
+запись живёт не дольше POST_CACHE_TTL секунд. Имя и аватар автора меняются
+вне функции posts, поэтому карточка автора обновляется только по TTL.
+'''
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+import sync
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHE_TTL = float(os.environ.get('POST_CACHE_TTL', '30'))
+CACHE_SIZE = int(os.environ.get('POST_CACHE_SIZE', '50000'))
+LOG_STATS = os.environ.get('POST_CACHE_LOG_STATS') == '1'
+
+AUTHOR_COLUMNS = ('first_name', 'last_name', 'avatar_url')
+
+
+class LocalCache:
+    '''LRU с TTL в памяти процесса.'''
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+        return found
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class RedisCache:
+    '''Тот же интерфейс поверх Redis; значения сериализуются pickle.'''
+
+    def __init__(self, url, ttl=CACHE_TTL):
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        values = self.client.mget(keys)
+        return {key: pickle.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, mapping):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, pickle.dumps(value), ex=self.ttl)
+        pipe.execute()
+
+    def delete_many(self, keys):
+        if keys:
+            self.client.delete(*keys)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_stats = {'post_hits': 0, 'post_misses': 0, 'author_hits': 0, 'author_misses': 0}
+
+
+def get_backend():
+    '''Бэкенд кэша по POST_CACHE или None, если кэш выключен.'''
+    global _backend
+    mode = os.environ.get('POST_CACHE')
+    if mode not in ('local', 'redis'):
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if mode == 'redis' and redis is not None and os.environ.get('REDIS_URL'):
+                    _backend = RedisCache(os.environ['REDIS_URL'])
+                else:
+                    _backend = LocalCache()
+    return _backend
+
+
+def enabled():
+    return get_backend() is not None
+
+
+def _multi_get(backend, prefix, ids, stat, load):
+    keys = [f'{prefix}:{i}' for i in ids]
+    found = backend.get_many(keys)
+    missing = [i for i, key in zip(ids, keys) if key not in found]
+    _stats[f'{stat}_hits'] += len(ids) - len(missing)
+    _stats[f'{stat}_misses'] += len(missing)
+    if missing:
+        loaded = {f'{prefix}:{row["id"]}': row for row in load(missing)}
+        backend.set_many(loaded)
+        found.update(loaded)
+    return {i: found.get(f'{prefix}:{i}') for i in ids}
+
+
+def hydrate(cursor, post_ids):
+    '''Собирает строки ленты по списку id в том же порядке.'''
+    backend = get_backend()
+    unique_ids = list(dict.fromkeys(post_ids))
+
+    def load_posts(ids):
+        cursor.execute('SELECT * FROM posts WHERE id = ANY(%s)', (ids,))
+        return sync.strip_xids([dict(row) for row in cursor.fetchall()])
+
+    def load_authors(ids):
+        cursor.execute('SELECT id, first_name, last_name, avatar_url FROM users WHERE id = ANY(%s)', (ids,))
+        return [dict(row) for row in cursor.fetchall()]
+
+    posts = _multi_get(backend, 'post', unique_ids, 'post', load_posts)
+    author_ids = list(dict.fromkeys(p['user_id'] for p in posts.values() if p))
+    authors = _multi_get(backend, 'user', author_ids, 'author', load_authors)
+
+    rows = []
+    for post_id in post_ids:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        author = authors.get(post['user_id']) or {}
+        row = dict(post)
+        row.update({column: author.get(column) for column in AUTHOR_COLUMNS})
+        rows.append(row)
+    return rows
+
+
+def invalidate_posts(*post_ids):
+    backend = get_backend()
+    if backend is not None:
+        backend.delete_many([f'post:{i}' for i in post_ids if i])
+
+
+def stats():
+    result = dict(_stats)
+    for name in ('post', 'author'):
+        lookups = result[f'{name}_hits'] + result[f'{name}_misses']
+        result[f'{name}_hit_ratio'] = round(result[f'{name}_hits'] / lookups, 4) if lookups else 0.0
+    return result
+
+
+def log_stats():
+    if LOG_STATS and enabled():
+        print(json.dumps({'post_cache': stats()}))
@@ -1,32 +1,42 @@
+import base64
+import binascii
 import json
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import batch
+import cache
+import db
+import instrumentation
+import like_events
+import sessions
+import sync
+import tags
+import timeline
+from responses import error_response, finalize, json_response, options_response
 from datetime import datetime
 
 def handler(event, context):
     '''API для работы с постами: создание, просмотр, лайки, комментарии, репосты'''
-    
+    trace = instrumentation.start('posts', event)
+    response = dispatch(event)
+    with instrumentation.phase('serialize'):
+        response = finalize(event, response)
+    return instrumentation.finish(trace, response)
+
+def dispatch(event):
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
+        return options_response('GET, POST, PUT, DELETE, OPTIONS')
+    
+    pool = db.get_pool()
+    if not pool:
         return error_response('Database not configured', 500)
+    if method == 'GET' and not sync.wants_wait(event):
+        params = event.get('queryStringParameters') or {}
+        pool = db.read_pool(event, sessions.caller_key(event, params.get('user_id')))
     
-    conn = psycopg2.connect(dsn)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    with instrumentation.phase('connect'):
+        pool, conn = db.checkout(pool)
+    cursor = conn.cursor(cursor_factory=instrumentation.TimedCursor)
     
     try:
         if method == 'GET':
@@ -35,67 +45,275 @@ def handler(event, context):
             body = json.loads(event.get('body', '{}'))
             action = body.get('action')
             
-            if action == 'create':
-                return create_post(cursor, conn, body)
-            elif action == 'like':
-                return toggle_like(cursor, conn, body)
-            elif action == 'comment':
-                return add_comment(cursor, conn, body)
-            elif action == 'repost':
-                return repost(cursor, conn, body)
+            try:
+                body['user_id'] = sessions.authenticate(cursor, event, body.get('user_id'))
+            except sessions.AuthError as e:
+                return error_response(str(e), 401)
+            
+            if action == 'batch':
+                response = batch.run(cursor, conn, body, ACTIONS)
+            elif action in ACTIONS:
+                response = ACTIONS[action](cursor, conn, body)
             else:
                 return error_response('Invalid action', 400)
+            return db.note_write(response, sessions.caller_key(event, body['user_id']))
         else:
             return error_response('Method not allowed', 405)
             
     except Exception as e:
-        conn.rollback()
         return error_response(str(e), 500)
     finally:
         cursor.close()
-        conn.close()
+        pool.putconn(conn)
+        db.log_stats(pool)
+        sessions.log_stats()
+        cache.log_stats()
 
 def get_posts(cursor, event):
     params = event.get('queryStringParameters', {}) or {}
+    
+    if params.get('view') == 'comments':
+        return get_comments(cursor, params)
+    
+    if params.get('view') == 'trending':
+        limit = min(int(params.get('limit', 10)), 100)
+        kind = '@' if params.get('kind') == 'mentions' else '#'
+        return json_response({'tags': tags.trending(cursor, limit, kind)})
+    
+    if params.get('since'):
+        return get_changes(cursor, event, params)
+    
     user_id = params.get('user_id')
+    feed = params.get('feed')
     limit = int(params.get('limit', 20))
     offset = int(params.get('offset', 0))
+    comments_preview = min(int(params.get('comments_preview', 0)), 20)
+    
+    after = None
+    if params.get('cursor'):
+        try:
+            after = decode_cursor(params['cursor'])
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+        offset = 0
+    
+    if params.get('view') == 'tag':
+        tag = tags.normalize(params.get('tag'))
+        if len(tag) < 2:
+            return error_response('tag required', 400)
+        posts = fetch_tag_feed(cursor, tag, after, limit)
+        return posts_page_response(cursor, posts, limit, comments_preview)
+    
+    if feed == 'friends':
+        try:
+            user_id = sessions.authenticate(cursor, event, user_id)
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        if not user_id:
+            return error_response('user_id required', 400)
+        posts = fetch_friends_feed(cursor, user_id, after, limit, offset)
+        return posts_page_response(cursor, posts, limit, comments_preview)
+    
+    conditions = []
+    args = []
     
     if user_id:
-        query = '''
-            SELECT p.*, u.first_name, u.last_name, u.avatar_url,
-                   (SELECT COUNT(*) FROM likes WHERE post_id = p.id) as likes_count
+        conditions.append('p.user_id = %s')
+        args.append(user_id)
+    
+    if after:
+        conditions.append('(p.created_at, p.id) < (%s, %s)')
+        args.extend(after)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    columns, authors = feed_columns()
+    query = f'''
+        SELECT {columns}
+        FROM posts p
+        {authors}
+        {where}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %s OFFSET %s
+    '''
+    cursor.execute(query, (*args, limit, offset))
+    
+    return posts_page_response(cursor, load_feed_rows(cursor), limit, comments_preview)
+
+def feed_columns():
+    '''Столбцы и JOIN для запроса ленты: с кэшем выбираются только id.'''
+    if cache.enabled():
+        return 'p.id', ''
+    return 'p.*, u.first_name, u.last_name, u.avatar_url', 'JOIN users u ON p.user_id = u.id'
+
+def load_feed_rows(cursor):
+    rows = cursor.fetchall()
+    if cache.enabled():
+        return cache.hydrate(cursor, [row['id'] for row in rows])
+    return rows
+
+def fetch_friends_feed(cursor, user_id, after, limit, offset):
+    '''Лента из постов принятых друзей.
+
+    При TIMELINE_MODE=materialized читается диапазон из timelines, иначе по
+    каждому другу берётся не больше limit + offset последних постов через
+    индекс (user_id, created_at, id), и результаты сливаются до страницы.'''
+    args = {
+        'user_id': user_id,
+        'created_at': after[0] if after else None,
+        'post_id': after[1] if after else None,
+        'window': limit + offset,
+        'limit': limit,
+        'offset': offset
+    }
+    
+    if timeline.enabled():
+        cursor.execute(timeline.page_query(after is not None, *feed_columns()), args)
+        return load_feed_rows(cursor)
+    
+    seek = 'AND (p.created_at, p.id) < (%(created_at)s, %(post_id)s)' if after else ''
+    columns, authors = feed_columns()
+    query = f'''
+        SELECT {columns}
+        FROM (
+            SELECT friend_id AS id FROM friends WHERE user_id = %(user_id)s AND status = 'accepted'
+            UNION ALL
+            SELECT user_id AS id FROM friends WHERE friend_id = %(user_id)s AND status = 'accepted'
+        ) fr
+        CROSS JOIN LATERAL (
+            SELECT p.*
             FROM posts p
-            JOIN users u ON p.user_id = u.id
-            WHERE p.user_id = %s
-            ORDER BY p.created_at DESC
-            LIMIT %s OFFSET %s
-        '''
-        cursor.execute(query, (user_id, limit, offset))
-    else:
-        query = '''
+            WHERE p.user_id = fr.id {seek}
+            ORDER BY p.created_at DESC, p.id DESC
+            LIMIT %(window)s
+        ) p
+        {authors}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    '''
+    cursor.execute(query, args)
+    
+    return load_feed_rows(cursor)
+
+def fetch_tag_feed(cursor, tag, after, limit):
+    '''Посты с тегом от новых к старым: диапазон post_tags по (tag, created_at, post_id).'''
+    seek = 'AND (t.created_at, t.post_id) < (%(created_at)s, %(post_id)s)' if after else ''
+    columns, authors = feed_columns()
+    cursor.execute(f'''
+        SELECT {columns}
+        FROM post_tags t
+        JOIN posts p ON p.id = t.post_id
+        {authors}
+        WHERE t.tag = %(tag)s {seek}
+        ORDER BY t.created_at DESC, t.post_id DESC
+        LIMIT %(limit)s
+    ''', {
+        'tag': tag,
+        'created_at': after[0] if after else None,
+        'post_id': after[1] if after else None,
+        'limit': limit
+    })
+    
+    return load_feed_rows(cursor)
+
+def posts_page_response(cursor, posts, limit, comments_preview=0):
+    sync.strip_xids(posts)
+    like_events.apply_pending(cursor, posts)
+    attach_originals(cursor, posts)
+    if comments_preview and posts:
+        attach_comment_previews(cursor, posts, comments_preview)
+    
+    next_cursor = encode_cursor(posts[-1]['created_at'], posts[-1]['id']) if posts and len(posts) == limit else None
+    
+    return json_response({
+        'posts': posts,
+        'next_cursor': next_cursor
+    })
+
+def get_changes(cursor, event, params):
+    '''Режим since: новые посты и изменившиеся счётчики после водяного знака
+    (xid, id) из sync. Пост считается новым, если создан транзакцией не
+    раньше знака. Область та же, что у ленты: вся лента, user_id или
+    feed=friends.'''
+    user_id = params.get('user_id')
+    scope = ''
+    if params.get('feed') == 'friends':
+        try:
+            user_id = sessions.authenticate(cursor, event, user_id)
+        except sessions.AuthError as e:
+            return error_response(str(e), 401)
+        if not user_id:
+            return error_response('user_id required', 400)
+        scope = '''AND p.user_id IN (
+            SELECT friend_id FROM friends WHERE user_id = %(user_id)s AND status = 'accepted'
+            UNION ALL
+            SELECT user_id FROM friends WHERE friend_id = %(user_id)s AND status = 'accepted'
+        )'''
+    elif user_id:
+        scope = 'AND p.user_id = %(user_id)s'
+    
+    if params['since'] == 'latest':
+        return json_response({
+            'posts': [],
+            'counters': [],
+            'since': sync.encode([sync.snapshot_xmin(cursor), 0]),
+            'has_more': False
+        })
+    
+    try:
+        since = sync.decode(params['since'], 2)
+    except ValueError:
+        return error_response('Неверный since', 400)
+    
+    args = {'user_id': user_id, 'xid': since[0], 'row_id': since[1], 'limit': sync.LIMIT}
+    snapshot = {}
+    
+    def fetch():
+        snapshot['xmin'] = sync.snapshot_xmin(cursor)
+        cursor.execute(f'''
             SELECT p.*, u.first_name, u.last_name, u.avatar_url,
-                   (SELECT COUNT(*) FROM likes WHERE post_id = p.id) as likes_count
+                   p.change_xid::text::bigint AS sync_xid, p.id AS sync_id,
+                   p.created_xid >= %(xid)s::text::xid8 AS is_new
             FROM posts p
             JOIN users u ON p.user_id = u.id
-            ORDER BY p.created_at DESC
-            LIMIT %s OFFSET %s
-        '''
-        cursor.execute(query, (limit, offset))
-    
-    posts = cursor.fetchall()
-    
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'posts': [dict(post) for post in posts]
-        }, default=str),
-        'isBase64Encoded': False
-    }
+            WHERE (p.change_xid, p.id) > (%(xid)s::text::xid8, %(row_id)s) {scope}
+            ORDER BY p.change_xid, p.id
+            LIMIT %(limit)s
+        ''', args)
+        return cursor.fetchall()
+    
+    rows = sync.poll(cursor.connection, sync.POSTS_CHANNEL, sync.wait_seconds(params), fetch)
+    watermark, has_more = sync.advance(since, rows, snapshot['xmin'])
+    sync.strip_xids(rows)
+    like_events.apply_pending(cursor, rows)
+    
+    posts, counters = [], []
+    for row in rows:
+        if row.pop('is_new'):
+            posts.append(row)
+        else:
+            counters.append({key: row[key] for key in ('id', 'likes_count', 'comments_count', 'reposts_count')})
+    posts.sort(key=lambda post: (post['created_at'], post['id']), reverse=True)
+    attach_originals(cursor, posts)
+    
+    return json_response({
+        'posts': posts,
+        'counters': counters,
+        'since': sync.encode(watermark),
+        'has_more': has_more
+    })
+
+def encode_cursor(created_at, post_id):
+    raw = json.dumps([created_at.isoformat(), post_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    '''Разбирает непрозрачный cursor в пару (created_at, id)'''
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        created_at, post_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
 
 def create_post(cursor, conn, data):
     user_id = data.get('user_id')
@@ -113,20 +331,15 @@ def create_post(cursor, conn, data):
     ''', (user_id, content, post_type, media_urls))
     
     post = cursor.fetchone()
+    timeline.fan_out(cursor, post)
+    tags.index_post(cursor, post)
+    sync.notify(cursor, sync.POSTS_CHANNEL, post['id'])
     conn.commit()
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'post': dict(post)
-        }, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'post': post
+    })
 
 def toggle_like(cursor, conn, data):
     user_id = data.get('user_id')
@@ -135,32 +348,42 @@ def toggle_like(cursor, conn, data):
     if not user_id or not post_id:
         return error_response('user_id и post_id обязательны', 400)
     
-    cursor.execute('SELECT id FROM likes WHERE user_id = %s AND post_id = %s', (user_id, post_id))
-    existing = cursor.fetchone()
-    
-    if existing:
-        cursor.execute('DELETE FROM likes WHERE user_id = %s AND post_id = %s', (user_id, post_id))
-        cursor.execute('UPDATE posts SET likes_count = likes_count - 1 WHERE id = %s', (post_id,))
-        action = 'unliked'
+    if like_events.enabled():
+        result = like_events.record_toggle(cursor, user_id, post_id)
     else:
-        cursor.execute('INSERT INTO likes (user_id, post_id) VALUES (%s, %s)', (user_id, post_id))
-        cursor.execute('UPDATE posts SET likes_count = likes_count + 1 WHERE id = %s', (post_id,))
-        action = 'liked'
+        cursor.execute('''
+            WITH removed AS (
+                DELETE FROM likes WHERE user_id = %(user_id)s AND post_id = %(post_id)s
+                RETURNING post_id
+            ), added AS (
+                INSERT INTO likes (user_id, post_id)
+                SELECT %(user_id)s, id FROM posts
+                WHERE id = %(post_id)s AND NOT EXISTS (SELECT 1 FROM removed)
+                ON CONFLICT (user_id, post_id) DO NOTHING
+                RETURNING post_id
+            )
+            UPDATE posts
+            SET likes_count = likes_count + (SELECT COUNT(*) FROM added) - (SELECT COUNT(*) FROM removed)
+            WHERE id = %(post_id)s
+            RETURNING likes_count, EXISTS (SELECT 1 FROM removed) AS unliked
+        ''', {'user_id': user_id, 'post_id': post_id})
+        result = cursor.fetchone()
     
+    if not result:
+        conn.rollback()
+        return error_response('Пост не найден', 404)
+    
+    action = 'unliked' if result['unliked'] else 'liked'
+    
+    sync.notify(cursor, sync.POSTS_CHANNEL, post_id)
     conn.commit()
+    cache.invalidate_posts(post_id)
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'action': action
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'action': action,
+        'likes_count': result['likes_count']
+    })
 
 def add_comment(cursor, conn, data):
     user_id = data.get('user_id')
@@ -170,21 +393,134 @@ def add_comment(cursor, conn, data):
     if not all([user_id, post_id, content]):
         return error_response('Все поля обязательны', 400)
     
-    cursor.execute('UPDATE posts SET comments_count = comments_count + 1 WHERE id = %s', (post_id,))
+    parent_id = data.get('parent_id')
+    
+    cursor.execute('''
+        WITH inserted AS (
+            INSERT INTO comments (post_id, user_id, parent_id, content)
+            SELECT p.id, %(user_id)s, %(parent_id)s, %(content)s
+            FROM posts p
+            WHERE p.id = %(post_id)s
+            AND (%(parent_id)s::int IS NULL OR EXISTS (
+                SELECT 1 FROM comments WHERE id = %(parent_id)s AND post_id = %(post_id)s
+            ))
+            RETURNING *
+        ), bumped AS (
+            UPDATE posts SET comments_count = comments_count + 1
+            WHERE id = (SELECT post_id FROM inserted)
+            RETURNING comments_count
+        ), parent_bumped AS (
+            UPDATE comments SET replies_count = replies_count + 1
+            WHERE id = (SELECT parent_id FROM inserted)
+        )
+        SELECT inserted.*, bumped.comments_count FROM inserted, bumped
+    ''', {'post_id': post_id, 'user_id': user_id, 'parent_id': parent_id, 'content': content})
+    comment = cursor.fetchone()
+    
+    if not comment:
+        conn.rollback()
+        cursor.execute('SELECT 1 FROM posts WHERE id = %s', (post_id,))
+        if not cursor.fetchone():
+            return error_response('Пост не найден', 404)
+        return error_response('Комментарий для ответа не найден', 404)
+    
+    sync.notify(cursor, sync.POSTS_CHANNEL, post_id)
     conn.commit()
+    cache.invalidate_posts(post_id)
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'message': 'Комментарий добавлен'
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'message': 'Комментарий добавлен',
+        'comment': comment
+    })
+
+def get_comments(cursor, params):
+    '''Комментарии поста по возрастанию времени; parent_id выбирает ветку
+    ответов, без него отдаются комментарии верхнего уровня.'''
+    post_id = params.get('post_id')
+    if not post_id:
+        return error_response('post_id required', 400)
+    
+    limit = min(int(params.get('limit', 20)), 100)
+    conditions = ['c.post_id = %s']
+    args = [post_id]
+    
+    if params.get('parent_id'):
+        conditions.append('c.parent_id = %s')
+        args.append(params['parent_id'])
+    else:
+        conditions.append('c.parent_id IS NULL')
+    
+    if params.get('cursor'):
+        try:
+            conditions.append('(c.created_at, c.id) > (%s, %s)')
+            args.extend(decode_cursor(params['cursor']))
+        except ValueError:
+            return error_response('Неверный cursor', 400)
+    
+    cursor.execute(f'''
+        SELECT c.*, u.first_name, u.last_name, u.avatar_url
+        FROM comments c
+        JOIN users u ON c.user_id = u.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY c.created_at, c.id
+        LIMIT %s
+    ''', (*args, limit))
+    comments = cursor.fetchall()
+    
+    next_cursor = encode_cursor(comments[-1]['created_at'], comments[-1]['id']) if comments and len(comments) == limit else None
+    
+    return json_response({
+        'comments': comments,
+        'next_cursor': next_cursor
+    })
+
+def attach_originals(cursor, posts):
+    '''Подставляет исходные посты репостов одним запросом на страницу.'''
+    original_ids = list(dict.fromkeys(p['original_post_id'] for p in posts if p.get('original_post_id')))
+    if not original_ids:
+        return
+    
+    if cache.enabled():
+        originals = cache.hydrate(cursor, original_ids)
+    else:
+        cursor.execute('''
+            SELECT p.*, u.first_name, u.last_name, u.avatar_url
+            FROM posts p
+            JOIN users u ON p.user_id = u.id
+            WHERE p.id = ANY(%s)
+        ''', (original_ids,))
+        originals = cursor.fetchall()
+    sync.strip_xids(originals)
+    like_events.apply_pending(cursor, originals)
+    
+    by_id = {original['id']: original for original in originals}
+    for post in posts:
+        if post.get('original_post_id'):
+            post['original'] = by_id.get(post['original_post_id'])
+
+def attach_comment_previews(cursor, posts, per_post):
+    '''Добавляет к каждому посту страницы последние per_post комментариев
+    одним запросом через LATERAL.'''
+    cursor.execute('''
+        SELECT c.*, u.first_name, u.last_name, u.avatar_url
+        FROM unnest(%s::int[]) AS page(post_id)
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM comments c
+            WHERE c.post_id = page.post_id AND c.parent_id IS NULL
+            ORDER BY c.created_at DESC, c.id DESC
+            LIMIT %s
+        ) c
+        JOIN users u ON c.user_id = u.id
+        ORDER BY c.post_id, c.created_at, c.id
+    ''', ([post['id'] for post in posts], per_post))
+    
+    previews = {}
+    for comment in cursor.fetchall():
+        previews.setdefault(comment['post_id'], []).append(comment)
+    for post in posts:
+        post['comments_preview'] = previews.get(post['id'], [])
 
 def repost(cursor, conn, data):
     user_id = data.get('user_id')
@@ -193,40 +529,38 @@ def repost(cursor, conn, data):
     if not user_id or not original_post_id:
         return error_response('user_id и post_id обязательны', 400)
     
-    cursor.execute('SELECT content, post_type, media_urls FROM posts WHERE id = %s', (original_post_id,))
-    original = cursor.fetchone()
+    cursor.execute('''
+        WITH root AS (
+            SELECT COALESCE(original_post_id, id) AS id FROM posts WHERE id = %(post_id)s
+        ), inserted AS (
+            INSERT INTO posts (user_id, content, post_type, original_post_id)
+            SELECT %(user_id)s, %(content)s, 'repost', root.id FROM root
+            RETURNING id, user_id, original_post_id, created_at
+        ), bumped AS (
+            UPDATE posts SET reposts_count = reposts_count + 1
+            WHERE id = (SELECT original_post_id FROM inserted)
+        )
+        SELECT * FROM inserted
+    ''', {'post_id': original_post_id, 'user_id': user_id, 'content': data.get('content', '').strip()})
+    post = cursor.fetchone()
     
-    if not original:
+    if not post:
         return error_response('Пост не найден', 404)
     
-    cursor.execute('''
-        INSERT INTO posts (user_id, content, post_type, media_urls)
-        VALUES (%s, %s, %s, %s)
-        RETURNING id
-    ''', (user_id, original['content'], original['post_type'], original['media_urls']))
-    
+    timeline.fan_out(cursor, post)
+    sync.notify(cursor, sync.POSTS_CHANNEL, post['id'])
     conn.commit()
+    cache.invalidate_posts(post['original_post_id'])
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({
-            'success': True,
-            'message': 'Пост репостнут'
-        }),
-        'isBase64Encoded': False
-    }
+    return json_response({
+        'success': True,
+        'message': 'Пост репостнут',
+        'post': post
+    })
 
-def error_response(message, status_code):
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({'error': message}),
-        'isBase64Encoded': False
-    }
+ACTIONS = {
+    'create': create_post,
+    'like': toggle_like,
+    'comment': add_comment,
+    'repost': repost
+}
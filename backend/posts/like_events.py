@@ -0,0 +1,121 @@
+'''Отложенная запись счётчика лайков (LIKE_WRITE_MODE=behind).
+
+Лайк и снятие лайка по-прежнему меняют строку в likes (она у каждого
+пользователя своя), но вместо UPDATE горячей строки posts пишут событие
+в like_events. Агрегатор периодически сворачивает события по post_id и
+применяет одно изменение счётчика на пост. Чтение берёт posts.likes_count
+вместе с ещё не применёнными дельтами, поэтому автор лайка сразу видит
+своё действие.
+
+Агрегатор: DATABASE_URL=... python like_events.py [--interval 2]
+'''
+import os
+import sync
+
+FLUSH_LOCK_ID = 7314
+
+
+def enabled():
+    return os.environ.get('LIKE_WRITE_MODE') == 'behind'
+
+
+def record_toggle(cursor, user_id, post_id):
+    '''Переключает лайк и пишет событие; возвращает unliked и likes_count
+    с учётом неприменённых дельт.'''
+    cursor.execute('''
+        WITH removed AS (
+            DELETE FROM likes WHERE user_id = %(user_id)s AND post_id = %(post_id)s
+            RETURNING post_id
+        ), added AS (
+            INSERT INTO likes (user_id, post_id)
+            SELECT %(user_id)s, id FROM posts
+            WHERE id = %(post_id)s AND NOT EXISTS (SELECT 1 FROM removed)
+            ON CONFLICT (user_id, post_id) DO NOTHING
+            RETURNING post_id
+        ), logged AS (
+            INSERT INTO like_events (post_id, delta)
+            SELECT %(post_id)s, (SELECT COUNT(*) FROM added) - (SELECT COUNT(*) FROM removed)
+            WHERE EXISTS (SELECT 1 FROM added) OR EXISTS (SELECT 1 FROM removed)
+            RETURNING delta
+        )
+        SELECT EXISTS (SELECT 1 FROM removed) AS unliked,
+               p.likes_count
+               + COALESCE((SELECT SUM(delta) FROM like_events WHERE post_id = p.id), 0)
+               + COALESCE((SELECT SUM(delta) FROM logged), 0) AS likes_count
+        FROM posts p
+        WHERE p.id = %(post_id)s
+    ''', {'user_id': user_id, 'post_id': post_id})
+    return cursor.fetchone()
+
+
+def apply_pending(cursor, posts):
+    '''Заменяет likes_count постов страницы свежим счётчиком из posts плюс
+    неприменённые дельты. Оба значения читаются одним запросом, а не из
+    строки страницы: строка могла прийти из кэша постов до того, как flush
+    перенёс дельты в posts и удалил события.'''
+    if not enabled() or not posts:
+        return
+    cursor.execute('''
+        SELECT p.id, p.likes_count + COALESCE(SUM(e.delta), 0) AS likes_count
+        FROM posts p
+        LEFT JOIN like_events e ON e.post_id = p.id
+        WHERE p.id = ANY(%s)
+        GROUP BY p.id
+    ''', ([post['id'] for post in posts],))
+    current = {row['id']: int(row['likes_count']) for row in cursor.fetchall()}
+    for post in posts:
+        if post['id'] in current:
+            post['likes_count'] = current[post['id']]
+
+
+def flush(conn):
+    '''Сворачивает накопленные события в одно обновление счётчика на пост.
+
+    Возвращает число обновлённых постов или None, если агрегатор уже
+    работает в другом процессе.
+    '''
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', (FLUSH_LOCK_ID,))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return None
+        cursor.execute('''
+            WITH batch AS (
+                DELETE FROM like_events RETURNING post_id, delta
+            ), totals AS (
+                SELECT post_id, SUM(delta) AS delta FROM batch GROUP BY post_id
+            )
+            UPDATE posts p
+            SET likes_count = p.likes_count + totals.delta
+            FROM totals
+            WHERE p.id = totals.post_id AND totals.delta <> 0
+        ''')
+        updated = cursor.rowcount
+        if updated:
+            sync.notify(cursor, sync.POSTS_CHANNEL, 'likes')
+    conn.commit()
+    return updated
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import time
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Агрегатор like_events')
+    parser.add_argument('--interval', type=float, default=2.0, help='секунд между сбросами')
+    parser.add_argument('--once', action='store_true')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        while True:
+            started = time.monotonic()
+            updated = flush(conn)
+            print(json.dumps({'flushed_posts': updated, 'ms': round((time.monotonic() - started) * 1000, 2)}))
+            if args.once:
+                break
+            time.sleep(args.interval)
+    finally:
+        conn.close()
@@ -0,0 +1,97 @@
+'''Офлайн-сверка posts.likes_count с таблицей likes.
+
+Запуск: DATABASE_URL=... python reconcile_likes.py [--fix] [--batch-size N]
+
+Без --fix только печатает расхождения; с --fix пересчитывает счётчики
+пачками по диапазонам id, чтобы не держать блокировки на всей таблице.
+Ещё не применённые события из like_events учитываются как часть счётчика.
+'''
+import argparse
+import json
+import os
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+DRIFT_QUERY = '''
+    SELECT p.id, p.likes_count AS stored, COALESCE(l.cnt, 0) - COALESCE(e.pending, 0) AS actual
+    FROM posts p
+    LEFT JOIN (
+        SELECT post_id, COUNT(*) AS cnt
+        FROM likes
+        WHERE post_id >= %(lo)s AND post_id < %(hi)s
+        GROUP BY post_id
+    ) l ON l.post_id = p.id
+    LEFT JOIN (
+        SELECT post_id, SUM(delta) AS pending
+        FROM like_events
+        WHERE post_id >= %(lo)s AND post_id < %(hi)s
+        GROUP BY post_id
+    ) e ON e.post_id = p.id
+    WHERE p.id >= %(lo)s AND p.id < %(hi)s
+    AND p.likes_count IS DISTINCT FROM COALESCE(l.cnt, 0) - COALESCE(e.pending, 0)
+'''
+
+def fix_window(cursor, window):
+    '''Блокирует разошедшиеся посты окна и пересчитывает их счётчик уже под
+    блокировкой, из нового снимка. Лайк, закоммиченный между поиском
+    расхождений и UPDATE, не затирается: его собственный UPDATE счётчика
+    ждёт блокировки и применяется поверх пересчитанного значения.'''
+    cursor.execute(f'''
+        SELECT p.id, p.likes_count AS stored
+        FROM posts p
+        WHERE p.id IN (SELECT id FROM ({DRIFT_QUERY}) drift)
+        ORDER BY p.id
+        FOR UPDATE OF p
+    ''', window)
+    stored = {row['id']: row['stored'] for row in cursor.fetchall()}
+    if not stored:
+        return []
+    cursor.execute('''
+        UPDATE posts p
+        SET likes_count = (SELECT COUNT(*) FROM likes l WHERE l.post_id = p.id)
+                          - COALESCE((SELECT SUM(delta) FROM like_events e WHERE e.post_id = p.id), 0)
+        WHERE p.id = ANY(%s)
+        RETURNING p.id, p.likes_count AS actual
+    ''', (list(stored),))
+    return [{'id': row['id'], 'stored': stored[row['id']], 'actual': row['actual']}
+            for row in cursor.fetchall() if row['actual'] != stored[row['id']]]
+
+def reconcile(conn, fix=False, batch_size=50000):
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute('SELECT COALESCE(MIN(id), 0) AS lo, COALESCE(MAX(id), 0) AS hi FROM posts')
+    bounds = cursor.fetchone()
+    
+    report = {'checked_up_to': bounds['hi'], 'drifted_posts': 0, 'total_drift': 0, 'fixed': 0, 'samples': []}
+    
+    for lo in range(bounds['lo'], bounds['hi'] + 1, batch_size):
+        window = {'lo': lo, 'hi': lo + batch_size}
+        if fix:
+            rows = fix_window(cursor, window)
+        else:
+            cursor.execute(DRIFT_QUERY, window)
+            rows = cursor.fetchall()
+        conn.commit()
+        
+        report['drifted_posts'] += len(rows)
+        report['total_drift'] += sum(abs((r['stored'] or 0) - r['actual']) for r in rows)
+        if fix:
+            report['fixed'] += len(rows)
+        report['samples'].extend(dict(r) for r in rows[:10 - len(report['samples'])])
+    
+    cursor.close()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка posts.likes_count с таблицей likes')
+    parser.add_argument('--fix', action='store_true', help='исправить найденные расхождения')
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+    
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        print(json.dumps(reconcile(conn, fix=args.fix, batch_size=args.batch_size), default=str, ensure_ascii=False))
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+'''Инкрементальная синхронизация: режим since и ограниченный long-poll.
+
+Клиент передаёт непрозрачный водяной знак since и получает только то,
+что изменилось после него, плюс новый знак. since=latest возвращает
+текущий знак без данных: его берут перед первой загрузкой страницы.
+
+С параметром wait (секунды, не больше SYNC_MAX_WAIT) пустой ответ не
+отдаётся сразу: соединение подписывается через LISTEN на канал функции и
+ждёт NOTIFY, который пишущие действия шлют при коммите, после чего
+запрос повторяется. Ожидание держит соединение пула, поэтому SYNC_MAX_WAIT
+стоит держать меньше таймаута функции.
+
+Знак — пара (xid, id): xid транзакции, создавшей или изменившей строку, и
+её id. Номера транзакций выдаются не в порядке коммита, поэтому знак не
+сдвигается дальше xmin снимка запроса: все транзакции с меньшим xid уже
+завершены и видны, а строки незавершённых придут в следующем ответе.
+Строки с xid >= xmin могут прийти повторно, клиент сливает их по id.
+
+Модуль одинаковый в backend/posts и backend/friends.
+'''
+import base64
+import binascii
+import json
+import os
+import select
+import time
+
+MAX_WAIT = float(os.environ.get('SYNC_MAX_WAIT', '20'))
+LIMIT = int(os.environ.get('SYNC_LIMIT', '100'))
+
+POSTS_CHANNEL = 'sync_posts'
+FRIENDS_CHANNEL = 'sync_friends'
+
+XID_COLUMNS = ('change_xid', 'created_xid')
+
+
+def encode(values):
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode(value, size):
+    '''Разбирает водяной знак в список из size целых.'''
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        values = [int(item) for item in json.loads(raw)]
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid since') from e
+    if len(values) != size:
+        raise ValueError('invalid since')
+    return values
+
+
+def snapshot_xmin(cursor):
+    '''Наименьший xid, ещё работающий на момент снимка.'''
+    cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin')
+    return cursor.fetchone()['xmin']
+
+
+def strip_xids(rows):
+    '''Убирает из строк posts служебные xid синхронизации: в ответы клиентам
+    они не попадают.'''
+    for row in rows:
+        for column in XID_COLUMNS:
+            row.pop(column, None)
+    return rows
+
+
+def advance(since, rows, xmin):
+    '''Новый знак и has_more по строкам со столбцами sync_xid и sync_id
+    (столбцы убираются из строк). Знак не уходит дальше (xmin, 0).'''
+    positions = [(row.pop('sync_xid'), row.pop('sync_id')) for row in rows]
+    horizon = (xmin, 0)
+    has_more = len(rows) == LIMIT and positions[-1] < horizon
+    watermark = min(positions[-1], horizon) if has_more else horizon
+    return list(max(tuple(since), watermark)), has_more
+
+
+def wait_seconds(params):
+    try:
+        return max(0.0, min(float(params.get('wait') or 0), MAX_WAIT))
+    except ValueError:
+        return 0.0
+
+
+def wants_wait(event):
+    '''Long-poll слушает NOTIFY primary, поэтому идёт мимо реплик.'''
+    params = event.get('queryStringParameters') or {}
+    return bool(params.get('since')) and wait_seconds(params) > 0
+
+
+def notify(cursor, channel, payload):
+    '''NOTIFY доставляется слушателям при коммите транзакции.'''
+    cursor.execute('SELECT pg_notify(%s, %s)', (channel, str(payload)))
+
+
+def poll(conn, channel, timeout, fetch, relevant=None):
+    '''Вызывает fetch() и, пока результат пустой, ждёт NOTIFY на channel до
+    timeout секунд; relevant(payload) отсекает чужие уведомления.'''
+    result = fetch()
+    if result or timeout <= 0:
+        return result
+    deadline = time.monotonic() + timeout
+    with conn.cursor() as cursor:
+        cursor.execute(f'LISTEN {channel}')
+        conn.commit()
+        try:
+            result = fetch()
+            conn.commit()
+            while not result:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or select.select([conn], [], [], remaining) == ([], [], []):
+                    break
+                conn.poll()
+                payloads = [item.payload for item in conn.notifies]
+                conn.notifies.clear()
+                if relevant is None or any(relevant(payload) for payload in payloads):
+                    result = fetch()
+                    conn.commit()
+        finally:
+            cursor.execute(f'UNLISTEN {channel}')
+            conn.commit()
+    return result
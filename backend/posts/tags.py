@@ -0,0 +1,187 @@
+'''Хэштеги и упоминания постов: индекс post_tags и трендовые теги.
+
+create_post разбирает текст и пишет каждый #тег и @упоминание в post_tags
+(tag, created_at, post_id) — по этому ключу лента тега читается keyset'ом.
+Одновременно растёт счётчик тега в 5-минутной корзине tag_buckets, и
+тренды считаются по корзинам окна TRENDING_WINDOW с затуханием
+TRENDING_HALF_LIFE, а не GROUP BY по постам.
+
+Офлайн-задача: DATABASE_URL=... python tags.py [--backfill] [--prune]
+--backfill разбирает существующие посты пачками по id и пересобирает
+корзины окна, --prune удаляет корзины старше окна.
+'''
+import os
+import re
+import threading
+import time
+
+BUCKET_SECONDS = 300
+MAX_TAGS = int(os.environ.get('TAGS_PER_POST', '20'))
+TRENDING_WINDOW = int(os.environ.get('TRENDING_WINDOW', '86400'))
+TRENDING_HALF_LIFE = float(os.environ.get('TRENDING_HALF_LIFE', '3600'))
+TRENDING_CACHE_TTL = float(os.environ.get('TRENDING_CACHE_TTL', '30'))
+
+TAG_RE = re.compile(r'(?<![\w#@])([#@])(\w{1,64})')
+
+BUCKET_SQL = f'floor(extract(epoch FROM %(created_at)s::timestamp) / {BUCKET_SECONDS})::bigint'
+
+
+def extract(content):
+    '''Теги текста в нижнем регистре без повторов: '#тег' и '@имя'.'''
+    tags = []
+    for mark, word in TAG_RE.findall(content or ''):
+        tag = mark + word.lower()
+        if tag not in tags:
+            tags.append(tag)
+            if len(tags) == MAX_TAGS:
+                break
+    return tags
+
+
+def normalize(tag):
+    '''Тег из запроса: без префикса считается хэштегом.'''
+    tag = (tag or '').strip().lower()
+    if tag and tag[0] not in '#@':
+        tag = '#' + tag
+    return tag
+
+
+def index_post(cursor, post):
+    '''Пишет теги нового поста и добавляет их в текущую корзину.'''
+    tags = extract(post['content'])
+    if not tags:
+        return
+    cursor.execute(f'''
+        WITH inserted AS (
+            INSERT INTO post_tags (tag, created_at, post_id)
+            SELECT tag, %(created_at)s, %(post_id)s FROM unnest(%(tags)s::text[]) tag
+            ON CONFLICT DO NOTHING
+            RETURNING tag
+        )
+        INSERT INTO tag_buckets (tag, bucket, count)
+        SELECT tag, {BUCKET_SQL}, 1 FROM inserted
+        ON CONFLICT (tag, bucket) DO UPDATE SET count = tag_buckets.count + 1
+    ''', {'tags': tags, 'created_at': post['created_at'], 'post_id': post['id']})
+
+
+class TrendingCache:
+    '''Готовый список трендов на TRENDING_CACHE_TTL секунд для каждого limit.'''
+
+    def __init__(self, ttl=TRENDING_CACHE_TTL):
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+        if item and item[0] > time.monotonic():
+            return item[1]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+
+
+_trending_cache = TrendingCache()
+
+
+def trending(cursor, limit, kind='#'):
+    '''Теги с наибольшим затухающим счётом: вклад корзины уменьшается вдвое
+    каждые TRENDING_HALF_LIFE секунд. Читаются только корзины окна.'''
+    key = (limit, kind)
+    cached = _trending_cache.get(key)
+    if cached is not None:
+        return cached
+    cursor.execute(f'''
+        WITH now_bucket AS (
+            SELECT floor(extract(epoch FROM now()::timestamp) / {BUCKET_SECONDS})::bigint AS value
+        )
+        SELECT b.tag,
+               round(SUM(b.count * power(0.5, (n.value - b.bucket) * {BUCKET_SECONDS} / %(half_life)s))::numeric, 2)
+                   AS score,
+               SUM(b.count) AS posts
+        FROM tag_buckets b, now_bucket n
+        WHERE b.bucket > n.value - %(window)s AND left(b.tag, 1) = %(kind)s
+        GROUP BY b.tag
+        ORDER BY score DESC, b.tag
+        LIMIT %(limit)s
+    ''', {'half_life': TRENDING_HALF_LIFE, 'window': TRENDING_WINDOW // BUCKET_SECONDS, 'kind': kind, 'limit': limit})
+    result = cursor.fetchall()
+    _trending_cache.put(key, result)
+    return result
+
+
+def prune(cursor):
+    '''Удаляет корзины, которые уже не попадают в окно трендов.'''
+    cursor.execute(f'''
+        DELETE FROM tag_buckets
+        WHERE bucket <= floor(extract(epoch FROM now()::timestamp) / {BUCKET_SECONDS})::bigint - %s
+    ''', (TRENDING_WINDOW // BUCKET_SECONDS,))
+    return cursor.rowcount
+
+
+def backfill(conn, batch_size=50000):
+    '''Разбирает посты пачками по id и затем пересобирает корзины окна из
+    post_tags. Повторный запуск безопасен.'''
+    from psycopg2.extras import execute_values
+    cursor = conn.cursor()
+    cursor.execute('SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM posts')
+    lo, hi = cursor.fetchone()
+    indexed = 0
+    for start in range(lo, hi + 1, batch_size):
+        cursor.execute('''
+            SELECT id, created_at, content FROM posts
+            WHERE id >= %s AND id < %s AND content LIKE ANY (ARRAY['%%#%%', '%%@%%'])
+        ''', (start, start + batch_size))
+        rows = [(tag, created_at, post_id)
+                for post_id, created_at, content in cursor.fetchall()
+                for tag in extract(content)]
+        execute_values(cursor, '''
+            INSERT INTO post_tags (tag, created_at, post_id) VALUES %s
+            ON CONFLICT DO NOTHING
+        ''', rows, page_size=5000)
+        conn.commit()
+        indexed += len(rows)
+
+    cursor.execute(f'''
+        WITH window_start AS (
+            SELECT now()::timestamp - make_interval(secs => %s) AS value
+        )
+        INSERT INTO tag_buckets (tag, bucket, count)
+        SELECT t.tag, floor(extract(epoch FROM t.created_at) / {BUCKET_SECONDS})::bigint, COUNT(*)
+        FROM post_tags t, window_start w
+        WHERE t.created_at > w.value
+        GROUP BY 1, 2
+        ON CONFLICT (tag, bucket) DO UPDATE SET count = EXCLUDED.count
+    ''', (TRENDING_WINDOW,))
+    buckets = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return {'tags_indexed': indexed, 'buckets': buckets}
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Индекс хэштегов и корзины трендов')
+    parser.add_argument('--backfill', action='store_true', help='разобрать существующие посты')
+    parser.add_argument('--prune', action='store_true', help='удалить корзины старше окна')
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        report = {}
+        if args.backfill:
+            report.update(backfill(conn, args.batch_size))
+        if args.prune:
+            with conn.cursor() as cursor:
+                report['pruned_buckets'] = prune(cursor)
+            conn.commit()
+        print(json.dumps(report))
+    finally:
+        conn.close()
@@ -0,0 +1,74 @@
+'''Пропускная способность batch против отдельных вызовов.
+
+Сценарии: 30 лайков подряд и 20 принятых заявок в друзья — отдельными
+вызовами handler, одним batch в режиме atomic и одним в режиме savepoint.
+
+    DATABASE_URL=... python benchmarks/batch_actions.py [--rounds N]
+'''
+import argparse
+import time
+from common import connect, load_handler, post_event, report, seed_posts, seed_users
+
+LIKES = 30
+ACCEPTS = 20
+
+
+def timed(fn, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, 10_000)
+    conn.commit()
+    seed_posts(cursor, 100_000)
+    cursor.execute('SELECT MIN(id) FROM users')
+    user_id = cursor.fetchone()[0]
+    cursor.execute('SELECT id FROM posts ORDER BY id LIMIT %s', (LIKES,))
+    post_ids = [r[0] for r in cursor.fetchall()]
+    requesters = list(range(user_id + 1, user_id + 1 + ACCEPTS))
+    
+    def reset_requests():
+        cursor.execute('DELETE FROM friends WHERE friend_id = %s OR user_id = %s', (user_id, user_id))
+        cursor.executemany("INSERT INTO friends (user_id, friend_id, status) VALUES (%s, %s, 'pending')",
+                           [(r, user_id) for r in requesters])
+        conn.commit()
+    
+    posts = load_handler('posts')
+    friends = load_handler('friends')
+    likes = [{'action': 'like', 'user_id': user_id, 'post_id': p} for p in post_ids]
+    accepts = [{'action': 'accept', 'user_id': user_id, 'friend_id': r} for r in requesters]
+    
+    rows = []
+    for mode in ('single', 'atomic', 'savepoint'):
+        if mode == 'single':
+            run_likes = lambda: [posts(post_event(item), None) for item in likes]
+            run_accepts = lambda: [friends(post_event(item), None) for item in accepts]
+        else:
+            run_likes = lambda: posts(post_event({'action': 'batch', 'mode': mode, 'user_id': user_id, 'items': likes}), None)
+            run_accepts = lambda: friends(post_event({'action': 'batch', 'mode': mode, 'user_id': user_id, 'items': accepts}), None)
+        
+        elapsed = timed(run_likes, args.rounds)
+        rows.append({'case': f'{mode}: {LIKES} likes', 'actions_per_s': round(LIKES * args.rounds / elapsed, 1),
+                     'ms_per_round': round(elapsed * 1000 / args.rounds, 2)})
+        
+        elapsed = 0.0
+        for _ in range(args.rounds):
+            reset_requests()
+            elapsed += timed(run_accepts, 1)
+        rows.append({'case': f'{mode}: {ACCEPTS} accepts', 'actions_per_s': round(ACCEPTS * args.rounds / elapsed, 1),
+                     'ms_per_round': round(elapsed * 1000 / args.rounds, 2)})
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
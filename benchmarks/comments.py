@@ -0,0 +1,64 @@
+'''Комментарии на посте со 100k комментариями.
+
+Меряет первую и глубокую страницу по cursor, превью комментариев для
+страницы ленты из 20 постов (один из них горячий) и add_comment.
+
+    DATABASE_URL=... python benchmarks/comments.py [--comments 100000]
+'''
+import argparse
+import json
+from common import analyze, connect, get_event, load_handler, measure, post_event, report, seed_posts, seed_users, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--comments', type=int, default=100_000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, 10_000)
+    conn.commit()
+    seed_posts(cursor, 100_000)
+    cursor.execute('SELECT id, user_id FROM posts ORDER BY created_at DESC, id DESC LIMIT 1')
+    hot_post_id, author_id = cursor.fetchone()
+    cursor.execute('SELECT COUNT(*) FROM comments WHERE post_id = %s', (hot_post_id,))
+    missing = args.comments - cursor.fetchone()[0]
+    if missing > 0:
+        cursor.execute('''
+            INSERT INTO comments (post_id, user_id, content, created_at)
+            SELECT %s, (SELECT MIN(id) FROM users) + g %% 10000, 'Комментарий ' || g,
+                   now() - g * interval '1 second'
+            FROM generate_series(1, %s) g
+        ''', (hot_post_id, missing))
+        cursor.execute('''
+            UPDATE posts SET comments_count = (SELECT COUNT(*) FROM comments WHERE post_id = %s)
+            WHERE id = %s
+        ''', (hot_post_id, hot_post_id))
+    analyze(cursor, 'comments', 'posts')
+    conn.commit()
+    conn.close()
+    
+    handler = load_handler('posts')
+    first = {'view': 'comments', 'post_id': hot_post_id, 'limit': 50}
+    rows = [summarize('first page of 50', measure(lambda: handler(get_event(first), None), args.iterations))]
+    
+    deep = dict(first)
+    for _ in range(args.comments // 100):
+        page = json.loads(handler(get_event(deep), None)['body'])
+        if not page['next_cursor']:
+            break
+        deep['cursor'] = page['next_cursor']
+    rows.append(summarize('page in the middle', measure(lambda: handler(get_event(deep), None), args.iterations)))
+    
+    feed = {'limit': 20, 'comments_preview': 3}
+    rows.append(summarize('feed of 20 with 3 comment previews', measure(lambda: handler(get_event(feed), None), args.iterations)))
+    
+    body = {'action': 'comment', 'user_id': author_id, 'post_id': hot_post_id, 'content': 'benchmark'}
+    rows.append(summarize('add_comment', measure(lambda: handler(post_event(body), None), args.iterations)))
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+'''Общие утилиты бенчмарков: подключение, загрузка обработчиков, засев данных.
+
+Бенчмарки запускаются против локального PostgreSQL с применёнными
+db_migrations: DATABASE_URL=postgresql://localhost/bench python benchmarks/<name>.py
+'''
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FIRST_NAMES = ['Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Ирина', 'Светлана', 'Татьяна',
+               'Иван', 'Дмитрий', 'Сергей', 'Алексей', 'Андрей', 'Михаил', 'Николай', 'Павел']
+LAST_NAMES = ['Смирнов', 'Иванов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов',
+              'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев',
+              'Семёнов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев']
+
+
+def connect():
+    import psycopg2
+    return psycopg2.connect(os.environ['DATABASE_URL'])
+
+
+def load_handler(function_name):
+    '''Импортирует backend/<function_name>/index.py и возвращает его handler.'''
+    function_dir = ROOT / 'backend' / function_name
+    sys.path.insert(0, str(function_dir))
+    spec = importlib.util.spec_from_file_location(f'{function_name}_index', function_dir / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def get_event(params):
+    return {'httpMethod': 'GET', 'queryStringParameters': {k: str(v) for k, v in params.items()}}
+
+
+def post_event(body, headers=None):
+    return {'httpMethod': 'POST', 'headers': headers or {}, 'body': json.dumps(body)}
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def measure(fn, iterations, warmup=5):
+    '''Вызывает fn iterations раз и возвращает задержки в миллисекундах.'''
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(label, samples):
+    return {
+        'case': label,
+        'n': len(samples),
+        'p50_ms': round(percentile(samples, 50), 2),
+        'p95_ms': round(percentile(samples, 95), 2),
+        'p99_ms': round(percentile(samples, 99), 2),
+        'mean_ms': round(statistics.fmean(samples), 2),
+    }
+
+
+def report(rows):
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+def count_rows(cursor, table):
+    cursor.execute(f'SELECT COUNT(*) FROM {table}')
+    return cursor.fetchone()[0]
+
+
+def seed_users(cursor, count):
+    '''Добавляет пользователей до count штук; возвращает итоговое количество.'''
+    existing = count_rows(cursor, 'users')
+    if existing < count:
+        cursor.execute('''
+            INSERT INTO users (phone, email, password_hash, first_name, last_name)
+            SELECT '+7900' || lpad(g::text, 8, '0'), 'bench' || g || '@example.com', 'x',
+                   (%s::text[])[1 + floor(random() * %s)::int],
+                   (%s::text[])[1 + floor(random() * %s)::int]
+            FROM generate_series(%s, %s) g
+        ''', (FIRST_NAMES, len(FIRST_NAMES), LAST_NAMES, len(LAST_NAMES), existing + 1, count))
+    return max(existing, count)
+
+
+def seed_posts(cursor, count):
+    '''Добавляет посты случайным авторам за последний год до count штук.'''
+    existing = count_rows(cursor, 'posts')
+    cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+    lo, hi = cursor.fetchone()
+    batch = 1_000_000
+    for start in range(existing, count, batch):
+        cursor.execute('''
+            INSERT INTO posts (user_id, content, created_at)
+            SELECT %s + floor(random() * (%s - %s + 1))::int,
+                   'Пост ' || g,
+                   now() - random() * interval '365 days'
+            FROM generate_series(%s, %s) g
+        ''', (lo, hi, lo, start + 1, min(start + batch, count)))
+        cursor.connection.commit()
+
+
+def seed_friendships(cursor, user_id, friend_ids, status='accepted'):
+    '''Связывает user_id с friend_ids; направление строк чередуется, как в жизни.'''
+    from psycopg2.extras import execute_values
+    cursor.execute('DELETE FROM friends WHERE user_id = %s OR friend_id = %s', (user_id, user_id))
+    rows = [(user_id, f) if i % 2 else (f, user_id) for i, f in enumerate(friend_ids)]
+    execute_values(
+        cursor,
+        'INSERT INTO friends (user_id, friend_id, status) VALUES %s ON CONFLICT DO NOTHING',
+        [(a, b, status) for a, b in rows],
+        page_size=1000,
+    )
+
+
+def analyze(cursor, *tables):
+    for table in tables:
+        cursor.execute(f'ANALYZE {table}')
+
+
+def seed_random_friendships(cursor, count, accepted_share=0.8):
+    '''Добирает таблицу friends случайными парами до count строк.'''
+    cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+    lo, hi = cursor.fetchone()
+    batch = 1_000_000
+    while True:
+        missing = count - count_rows(cursor, 'friends')
+        if missing <= 0:
+            break
+        cursor.execute('''
+            INSERT INTO friends (user_id, friend_id, status)
+            SELECT a, b, CASE WHEN random() < %s THEN 'accepted' ELSE 'pending' END
+            FROM (
+                SELECT %s + floor(random() * (%s - %s + 1))::int AS a,
+                       %s + floor(random() * (%s - %s + 1))::int AS b
+                FROM generate_series(1, %s)
+            ) pairs
+            WHERE a != b
+            ON CONFLICT DO NOTHING
+        ''', (accepted_share, lo, hi, lo, lo, hi, lo, min(missing, batch)))
+        cursor.connection.commit()
+
+
+def seed_likes(cursor, count):
+    '''Добирает likes случайными парами до count строк и пересчитывает счётчики.'''
+    missing = count - count_rows(cursor, 'likes')
+    if missing <= 0:
+        return
+    cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+    users_lo, users_hi = cursor.fetchone()
+    cursor.execute('SELECT MIN(id), MAX(id) FROM posts')
+    posts_lo, posts_hi = cursor.fetchone()
+    cursor.execute('''
+        INSERT INTO likes (user_id, post_id)
+        SELECT %s + floor(random() * (%s - %s + 1))::int,
+               %s + floor(random() * (%s - %s + 1))::int
+        FROM generate_series(1, %s)
+        ON CONFLICT DO NOTHING
+    ''', (users_lo, users_hi, users_lo, posts_lo, posts_hi, posts_lo, missing))
+    cursor.execute('''
+        UPDATE posts p SET likes_count = l.cnt
+        FROM (SELECT post_id, COUNT(*) AS cnt FROM likes GROUP BY post_id) l
+        WHERE p.id = l.post_id
+    ''')
+    cursor.connection.commit()
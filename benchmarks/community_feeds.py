@@ -0,0 +1,114 @@
+'''Лента «мои сообщества» (GET communities?feed=my) для 5, 50 и 500 сообществ.
+
+Засевает --communities сообществ и --posts постов в них, вступает
+проверочными пользователями в 5, 50 и 500 случайных сообществ и меряет
+p50/p99 первой и одиннадцатой страницы. Для сравнения тот же первый экран
+меряется одним запросом JOIN community_members + ORDER BY без слияния.
+Отдельно меряются join + leave одного сообщества (атомарный members_count).
+
+    DATABASE_URL=... python benchmarks/community_feeds.py [--communities 2000] [--posts 5000000]
+'''
+import argparse
+import json
+from common import analyze, connect, count_rows, get_event, load_handler, measure, post_event, report, seed_users, summarize
+
+MEMBERSHIPS = (5, 50, 500)
+
+NAIVE_SQL = '''
+    SELECT p.*, u.first_name, u.last_name, u.avatar_url
+    FROM community_posts p
+    JOIN community_members cm ON cm.community_id = p.community_id
+    JOIN users u ON u.id = p.user_id
+    WHERE cm.user_id = %s
+    ORDER BY p.created_at DESC, p.id DESC
+    LIMIT %s
+'''
+
+
+def seed_communities(cursor, communities, posts):
+    existing = count_rows(cursor, 'communities')
+    if existing < communities:
+        cursor.execute('''
+            INSERT INTO communities (name, category, created_by)
+            SELECT 'Сообщество ' || g, (ARRAY['Спорт', 'Музыка', 'Кино', 'Игры', 'Наука'])[1 + g %% 5], 1
+            FROM generate_series(%s, %s) g
+        ''', (existing + 1, communities))
+        cursor.connection.commit()
+    cursor.execute('SELECT MIN(id), MAX(id) FROM communities')
+    lo, hi = cursor.fetchone()
+    batch = 1_000_000
+    for start in range(count_rows(cursor, 'community_posts'), posts, batch):
+        cursor.execute('''
+            INSERT INTO community_posts (community_id, user_id, content, created_at)
+            SELECT %s + floor(random() * (%s - %s + 1))::int,
+                   1 + floor(random() * 10000)::int,
+                   'Пост сообщества ' || g,
+                   now() - random() * interval '365 days'
+            FROM generate_series(%s, %s) g
+        ''', (lo, hi, lo, start + 1, min(start + batch, posts)))
+        cursor.connection.commit()
+    return lo, hi
+
+
+def seed_memberships(cursor, user_id, count):
+    cursor.execute('DELETE FROM community_members WHERE user_id = %s', (user_id,))
+    cursor.execute('''
+        INSERT INTO community_members (community_id, user_id)
+        SELECT id, %s FROM communities ORDER BY random() LIMIT %s
+    ''', (user_id, count))
+    cursor.execute('''
+        UPDATE communities c
+        SET members_count = (SELECT COUNT(*) FROM community_members m WHERE m.community_id = c.id)
+    ''')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--communities', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=5_000_000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, 10_000)
+    conn.commit()
+    lo, _ = seed_communities(cursor, args.communities, args.posts)
+    probes = {}
+    for i, count in enumerate(MEMBERSHIPS):
+        probes[count] = 1 + i
+        seed_memberships(cursor, probes[count], count)
+    analyze(cursor, 'communities', 'community_members', 'community_posts')
+    conn.commit()
+
+    handler = load_handler('communities')
+    rows = []
+    for count, probe_id in probes.items():
+        params = {'feed': 'my', 'user_id': probe_id, 'limit': args.limit}
+        rows.append(summarize(f'{count} communities: first page',
+                              measure(lambda: handler(get_event(params), None), args.iterations)))
+
+        deep = dict(params)
+        for _ in range(10):
+            page = json.loads(handler(get_event(deep), None)['body'])
+            if not page['next_cursor']:
+                break
+            deep['cursor'] = page['next_cursor']
+        rows.append(summarize(f'{count} communities: page 11',
+                              measure(lambda: handler(get_event(deep), None), args.iterations)))
+
+        def naive():
+            cursor.execute(NAIVE_SQL, (probe_id, args.limit))
+            cursor.fetchall()
+        rows.append(summarize(f'{count} communities: single JOIN + ORDER BY', measure(naive, args.iterations)))
+
+    join = post_event({'action': 'join', 'user_id': 100, 'community_id': lo})
+    leave = post_event({'action': 'leave', 'user_id': 100, 'community_id': lo})
+    rows.append(summarize('join + leave', measure(lambda: (handler(join, None), handler(leave, None)), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
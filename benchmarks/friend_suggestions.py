@@ -0,0 +1,65 @@
+'''Пересчёт «возможно, вы знакомы» на графе в 1M пользователей и чтение страницы.
+
+Засевает пользователей, случайные дружбы и по 1–4 интереса, затем
+запускает офлайн-задачу backend/friends/suggestions.py и печатает время
+загрузки графа, подсчёта и записи, размер графа в памяти и задержку
+GET friends?view=suggestions (первая и вторая страница).
+
+    DATABASE_URL=... python benchmarks/friend_suggestions.py [--users 1000000] [--friendships 10000000]
+'''
+import argparse
+import json
+from common import (analyze, connect, count_rows, get_event, load_handler, measure, report, seed_random_friendships,
+                    seed_users, summarize)
+
+INTERESTS = ['Кулинария', 'Путешествия', 'Спорт', 'Музыка', 'Кино', 'Книги', 'Фото', 'IT', 'Игры', 'Наука']
+
+
+def seed_interests(cursor):
+    if count_rows(cursor, 'user_interests'):
+        return
+    cursor.execute('''
+        INSERT INTO user_interests (user_id, interest)
+        SELECT u.id, (%s::text[])[1 + floor(random() * %s)::int]
+        FROM users u, generate_series(1, 1 + floor(random() * 4)::int)
+    ''', (INTERESTS, len(INTERESTS)))
+    cursor.connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--friendships', type=int, default=10_000_000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.users)
+    conn.commit()
+    seed_random_friendships(cursor, args.friendships)
+    seed_interests(cursor)
+    analyze(cursor, 'users', 'friends', 'user_interests')
+    conn.commit()
+
+    handler = load_handler('friends')
+    import suggestions
+    rows = [{'case': f'refresh {args.users} users', **suggestions.refresh(conn)}]
+
+    cursor.execute('ANALYZE friend_suggestions')
+    cursor.execute('SELECT user_id FROM friend_suggestions GROUP BY user_id HAVING COUNT(*) >= 40 LIMIT 1')
+    probe_id = cursor.fetchone()[0]
+    conn.commit()
+
+    params = {'view': 'suggestions', 'user_id': probe_id, 'limit': 20}
+    rows.append(summarize('page 1', measure(lambda: handler(get_event(params), None), args.iterations)))
+    first = json.loads(handler(get_event(params), None)['body'])
+    if first['next_cursor']:
+        page_two = {**params, 'cursor': first['next_cursor']}
+        rows.append(summarize('page 2', measure(lambda: handler(get_event(page_two), None), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''Задержка ленты друзей (GET posts?feed=friends) в зависимости от числа друзей.
+
+По умолчанию засевает 100k пользователей и 10M постов, затем меряет p50/p99
+первой страницы и глубокой страницы по cursor для пользователей с 10, 500 и
+5000 принятыми друзьями.
+
+    DATABASE_URL=... python benchmarks/friends_feed.py [--users N] [--posts N] [--iterations N]
+'''
+import argparse
+import json
+from common import analyze, connect, get_event, load_handler, measure, report, seed_friendships, seed_posts, seed_users, summarize
+
+FRIEND_COUNTS = (10, 500, 5000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--posts', type=int, default=10_000_000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.users)
+    conn.commit()
+    seed_posts(cursor, args.posts)
+    
+    cursor.execute('SELECT MIN(id) FROM users')
+    first_id = cursor.fetchone()[0]
+    probes = {}
+    for i, friend_count in enumerate(FRIEND_COUNTS):
+        probe_id = first_id + i
+        friend_start = first_id + 10_000 * (i + 1)
+        seed_friendships(cursor, probe_id, range(friend_start, friend_start + friend_count))
+        probes[friend_count] = probe_id
+    analyze(cursor, 'users', 'posts', 'friends')
+    conn.commit()
+    conn.close()
+    
+    handler = load_handler('posts')
+    rows = []
+    for friend_count, probe_id in probes.items():
+        params = {'feed': 'friends', 'user_id': probe_id, 'limit': args.limit}
+        rows.append(summarize(f'{friend_count} friends, first page',
+                              measure(lambda: handler(get_event(params), None), args.iterations)))
+        
+        deep = dict(params)
+        for _ in range(10):
+            page = json.loads(handler(get_event(deep), None)['body'])
+            if not page['next_cursor']:
+                break
+            deep['cursor'] = page['next_cursor']
+        rows.append(summarize(f'{friend_count} friends, page 11',
+                              measure(lambda: handler(get_event(deep), None), args.iterations)))
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
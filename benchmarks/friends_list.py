@@ -0,0 +1,47 @@
+'''Список друзей (GET friends?user_id=...) при росте таблицы friends.
+
+Таблица friends последовательно добирается до каждого размера из --sizes;
+на каждом шаге меряется полный список, страница по cursor и count_only для
+пользователя с 200 друзьями. Время должно оставаться ровным.
+
+    DATABASE_URL=... python benchmarks/friends_list.py [--sizes 1000000,10000000,30000000]
+'''
+import argparse
+from common import analyze, connect, get_event, load_handler, measure, report, seed_friendships, seed_random_friendships, seed_users, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--sizes', default='1000000,10000000,30000000')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.users)
+    cursor.execute('SELECT MIN(id) FROM users')
+    probe_id = cursor.fetchone()[0]
+    seed_friendships(cursor, probe_id, range(probe_id + 1, probe_id + 201))
+    conn.commit()
+    
+    handler = load_handler('friends')
+    rows = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        seed_random_friendships(cursor, size)
+        analyze(cursor, 'friends')
+        conn.commit()
+        cases = {
+            'full list': {'user_id': probe_id},
+            'page of 50': {'user_id': probe_id, 'limit': 50, 'cursor': probe_id + 100},
+            'count_only': {'user_id': probe_id, 'count_only': 1},
+        }
+        for label, params in cases.items():
+            rows.append(summarize(f'{size} rows: {label}',
+                                  measure(lambda: handler(get_event(params), None), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
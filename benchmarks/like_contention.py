@@ -0,0 +1,90 @@
+'''1000 одновременных лайков одного поста: синхронный счётчик против write-behind.
+
+Лайкеры работают в потоках, у каждого свой пользователь. Параллельно
+монитор раз в 10 мс считает сессии, ждущие блокировку строки. В режиме
+behind после прогона агрегатор сбрасывает события и проверяется счётчик.
+
+    DATABASE_URL=... python benchmarks/like_contention.py [--likers 1000] [--concurrency 64]
+'''
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common import ROOT, connect, load_handler, percentile, post_event, report, seed_posts, seed_users
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--likers', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+    
+    os.environ['DB_POOL_MAX_SIZE'] = str(args.concurrency)
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.likers + 1)
+    conn.commit()
+    seed_posts(cursor, 1000)
+    cursor.execute('SELECT id FROM posts ORDER BY id LIMIT 1')
+    post_id = cursor.fetchone()[0]
+    cursor.execute('SELECT id FROM users ORDER BY id LIMIT %s', (args.likers,))
+    likers = [r[0] for r in cursor.fetchall()]
+    
+    handler = load_handler('posts')
+    sys.path.insert(0, str(ROOT / 'backend' / 'posts'))
+    import like_events
+    
+    rows = []
+    for mode in ('sync', 'behind'):
+        os.environ['LIKE_WRITE_MODE'] = mode
+        cursor.execute('DELETE FROM likes WHERE post_id = %s', (post_id,))
+        cursor.execute('DELETE FROM like_events WHERE post_id = %s', (post_id,))
+        cursor.execute('UPDATE posts SET likes_count = 0 WHERE id = %s', (post_id,))
+        conn.commit()
+        
+        waiting = []
+        done = threading.Event()
+        
+        def monitor():
+            with connect() as mconn, mconn.cursor() as mcur:
+                while not done.is_set():
+                    mcur.execute("SELECT COUNT(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock'")
+                    waiting.append(mcur.fetchone()[0])
+                    mconn.rollback()
+                    time.sleep(0.01)
+        
+        def like(user_id):
+            started = time.perf_counter()
+            handler(post_event({'action': 'like', 'user_id': user_id, 'post_id': post_id}), None)
+            return (time.perf_counter() - started) * 1000
+        
+        watcher = threading.Thread(target=monitor)
+        watcher.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(like, likers))
+        elapsed = time.perf_counter() - started
+        done.set()
+        watcher.join()
+        
+        if mode == 'behind':
+            like_events.flush(conn)
+        cursor.execute('SELECT likes_count FROM posts WHERE id = %s', (post_id,))
+        rows.append({
+            'case': f'{mode}: {args.likers} likers x {args.concurrency} threads',
+            'likes_per_s': round(args.likers / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'avg_sessions_waiting_on_locks': round(sum(waiting) / max(len(waiting), 1), 2),
+            'max_sessions_waiting_on_locks': max(waiting, default=0),
+            'final_likes_count': cursor.fetchone()[0],
+        })
+        conn.commit()
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+'''Нагрузочный прогон трёх функций против локальной базы.
+
+Засевает пользователей, дружбы, посты и лайки, затем в --threads потоках
+в течение --duration секунд вызывает handler auth, friends и posts
+напрямую по смеси действий с весами из MIX. Печатает пропускную
+способность и p50/p95/p99 по каждому действию; с --sample-rate функции
+дополнительно пишут строки instrumentation в stdout.
+
+    DATABASE_URL=... python benchmarks/load_test.py [--duration 30] [--threads 8]
+'''
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from common import (ROOT, analyze, connect, get_event, load_handler, post_event, report, seed_likes, seed_posts,
+                    seed_random_friendships, seed_users, summarize)
+
+PASSWORD = 'benchmark-password'
+
+MIX = {
+    'posts GET feed': 30,
+    'posts GET friends feed': 20,
+    'posts POST like': 15,
+    'posts POST create': 5,
+    'posts POST comment': 5,
+    'friends GET list': 10,
+    'friends GET search': 8,
+    'friends POST add': 2,
+    'auth POST login': 5,
+}
+
+
+def build_requests(users, post_range):
+    def user():
+        return random.choice(users)
+    
+    def post():
+        return random.randint(*post_range)
+    
+    return {
+        'posts GET feed': ('posts', lambda: get_event({'limit': 20})),
+        'posts GET friends feed': ('posts', lambda: get_event({'feed': 'friends', 'user_id': user(), 'limit': 20})),
+        'posts POST like': ('posts', lambda: post_event({'action': 'like', 'user_id': user(), 'post_id': post()})),
+        'posts POST create': ('posts', lambda: post_event({'action': 'create', 'user_id': user(), 'content': 'Нагрузочный пост'})),
+        'posts POST comment': ('posts', lambda: post_event({'action': 'comment', 'user_id': user(), 'post_id': post(), 'content': 'Нагрузочный комментарий'})),
+        'friends GET list': ('friends', lambda: get_event({'user_id': user(), 'limit': 50})),
+        'friends GET search': ('friends', lambda: get_event({'search': random.choice(['анн', 'иван', 'смирн', 'петров']), 'user_id': user()})),
+        'friends POST add': ('friends', lambda: post_event({'action': 'add', 'user_id': user(), 'friend_id': user()})),
+        'auth POST login': ('auth', lambda: post_event({'action': 'login', 'login': f'bench{random.randint(1, 100)}@example.com', 'password': PASSWORD})),
+    }
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--friendships', type=int, default=1_000_000)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--likes', type=int, default=5_000_000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--sample-rate', type=float, default=0)
+    args = parser.parse_args()
+    
+    os.environ['INSTRUMENT_SAMPLE_RATE'] = str(args.sample_rate)
+    os.environ['DB_POOL_MAX_SIZE'] = str(args.threads)
+    
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.users)
+    conn.commit()
+    seed_random_friendships(cursor, args.friendships)
+    seed_posts(cursor, args.posts)
+    seed_likes(cursor, args.likes)
+    
+    sys.path.insert(0, str(ROOT / 'backend' / 'auth'))
+    import passwords
+    cursor.execute('''
+        UPDATE users SET password_hash = %s
+        WHERE email IN (SELECT 'bench' || g || '@example.com' FROM generate_series(1, 100) g)
+    ''', (passwords.hash_password(PASSWORD),))
+    analyze(cursor, 'users', 'friends', 'posts', 'likes')
+    conn.commit()
+    cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+    lo, hi = cursor.fetchone()
+    cursor.execute('SELECT MIN(id), MAX(id) FROM posts')
+    post_range = cursor.fetchone()
+    conn.close()
+    
+    handlers = {name: load_handler(name) for name in ('auth', 'friends', 'posts')}
+    requests = build_requests(list(range(lo, hi + 1)), post_range)
+    names = list(MIX)
+    weights = [MIX[n] for n in names]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    
+    def worker():
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            function, make_event = requests[name]
+            event = make_event()
+            started = time.perf_counter()
+            response = handlers[function](event, None)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[name].append(elapsed)
+                if response['statusCode'] >= 500:
+                    errors[name] += 1
+    
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    
+    total = sum(len(s) for s in samples.values())
+    rows = [{'case': 'total', 'requests': total, 'rps': round(total / elapsed, 1), 'threads': args.threads}]
+    for name in names:
+        if samples[name]:
+            rows.append({**summarize(name, samples[name]), 'rps': round(len(samples[name]) / elapsed, 1),
+                         'errors_5xx': errors[name]})
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+'''Список чатов и история сообщений на 10k чатов при росте messages до 50M.
+
+Засевает 10k личных чатов, из которых в 200 участвует проверяемый
+пользователь, и добивает messages до каждого размера из --sizes. На каждом
+размере меряет p50/p99 списка чатов (первая и вторая страница), первой
+страницы истории, отправки и mark-as-read. Задержка списка чатов не
+должна расти вместе с messages: она читает только chat_members и
+chats.last_message_id.
+
+    DATABASE_URL=... python benchmarks/messages_inbox.py [--sizes 1000000,10000000,50000000]
+'''
+import argparse
+import json
+from common import analyze, connect, count_rows, get_event, load_handler, measure, post_event, report, seed_users, summarize
+
+CHATS = 10_000
+PROBE_CHATS = 200
+PROBE_USER = 1
+
+
+def seed_chats(cursor):
+    '''Чат k: участники (1, 2k) для k <= PROBE_CHATS, иначе (2k - 1, 2k).'''
+    if count_rows(cursor, 'chats') >= CHATS:
+        return
+    cursor.execute('''
+        INSERT INTO chats (id, is_group, created_by)
+        SELECT k, false, 2 * k FROM generate_series(1, %s) k
+        ON CONFLICT DO NOTHING
+    ''', (CHATS,))
+    cursor.execute('''
+        INSERT INTO chat_members (chat_id, user_id)
+        SELECT k, CASE WHEN k <= %s THEN %s ELSE 2 * k - 1 END FROM generate_series(1, %s) k
+        UNION ALL
+        SELECT k, 2 * k FROM generate_series(1, %s) k
+        ON CONFLICT DO NOTHING
+    ''', (PROBE_CHATS, PROBE_USER, CHATS, CHATS))
+    cursor.execute("SELECT setval('chats_id_seq', (SELECT MAX(id) FROM chats))")
+    cursor.connection.commit()
+
+
+def seed_messages(cursor, count):
+    existing = count_rows(cursor, 'messages')
+    batch = 1_000_000
+    for start in range(existing, count, batch):
+        cursor.execute('''
+            INSERT INTO messages (sender_id, chat_id, content, created_at)
+            SELECT CASE WHEN random() < 0.5 THEN 2 * k
+                        WHEN k <= %s THEN %s ELSE 2 * k - 1 END,
+                   k, 'Сообщение ' || g, now() - random() * interval '365 days'
+            FROM (SELECT g, 1 + floor(random() * %s)::int AS k FROM generate_series(%s, %s) g) s
+        ''', (PROBE_CHATS, PROBE_USER, CHATS, start + 1, min(start + batch, count)))
+        cursor.connection.commit()
+    cursor.execute('''
+        UPDATE chats c SET last_message_id = m.id
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id FROM messages
+            ORDER BY chat_id, created_at DESC, id DESC
+        ) m
+        WHERE c.id = m.chat_id
+    ''')
+    cursor.execute('''
+        UPDATE chat_members cm SET last_message_at = m.created_at, last_read_message_id = m.id, unread_count = 0
+        FROM chats c JOIN messages m ON m.id = c.last_message_id
+        WHERE c.id = cm.chat_id
+    ''')
+    cursor.connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000000,10000000,50000000')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, 2 * CHATS)
+    seed_chats(cursor)
+    handler = load_handler('messages')
+    rows = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        seed_messages(cursor, size)
+        analyze(cursor, 'messages', 'chats', 'chat_members')
+        conn.commit()
+
+        inbox = {'user_id': PROBE_USER, 'limit': 20}
+        rows.append(summarize(f'{size} messages: inbox', measure(lambda: handler(get_event(inbox), None), args.iterations)))
+        first = json.loads(handler(get_event(inbox), None)['body'])
+        page_two = {**inbox, 'cursor': first['next_cursor']}
+        rows.append(summarize(f'{size} messages: inbox page 2',
+                              measure(lambda: handler(get_event(page_two), None), args.iterations)))
+
+        history = {'view': 'history', 'chat_id': 1, 'user_id': PROBE_USER, 'limit': 50}
+        rows.append(summarize(f'{size} messages: history', measure(lambda: handler(get_event(history), None), args.iterations)))
+
+        send = post_event({'action': 'send', 'user_id': 2, 'chat_id': 1, 'content': 'Бенчмарк'})
+        rows.append(summarize(f'{size} messages: send', measure(lambda: handler(send, None), args.iterations)))
+        read = post_event({'action': 'read', 'user_id': PROBE_USER, 'chat_id': 1})
+        rows.append(summarize(f'{size} messages: send + read',
+                              measure(lambda: (handler(send, None), handler(read, None)), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
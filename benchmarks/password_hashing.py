@@ -0,0 +1,52 @@
+'''Подбор параметров scrypt под целевое время проверки пароля (~50 мс).
+
+База не нужна: скрипт меряет verify_password из backend/auth/passwords.py
+для нескольких значений N и пропускную способность пула при всплеске входов.
+
+    python benchmarks/password_hashing.py [--target-ms 50] [--burst 32]
+'''
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common import ROOT, measure, report, summarize
+
+sys.path.insert(0, str(ROOT / 'backend' / 'auth'))
+import passwords
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target-ms', type=float, default=50)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--burst', type=int, default=32)
+    args = parser.parse_args()
+    
+    rows = []
+    best = None
+    for log_n in range(12, 18):
+        n = 2 ** log_n
+        stored = passwords.hash_password('benchmark-password', n=n)
+        row = summarize(f'scrypt N=2^{log_n} r={passwords.SCRYPT_R} p={passwords.SCRYPT_P}',
+                        measure(lambda: passwords.verify_password('benchmark-password', stored), args.iterations, warmup=1))
+        rows.append(row)
+        if row['p50_ms'] <= args.target_ms:
+            best = log_n
+    rows.append({'recommended_PASSWORD_SCRYPT_N': 2 ** best if best else None, 'target_ms': args.target_ms})
+    
+    stored = passwords.hash_password('benchmark-password')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.burst) as clients:
+        results = list(clients.map(lambda _: passwords.verify_password('benchmark-password', stored), range(args.burst)))
+    elapsed = time.perf_counter() - started
+    rows.append({
+        'case': f'burst of {args.burst} logins, {passwords.WORKERS} hash workers',
+        'verified': sum(results),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'logins_per_s': round(args.burst / elapsed, 1),
+    })
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''Задержка поиска людей (GET friends?search=...) на 1M и 10M пользователей.
+
+Меряет короткий префикс, полное «имя фамилия», опечатку, номер телефона и
+вторую страницу по cursor для пользователя с 200 друзьями.
+
+    DATABASE_URL=... python benchmarks/people_search.py [--sizes 1000000,10000000]
+'''
+import argparse
+import json
+from common import analyze, connect, get_event, load_handler, measure, report, seed_friendships, seed_users, summarize
+
+QUERIES = {
+    'prefix': 'ива',
+    'full name': 'анна смирнов',
+    'typo': 'дмитри волкав',
+    'phone': '900000123',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000000,10000000')
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+    
+    conn = connect()
+    cursor = conn.cursor()
+    handler = load_handler('friends')
+    rows = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        seed_users(cursor, size)
+        cursor.execute('SELECT MIN(id) FROM users')
+        probe_id = cursor.fetchone()[0]
+        seed_friendships(cursor, probe_id, range(probe_id + 1, probe_id + 201))
+        analyze(cursor, 'users', 'friends')
+        conn.commit()
+        
+        for label, term in QUERIES.items():
+            params = {'search': term, 'user_id': probe_id}
+            rows.append(summarize(f'{size} users: {label}',
+                                  measure(lambda: handler(get_event(params), None), args.iterations)))
+        
+        first = json.loads(handler(get_event({'search': 'ива', 'user_id': probe_id}), None)['body'])
+        if first['next_cursor']:
+            params = {'search': 'ива', 'user_id': probe_id, 'cursor': first['next_cursor']}
+            rows.append(summarize(f'{size} users: prefix, page 2',
+                                  measure(lambda: handler(get_event(params), None), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
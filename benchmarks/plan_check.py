@@ -0,0 +1,216 @@
+'''Проверка планов запросов auth, communities, friends, messages и posts на засеянной базе.
+
+Прогоняет по сценарию настоящие handler всех функций, записывает
+каждый выполненный ими SQL-запрос с подставленными параметрами и затем
+выполняет для него EXPLAIN (ANALYZE, BUFFERS) в транзакции с откатом.
+Если повтор запроса падает (например, INSERT регистрации нарушает
+уникальность, потому что уже закоммичен), план снимается обычным EXPLAIN
+без выполнения, а ошибка попадает в строку отчёта.
+Для каждого запроса печатается время, буферы и узлы плана; если в плане
+есть Seq Scan по таблице больше --min-rows строк, скрипт завершается с
+кодом 1. Сценарий меняет несколько строк (пост, лайк, заявка), поэтому
+запускать его стоит на базе бенчмарков:
+
+    DATABASE_URL=... python benchmarks/seed.py --scale 10 --seed 42 --reset
+    DATABASE_URL=... python benchmarks/plan_check.py [--min-rows 10000]
+'''
+import argparse
+import json
+import random
+import sys
+import time
+import psycopg2
+from common import connect, get_event, load_handler, post_event, report
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+class Recorder:
+    '''Подменяет TimedCursor.execute и копит запросы текущего шага сценария.'''
+
+    def __init__(self, instrumentation):
+        self.statements = []
+        self.step = None
+        original = instrumentation.TimedCursor.execute
+        recorder = self
+
+        def execute(cursor, query, vars=None):
+            recorder.statements.append((recorder.step, cursor.mogrify(query, vars).decode()))
+            return original(cursor, query, vars)
+
+        instrumentation.TimedCursor.execute = execute
+
+
+def scenario(handlers, user_id, friend_id, post_id, community_id):
+    '''Шаги (название, функция, событие) по всем режимам GET и действиям POST.'''
+    phone = f'+7999{random.randrange(10 ** 8):08d}'
+    registered = call(handlers, 'auth', post_event({
+        'action': 'register', 'phone': phone, 'email': f'plan{phone[1:]}@example.com',
+        'password': 'plan-check-password', 'first_name': 'Анна', 'last_name': 'Смирнова'
+    }))
+    token_headers = {'X-Auth-Token': registered.get('token', '')}
+    new_user = registered.get('user', {}).get('id')
+    first_page = call(handlers, 'posts', get_event({'limit': 20}))
+    chat_id = call(handlers, 'messages', post_event({'action': 'create', 'user_id': new_user, 'member_ids': [friend_id]})).get('chat_id')
+
+    steps = [
+        ('auth login', 'auth', post_event({'action': 'login', 'login': phone, 'password': 'plan-check-password'})),
+        ('auth check_token', 'auth', post_event({'action': 'check_token'}, token_headers)),
+        ('auth heartbeat', 'auth', post_event({'action': 'heartbeat'}, token_headers)),
+        ('posts feed', 'posts', get_event({'limit': 20})),
+        ('posts feed cursor', 'posts', get_event({'limit': 20, 'cursor': first_page.get('next_cursor') or ''})),
+        ('posts feed comments_preview', 'posts', get_event({'limit': 20, 'comments_preview': 3})),
+        ('posts user', 'posts', get_event({'user_id': user_id, 'limit': 20})),
+        ('posts friends feed', 'posts', get_event({'feed': 'friends', 'user_id': user_id, 'limit': 20})),
+        ('posts tag feed', 'posts', get_event({'view': 'tag', 'tag': 'tag1', 'limit': 20})),
+        ('posts trending', 'posts', get_event({'view': 'trending', 'limit': 10})),
+        ('posts comments', 'posts', get_event({'view': 'comments', 'post_id': post_id, 'limit': 20})),
+        ('posts create', 'posts', post_event({'action': 'create', 'user_id': user_id, 'content': 'План запроса'})),
+        ('posts like', 'posts', post_event({'action': 'like', 'user_id': user_id, 'post_id': post_id})),
+        ('posts comment', 'posts', post_event({'action': 'comment', 'user_id': user_id, 'post_id': post_id, 'content': 'План'})),
+        ('posts repost', 'posts', post_event({'action': 'repost', 'user_id': user_id, 'post_id': post_id})),
+        ('posts batch', 'posts', post_event({'action': 'batch', 'user_id': user_id, 'items': [
+            {'action': 'like', 'post_id': post_id}, {'action': 'like', 'post_id': post_id}]})),
+        ('friends list', 'friends', get_event({'user_id': user_id})),
+        ('friends list page', 'friends', get_event({'user_id': user_id, 'limit': 50, 'cursor': 1})),
+        ('friends count_only', 'friends', get_event({'user_id': user_id, 'count_only': 1})),
+        ('friends search', 'friends', get_event({'user_id': user_id, 'search': 'Смирн'})),
+        ('friends relations', 'friends', get_event({'user_id': user_id, 'view': 'relations', 'ids': f'{friend_id},{new_user}'})),
+        ('friends suggestions', 'friends', get_event({'user_id': user_id, 'view': 'suggestions'})),
+        ('friends add', 'friends', post_event({'action': 'add', 'user_id': new_user, 'friend_id': friend_id})),
+        ('friends accept', 'friends', post_event({'action': 'accept', 'user_id': friend_id, 'friend_id': new_user})),
+        ('friends remove', 'friends', post_event({'action': 'remove', 'user_id': new_user, 'friend_id': friend_id})),
+        ('friends reject', 'friends', post_event({'action': 'reject', 'user_id': friend_id, 'friend_id': new_user})),
+        ('messages create', 'messages', post_event({'action': 'create', 'user_id': new_user, 'member_ids': [friend_id]})),
+        ('messages send', 'messages', post_event({'action': 'send', 'user_id': friend_id, 'chat_id': chat_id, 'content': 'План'})),
+        ('messages inbox', 'messages', get_event({'user_id': new_user})),
+        ('messages history', 'messages', get_event({'user_id': new_user, 'view': 'history', 'chat_id': chat_id})),
+        ('messages read', 'messages', post_event({'action': 'read', 'user_id': new_user, 'chat_id': chat_id})),
+        ('communities list', 'communities', get_event({'user_id': user_id, 'limit': 20})),
+        ('communities join', 'communities', post_event({'action': 'join', 'user_id': new_user, 'community_id': community_id})),
+        ('communities post', 'communities', post_event({'action': 'post', 'user_id': new_user, 'community_id': community_id, 'content': 'План'})),
+        ('communities feed', 'communities', get_event({'community_id': community_id, 'limit': 20})),
+        ('communities my feed', 'communities', get_event({'feed': 'my', 'user_id': new_user, 'limit': 20})),
+        ('communities leave', 'communities', post_event({'action': 'leave', 'user_id': new_user, 'community_id': community_id})),
+        ('auth logout', 'auth', post_event({'action': 'logout'}, token_headers)),
+    ]
+    return steps
+
+
+def call(handlers, function, event):
+    response = handlers[function](event, None)
+    try:
+        return json.loads(response.get('body') or '{}')
+    except ValueError:
+        return {}
+
+
+def table_sizes(cursor):
+    cursor.execute('''
+        SELECT c.relname, c.reltuples::bigint
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND n.nspname = current_schema()
+    ''')
+    return dict(cursor.fetchall())
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def explain(conn, sql, analyze=True):
+    '''EXPLAIN (ANALYZE, BUFFERS) с откатом, чтобы записи не применялись дважды.'''
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(f'EXPLAIN ({options}) {sql}')
+            return cursor.fetchone()[0][0]
+        finally:
+            conn.rollback()
+
+
+def check(conn, statements, sizes, min_rows):
+    rows, failures, seen = [], [], set()
+    for step, sql in statements:
+        if not sql.lstrip().upper().startswith(EXPLAINABLE) or sql in seen:
+            continue
+        seen.add(sql)
+        error = None
+        try:
+            result = explain(conn, sql)
+        except psycopg2.Error as e:
+            error = str(e).strip().splitlines()[0]
+            try:
+                result = explain(conn, sql, analyze=False)
+            except psycopg2.Error:
+                rows.append({'step': step, 'sql': ' '.join(sql.split())[:160], 'error': error})
+                continue
+        nodes = list(walk(result['Plan']))
+        seq_scans = sorted({n['Relation Name'] for n in nodes
+                            if n['Node Type'] == 'Seq Scan' and sizes.get(n.get('Relation Name'), 0) >= min_rows})
+        row = {
+            'step': step,
+            'sql': ' '.join(sql.split())[:160],
+            'execution_ms': round(result['Execution Time'], 3) if 'Execution Time' in result else None,
+            'shared_hit': result['Plan'].get('Shared Hit Blocks', 0),
+            'shared_read': result['Plan'].get('Shared Read Blocks', 0),
+            'nodes': sorted({n['Node Type'] for n in nodes}),
+            'seq_scan_large': seq_scans,
+        }
+        if error:
+            row['error'] = error
+        rows.append(row)
+        if seq_scans:
+            failures.append(row)
+    return rows, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--min-rows', type=int, default=10_000, help='с какого размера таблица считается большой')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    conn = connect()
+    cursor = conn.cursor()
+    sizes = table_sizes(cursor)
+    cursor.execute('''
+        SELECT user_id, COUNT(*) FROM friends WHERE status = 'accepted'
+        GROUP BY user_id ORDER BY COUNT(*) DESC, user_id LIMIT 2
+    ''')
+    (user_id, _), (friend_id, _) = cursor.fetchall()
+    cursor.execute('SELECT id FROM posts ORDER BY likes_count DESC, id LIMIT 1')
+    post_id = cursor.fetchone()[0]
+    cursor.execute('SELECT id FROM communities ORDER BY members_count DESC NULLS LAST, id LIMIT 1')
+    community = cursor.fetchone()
+    conn.rollback()
+
+    handlers = {name: load_handler(name) for name in ('auth', 'communities', 'friends', 'messages', 'posts')}
+    import instrumentation
+    recorder = Recorder(instrumentation)
+    recorder.step = 'setup'
+    steps = scenario(handlers, user_id, friend_id, post_id, community[0] if community else None)
+    if not community:
+        steps = [s for s in steps if s[1] != 'communities']
+        report([{'skipped': 'communities', 'reason': 'no communities in the database'}])
+    for step, function, event in steps:
+        recorder.step = step
+        started = time.perf_counter()
+        response = handlers[function](event, None)
+        if response['statusCode'] >= 500:
+            print(json.dumps({'step': step, 'error': response['body']}, ensure_ascii=False), file=sys.stderr)
+        report([{'step': step, 'status': response['statusCode'], 'ms': round((time.perf_counter() - started) * 1000, 2)}])
+
+    rows, failures = check(conn, recorder.statements, sizes, args.min_rows)
+    report(rows)
+    report([{'queries': len(rows), 'seq_scan_failures': len(failures), 'min_rows': args.min_rows}])
+    conn.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
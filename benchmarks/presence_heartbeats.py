@@ -0,0 +1,95 @@
+'''Стоимость записи присутствия для 100k клиентов, шлющих heartbeat.
+
+Клиенты пингуют раз в --ping-interval секунд в течение --minutes минут
+виртуального времени. «До» — UPDATE users SET online, last_seen на каждый
+пинг с коммитом; «после» — буфер presence.py со сбросом одним
+UPDATE ... FROM (VALUES ...) раз в PRESENCE_FLUSH_INTERVAL секунд или при
+PRESENCE_BUFFER_MAX записях. Для каждого режима печатаются число
+запросов и коммитов, обновлённых строк, объём WAL и время.
+
+    DATABASE_URL=... python benchmarks/presence_heartbeats.py [--clients 100000]
+'''
+import argparse
+import sys
+import time
+from common import ROOT, connect, report, seed_users
+
+
+def wal_lsn(cursor):
+    cursor.execute('SELECT pg_current_wal_lsn()')
+    return cursor.fetchone()[0]
+
+
+def wal_bytes(cursor, since):
+    cursor.execute('SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)', (since,))
+    return int(cursor.fetchone()[0])
+
+
+def pings(clients, ping_interval, minutes):
+    '''(виртуальная секунда, user_id) в порядке времени; клиенты равномерно разнесены.'''
+    for second in range(int(minutes * 60)):
+        for user_id in range(second % ping_interval or ping_interval, clients + 1, ping_interval):
+            yield second, user_id
+
+
+def per_ping(conn, clients, ping_interval, minutes):
+    cursor = conn.cursor()
+    started_lsn, started = wal_lsn(cursor), time.perf_counter()
+    statements = rows = 0
+    for _, user_id in pings(clients, ping_interval, minutes):
+        cursor.execute('UPDATE users SET online = true, last_seen = now() WHERE id = %s', (user_id,))
+        rows += cursor.rowcount
+        statements += 1
+        conn.commit()
+    return {'case': 'per-ping UPDATE', 'statements': statements, 'commits': statements, 'rows_updated': rows,
+            'wal_mb': round(wal_bytes(cursor, started_lsn) / 2 ** 20, 1), 'seconds': round(time.perf_counter() - started, 1)}
+
+
+def buffered(conn, presence, clients, ping_interval, minutes):
+    cursor = conn.cursor()
+    started_lsn, started = wal_lsn(cursor), time.perf_counter()
+    base = time.time()
+    statements = rows = 0
+    flushed_at = 0
+    for tick, user_id in pings(clients, ping_interval, minutes):
+        if tick - flushed_at >= presence.FLUSH_INTERVAL or len(presence.buffer) >= presence.BUFFER_MAX:
+            rows += presence.flush(cursor)
+            conn.commit()
+            statements += 1
+            flushed_at = tick
+        presence.buffer.record(user_id, base + tick)
+    if len(presence.buffer):
+        rows += presence.flush(cursor)
+        conn.commit()
+        statements += 1
+    return {'case': f'buffered, flush every {presence.FLUSH_INTERVAL:g}s', 'statements': statements,
+            'commits': statements, 'rows_updated': rows,
+            'wal_mb': round(wal_bytes(cursor, started_lsn) / 2 ** 20, 1), 'seconds': round(time.perf_counter() - started, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=100_000)
+    parser.add_argument('--ping-interval', type=int, default=30)
+    parser.add_argument('--minutes', type=float, default=2)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT / 'backend' / 'auth'))
+    import presence
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.clients)
+    cursor.execute('CHECKPOINT')
+    conn.commit()
+
+    rows = [per_ping(conn, args.clients, args.ping_interval, args.minutes)]
+    cursor.execute('CHECKPOINT')
+    conn.commit()
+    rows.append(buffered(conn, presence, args.clients, args.ping_interval, args.minutes))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
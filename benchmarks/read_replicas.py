@@ -0,0 +1,68 @@
+'''Чтение с реплик: задержка GET и проверка read-your-writes.
+
+Нужны primary (DATABASE_URL) и хотя бы одна реплика (DATABASE_READ_URL).
+Локально хватает двух инстансов PostgreSQL с потоковой репликацией:
+
+    initdb -D /tmp/pg1 && pg_ctl -D /tmp/pg1 -o '-p 5432' start
+    pg_basebackup -D /tmp/pg2 -p 5432 -R && pg_ctl -D /tmp/pg2 -o '-p 5433' start
+    DATABASE_URL=postgresql://localhost:5432/bench \\
+    DATABASE_READ_URL=postgresql://localhost:5433/bench python benchmarks/read_replicas.py
+
+Сравнивает ленту и список друзей только из primary и через реплики
+(round_robin и least_latency), затем --checks раз создаёт пост и сразу
+читает ленту автора с X-Last-Write: пост должен быть виден всегда.
+Печатает счётчики маршрутизатора (реплика, primary по записи, fallback).
+'''
+import argparse
+import json
+import os
+import random
+from common import get_event, load_handler, measure, post_event, report, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--checks', type=int, default=200)
+    args = parser.parse_args()
+
+    replicas = os.environ.pop('DATABASE_READ_URL', '')
+    if not replicas:
+        raise SystemExit('DATABASE_READ_URL is required')
+    posts = load_handler('posts')
+    friends = load_handler('friends')
+    import db
+
+    rows = []
+    reads = {
+        'posts feed': (posts, {'limit': 20}),
+        'friends list': (friends, {'user_id': 1, 'limit': 50}),
+    }
+    for label, (handler, params) in reads.items():
+        rows.append(summarize(f'{label}: primary', measure(lambda: handler(get_event(params), None), args.iterations)))
+
+    os.environ['DATABASE_READ_URL'] = replicas
+    for strategy in ('round_robin', 'least_latency'):
+        db.READ_STRATEGY = strategy
+        db._router = None
+        for label, (handler, params) in reads.items():
+            rows.append(summarize(f'{label}: replicas, {strategy}',
+                                  measure(lambda: handler(get_event(params), None), args.iterations)))
+        rows.append({'case': f'router {strategy}', **db.get_router().stats()})
+
+    db._router = None
+    missed = 0
+    for i in range(args.checks):
+        user_id = random.randint(1, 1000)
+        created = posts(post_event({'action': 'create', 'user_id': user_id, 'content': f'Проверка реплики {i}'}), None)
+        post_id = json.loads(created['body'])['post']['id']
+        event = get_event({'user_id': user_id, 'limit': 5})
+        event['headers'] = {'X-Last-Write': created['headers'].get('X-Last-Write', '')}
+        page = json.loads(posts(event, None)['body'])
+        missed += post_id not in {post['id'] for post in page['posts']}
+    rows.append({'case': 'read-your-writes', 'checks': args.checks, 'missed': missed, **db.get_router().stats()})
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
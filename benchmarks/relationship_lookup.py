@@ -0,0 +1,79 @@
+'''Статус отношений и общие друзья для страницы пользователей: по запросу на
+каждого против одного GET friends?view=relations.
+
+Пользователь с 300 друзьями и несколькими заявками смотрит на 20, 100 и
+500 случайных людей, часть которых — его друзья.
+
+    DATABASE_URL=... python benchmarks/relationship_lookup.py [--users 1000000]
+'''
+import argparse
+import random
+from common import (analyze, connect, get_event, load_handler, measure, report, seed_friendships,
+                    seed_random_friendships, seed_users, summarize)
+
+SIZES = (20, 100, 500)
+
+
+def per_user_lookup(cursor, user_id, ids):
+    '''Прежний путь: запрос статуса и запрос общих друзей на каждого.'''
+    for other in ids:
+        cursor.execute('''
+            SELECT status FROM friends
+            WHERE (user_id = %s AND friend_id = %s) OR (user_id = %s AND friend_id = %s)
+        ''', (user_id, other, other, user_id))
+        cursor.fetchall()
+        cursor.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT id FROM (
+                    SELECT friend_id AS id FROM friends WHERE user_id = %(a)s AND status = 'accepted'
+                    UNION ALL
+                    SELECT user_id FROM friends WHERE friend_id = %(a)s AND status = 'accepted'
+                ) mine
+                INTERSECT
+                SELECT id FROM (
+                    SELECT friend_id AS id FROM friends WHERE user_id = %(b)s AND status = 'accepted'
+                    UNION ALL
+                    SELECT user_id FROM friends WHERE friend_id = %(b)s AND status = 'accepted'
+                ) theirs
+            ) m
+        ''', {'a': user_id, 'b': other})
+        cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--friendships', type=int, default=10_000_000)
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.users)
+    conn.commit()
+    seed_random_friendships(cursor, args.friendships)
+    cursor.execute('SELECT MIN(id) FROM users')
+    probe_id = cursor.fetchone()[0]
+    friend_ids = list(range(probe_id + 1, probe_id + 301))
+    seed_friendships(cursor, probe_id, friend_ids)
+    analyze(cursor, 'users', 'friends')
+    conn.commit()
+
+    handler = load_handler('friends')
+    rng = random.Random(42)
+    rows = []
+    for size in SIZES:
+        ids = rng.sample(friend_ids, size // 4) + [rng.randint(probe_id + 301, probe_id + args.users - 1)
+                                                   for _ in range(size - size // 4)]
+        rows.append(summarize(f'{size} ids: per-user queries',
+                              measure(lambda: per_user_lookup(cursor, probe_id, ids), args.iterations)))
+        conn.rollback()
+        params = {'view': 'relations', 'user_id': probe_id, 'ids': ','.join(map(str, ids))}
+        rows.append(summarize(f'{size} ids: view=relations',
+                              measure(lambda: handler(get_event(params), None), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
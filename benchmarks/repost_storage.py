@@ -0,0 +1,83 @@
+'''Сколько места занимает репост копией и репост ссылкой.
+
+Засевает посты с длинным текстом и репосты-копии так, как их писал
+прежний repost (тот же content, media_urls и post_type), и меряет размер
+таблицы posts, её TOAST и индексов. Затем применяет V0011 и проверяет, что
+копии остались как есть: отличить их от обычных постов нельзя. Наконец
+заменяет копии тем же числом репостов-ссылок, как их пишет repost сейчас,
+и меряет снова. Запускать на отдельной базе.
+
+    DATABASE_URL=... python benchmarks/repost_storage.py [--originals 100000] [--reposts 5]
+'''
+import argparse
+from common import ROOT, connect, report, seed_users
+
+SIZES_SQL = '''
+    SELECT pg_relation_size('posts') AS heap_bytes,
+           COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0) AS toast_bytes,
+           pg_indexes_size('posts') AS index_bytes,
+           pg_total_relation_size('posts') AS total_bytes
+    FROM pg_class c
+    WHERE c.oid = 'posts'::regclass
+'''
+
+
+def sizes(cursor, label):
+    cursor.execute(SIZES_SQL)
+    heap, toast, index, total = cursor.fetchone()
+    return {'case': label, 'heap_mb': round(heap / 2 ** 20, 1), 'toast_mb': round(toast / 2 ** 20, 1),
+            'index_mb': round(index / 2 ** 20, 1), 'total_mb': round(total / 2 ** 20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--originals', type=int, default=100_000)
+    parser.add_argument('--reposts', type=int, default=5, help='копий на исходный пост')
+    parser.add_argument('--content-bytes', type=int, default=4000)
+    args = parser.parse_args()
+    
+    conn = connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    seed_users(cursor, 10_000)
+    cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+    lo, hi = cursor.fetchone()
+    cursor.execute('TRUNCATE posts CASCADE')
+    cursor.execute('''
+        INSERT INTO posts (user_id, content, media_urls, created_at)
+        SELECT %s + g %% (%s - %s), repeat(md5(g::text), %s / 32),
+               ARRAY['https://cdn.example.com/' || g || '.jpg'], now() - interval '30 days'
+        FROM generate_series(1, %s) g
+    ''', (lo, hi, lo, args.content_bytes, args.originals))
+    cursor.execute('SELECT MAX(id) FROM posts')
+    last_original = cursor.fetchone()[0]
+    cursor.execute('''
+        INSERT INTO posts (user_id, content, post_type, media_urls, created_at)
+        SELECT CASE WHEN p.user_id = %s THEN %s ELSE p.user_id + 1 END,
+               p.content, p.post_type, p.media_urls, p.created_at + k * interval '1 hour'
+        FROM posts p, generate_series(1, %s) k
+    ''', (hi, lo, args.reposts))
+    cursor.execute('VACUUM FULL ANALYZE posts')
+    copies = args.originals * args.reposts
+    rows = [sizes(cursor, f'{args.originals} originals + {copies} copied reposts')]
+    
+    cursor.execute((ROOT / 'db_migrations' / 'V0011__reposts_by_reference.sql').read_text())
+    cursor.execute('SELECT COUNT(*) FROM posts WHERE original_post_id IS NOT NULL')
+    rows.append({'case': 'legacy copies converted by V0011', 'rows': cursor.fetchone()[0]})
+    
+    cursor.execute('DELETE FROM posts WHERE id > %s', (last_original,))
+    cursor.execute('''
+        INSERT INTO posts (user_id, content, post_type, original_post_id, created_at)
+        SELECT CASE WHEN p.user_id = %s THEN %s ELSE p.user_id + 1 END,
+               '', 'repost', p.id, p.created_at + k * interval '1 hour'
+        FROM posts p, generate_series(1, %s) k
+    ''', (hi, lo, args.reposts))
+    cursor.execute('VACUUM FULL ANALYZE posts')
+    rows.append(sizes(cursor, f'{args.originals} originals + {copies} reposts by reference'))
+    rows.append({'case': 'difference', **{k: round(rows[0][k] - rows[2][k], 1) for k in ('heap_mb', 'toast_mb', 'index_mb', 'total_mb')}})
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
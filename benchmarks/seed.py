@@ -0,0 +1,205 @@
+'''Воспроизводимый генератор синтетических данных для схемы db_migrations.
+
+Масштаб 1 — 10k пользователей, 100k постов, около 100k дружб, 500k
+лайков и 50 сообществ с участниками и постами; всё растёт линейно с --scale. Распределения скошенные:
+степени в графе дружбы, активность авторов и популярность постов
+подчиняются степенному закону (Zipf с показателем --alpha). Одинаковые
+--scale и --seed дают одинаковые данные. Загрузка идёт через COPY.
+
+    DATABASE_URL=... python benchmarks/seed.py --scale 10 --seed 42 --reset
+'''
+import argparse
+import io
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from common import FIRST_NAMES, LAST_NAMES, analyze, connect
+
+BASE_TIME = datetime(2024, 1, 1)
+PERIOD_SECONDS = 365 * 24 * 3600
+
+USERS_PER_SCALE = 10_000
+POSTS_PER_USER = 10
+FRIENDS_PER_USER = 10
+LIKES_PER_POST = 5
+COMMUNITIES_PER_SCALE = 50
+COMMUNITIES_PER_USER = 3
+POSTS_PER_COMMUNITY = 200
+INTERESTS = ['Кулинария', 'Путешествия', 'Спорт', 'Музыка', 'Кино', 'Книги', 'Фото', 'IT', 'Игры', 'Наука']
+
+
+class IteratorFile(io.TextIOBase):
+    '''Файл для copy_expert поверх генератора строк TSV.'''
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = ''.join(itertools.islice(self._lines, 1000))
+            if not chunk:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    readline = read
+
+
+def zipf_weights(n, alpha, rng):
+    '''Веса по закону Zipf, перемешанные по id, чтобы «звёзды» не шли подряд.'''
+    weights = [1 / (rank ** alpha) for rank in range(1, n + 1)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def timestamp(rng):
+    return BASE_TIME + timedelta(seconds=rng.randrange(PERIOD_SECONDS))
+
+
+def copy_rows(cursor, table, columns, rows):
+    lines = ('\t'.join('\\N' if v is None else str(v) for v in row) + '\n' for row in rows)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", IteratorFile(lines))
+
+
+def users_rows(count, rng):
+    for i in range(1, count + 1):
+        yield (f'+7900{i:08d}', f'bench{i}@example.com', 'x',
+               rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), timestamp(rng))
+
+
+def interests_rows(count, rng):
+    for user_id in range(1, count + 1):
+        for interest in rng.sample(INTERESTS, rng.randint(1, 4)):
+            yield user_id, interest
+
+
+def friends_rows(users, edges, cum_weights, rng):
+    '''Рёбра с концами, выбранными пропорционально весам: степенной закон степеней.'''
+    seen = set()
+    population = range(1, users + 1)
+    while len(seen) < edges:
+        batch = rng.choices(population, cum_weights=cum_weights, k=2 * (edges - len(seen)))
+        for a, b in zip(batch[::2], batch[1::2]):
+            key = (min(a, b), max(a, b))
+            if a == b or key in seen:
+                continue
+            seen.add(key)
+            status = 'accepted' if rng.random() < 0.85 else 'pending'
+            yield a, b, status, timestamp(rng)
+            if len(seen) >= edges:
+                break
+
+
+def posts_rows(count, users, cum_weights, rng):
+    authors = rng.choices(range(1, users + 1), cum_weights=cum_weights, k=count)
+    for i, author in enumerate(authors, 1):
+        created_at = timestamp(rng)
+        yield author, f'Синтетический пост {i} #тег{rng.randint(1, 500)}', 'text', created_at, created_at
+
+
+def likes_rows(count, users, posts, post_weights, rng):
+    seen = set()
+    while len(seen) < count:
+        post_ids = rng.choices(range(1, posts + 1), cum_weights=post_weights, k=count - len(seen))
+        for post_id in post_ids:
+            user_id = rng.randint(1, users)
+            if (user_id, post_id) in seen:
+                continue
+            seen.add((user_id, post_id))
+            yield user_id, post_id, timestamp(rng)
+
+
+def communities_rows(count, users, rng):
+    for i in range(1, count + 1):
+        yield f'Сообщество {i}', rng.choice(INTERESTS), rng.randint(1, users), timestamp(rng)
+
+
+def community_members_rows(users, communities, community_weights, rng):
+    '''Каждый пользователь в 0..COMMUNITIES_PER_USER сообществах; популярность по Zipf.'''
+    population = range(1, communities + 1)
+    for user_id in range(1, users + 1):
+        picked = rng.choices(population, cum_weights=community_weights, k=rng.randint(0, COMMUNITIES_PER_USER))
+        for community_id in set(picked):
+            yield community_id, user_id, timestamp(rng)
+
+
+def community_posts_rows(count, communities, users, rng):
+    for i in range(1, count + 1):
+        yield rng.randint(1, communities), rng.randint(1, users), f'Пост сообщества {i}', timestamp(rng)
+
+
+def seed(conn, scale, seed_value, alpha=1.1, reset=False):
+    rng = random.Random(seed_value)
+    users = int(USERS_PER_SCALE * scale)
+    posts = users * POSTS_PER_USER
+    edges = users * FRIENDS_PER_USER
+    likes = posts * LIKES_PER_POST
+    communities = max(1, int(COMMUNITIES_PER_SCALE * scale))
+    cursor = conn.cursor()
+    timings = {}
+
+    if reset:
+        cursor.execute('''
+            TRUNCATE users, user_interests, posts, friends, likes,
+                     communities, community_members, community_posts RESTART IDENTITY CASCADE
+        ''')
+
+    user_weights = zipf_weights(users, alpha, rng)
+    steps = [
+        ('users', lambda: copy_rows(cursor, 'users', ['phone', 'email', 'password_hash', 'first_name', 'last_name', 'created_at'], users_rows(users, rng))),
+        ('user_interests', lambda: copy_rows(cursor, 'user_interests', ['user_id', 'interest'], interests_rows(users, rng))),
+        ('friends', lambda: copy_rows(cursor, 'friends', ['user_id', 'friend_id', 'status', 'created_at'], friends_rows(users, edges, user_weights, rng))),
+        ('posts', lambda: copy_rows(cursor, 'posts', ['user_id', 'content', 'post_type', 'created_at', 'updated_at'], posts_rows(posts, users, user_weights, rng))),
+        ('likes', lambda: copy_rows(cursor, 'likes', ['user_id', 'post_id', 'created_at'], likes_rows(likes, users, posts, zipf_weights(posts, alpha, rng), rng))),
+        ('communities', lambda: copy_rows(cursor, 'communities', ['name', 'category', 'created_by', 'created_at'], communities_rows(communities, users, rng))),
+        ('community_members', lambda: copy_rows(cursor, 'community_members', ['community_id', 'user_id', 'joined_at'], community_members_rows(users, communities, zipf_weights(communities, alpha, rng), rng))),
+        ('community_posts', lambda: copy_rows(cursor, 'community_posts', ['community_id', 'user_id', 'content', 'created_at'], community_posts_rows(communities * POSTS_PER_COMMUNITY, communities, users, rng))),
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        conn.commit()
+        timings[name] = round(time.perf_counter() - started, 2)
+
+    cursor.execute('''
+        UPDATE posts p SET likes_count = l.cnt
+        FROM (SELECT post_id, COUNT(*) AS cnt FROM likes GROUP BY post_id) l
+        WHERE p.id = l.post_id
+    ''')
+    cursor.execute('''
+        UPDATE communities c
+        SET members_count = (SELECT COUNT(*) FROM community_members m WHERE m.community_id = c.id)
+    ''')
+    analyze(cursor, 'users', 'user_interests', 'friends', 'posts', 'likes', 'communities', 'community_members', 'community_posts')
+    conn.commit()
+    return {'scale': scale, 'seed': seed_value, 'users': users, 'posts': posts, 'friendships': edges,
+            'likes': likes, 'communities': communities, 'seconds': timings}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--alpha', type=float, default=1.1, help='показатель степенного закона')
+    parser.add_argument('--reset', action='store_true', help='очистить таблицы перед загрузкой')
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        print(json.dumps(seed(conn, args.scale, args.seed, args.alpha, args.reset), ensure_ascii=False))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
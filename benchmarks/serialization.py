@@ -0,0 +1,70 @@
+'''Сериализация страницы ленты: прежний путь против backend/posts/responses.py.
+
+Прежний путь — копия каждой строки в dict и json.dumps(default=str); новый —
+responses.json_response (orjson, если установлен) и finalize с gzip. База не
+нужна, строки генерируются в памяти.
+
+    python benchmarks/serialization.py [--iterations N]
+'''
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from common import ROOT, measure, report, summarize
+
+sys.path.insert(0, str(ROOT / 'backend' / 'posts'))
+import responses
+
+PAGE_SIZES = (20, 100, 500)
+
+
+def make_page(size):
+    now = datetime.now()
+    return [{
+        'id': i,
+        'user_id': i % 97,
+        'content': 'Только что вернулась с вечерней прогулки в парке! Осень — это волшебное время года 🍂',
+        'post_type': 'text',
+        'media_urls': [f'https://cdn.example.com/{i}.jpg'],
+        'likes_count': i * 3,
+        'comments_count': i % 7,
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now - timedelta(minutes=i),
+        'first_name': 'Анна',
+        'last_name': 'Смирнова',
+        'avatar_url': None,
+    } for i in range(size)]
+
+
+def legacy(posts):
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'posts': [dict(post) for post in posts]}, default=str),
+        'isBase64Encoded': False
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+    
+    event = {'httpMethod': 'GET', 'headers': {'Accept-Encoding': 'gzip'}}
+    rows = [{'json_backend': 'orjson' if responses.orjson else 'json'}]
+    for size in PAGE_SIZES:
+        posts = make_page(size)
+        rows.append(summarize(f'{size} posts: legacy json.dumps',
+                              measure(lambda: legacy(posts), args.iterations)))
+        rows.append(summarize(f'{size} posts: json_response',
+                              measure(lambda: responses.json_response({'posts': posts}), args.iterations)))
+        rows.append(summarize(f'{size} posts: json_response + gzip',
+                              measure(lambda: responses.finalize(event, responses.json_response({'posts': posts})), args.iterations)))
+        plain = len(legacy(posts)['body'].encode())
+        packed = len(responses.finalize(event, responses.json_response({'posts': posts}))['body'])
+        rows.append({'case': f'{size} posts: bytes', 'legacy': plain, 'gzip_base64': packed})
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+'''Стоимость опроса ленты и заявок: полные страницы против режима since.
+
+Клиент опрашивает ленту друзей и список друзей --rounds раз; между
+опросами создаётся --writes-per-round постов, лайков и заявок в друзья. Для
+полного опроса и для since печатает число запросов, отданные байты и
+задержку одного опроса. Затем меряет long-poll: запрос с wait висит, пока
+не придёт пост, и время от коммита записи до ответа клиенту.
+
+    DATABASE_URL=... python benchmarks/sync_polling.py [--rounds 300 --writes-per-round 1]
+'''
+import argparse
+import json
+import random
+import threading
+import time
+from common import (analyze, connect, get_event, load_handler, post_event, report, seed_friendships, seed_posts,
+                    seed_users, summarize)
+
+PROBE_USER = 1
+FRIENDS = 200
+
+
+def poll(handler, params):
+    started = time.perf_counter()
+    response = handler(get_event(params), None)
+    return (time.perf_counter() - started) * 1000, len(response['body']), json.loads(response['body'])
+
+
+def run_polling(posts, friends, rounds, writes, since_mode):
+    feed = {'feed': 'friends', 'user_id': PROBE_USER, 'limit': 20}
+    requests = {'user_id': PROBE_USER}
+    if since_mode:
+        feed = {**feed, 'since': poll(posts, {**feed, 'since': 'latest'})[2]['since']}
+        requests = {**requests, 'since': poll(friends, {**requests, 'since': 'latest'})[2]['since']}
+    samples, total_bytes, delivered = [], 0, 0
+    for i in range(rounds):
+        for _ in range(writes):
+            author = random.randint(2, FRIENDS + 1)
+            posts(post_event({'action': 'create', 'user_id': author, 'content': f'Опрос {i}'}), None)
+            posts(post_event({'action': 'like', 'user_id': author, 'post_id': random.randint(1, 1000)}), None)
+            friends(post_event({'action': 'add', 'user_id': random.randint(FRIENDS + 2, 10_000),
+                                'friend_id': PROBE_USER}), None)
+        for handler, params in ((posts, feed), (friends, requests)):
+            elapsed, size, body = poll(handler, params)
+            samples.append(elapsed)
+            total_bytes += size
+            delivered += sum(len(body.get(key, [])) for key in ('posts', 'counters', 'requests'))
+            if since_mode:
+                params['since'] = body['since']
+    label = 'since' if since_mode else 'full pages'
+    return {**summarize(f'poll: {label}', samples), 'requests': len(samples), 'bytes': total_bytes,
+            'bytes_per_request': total_bytes // len(samples), 'items': delivered}
+
+
+def run_long_poll(posts, rounds, wait):
+    '''Каждый раунд: клиент ждёт с wait, писатель создаёт пост через случайную паузу.'''
+    feed = {'feed': 'friends', 'user_id': PROBE_USER, 'limit': 20}
+    since = poll(posts, {**feed, 'since': 'latest'})[2]['since']
+    samples = []
+    for i in range(rounds):
+        result = {}
+
+        def client():
+            _, _, body = poll(posts, {**feed, 'since': since, 'wait': wait})
+            result['at'] = time.perf_counter()
+            result['body'] = body
+
+        thread = threading.Thread(target=client)
+        thread.start()
+        time.sleep(random.uniform(0.05, 0.3))
+        posts(post_event({'action': 'create', 'user_id': 2, 'content': f'Long-poll {i}'}), None)
+        committed = time.perf_counter()
+        thread.join()
+        samples.append((result['at'] - committed) * 1000)
+        since = result['body']['since']
+    return summarize('long-poll: commit -> response', samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=300)
+    parser.add_argument('--writes-per-round', type=int, default=1)
+    parser.add_argument('--long-poll-rounds', type=int, default=100)
+    parser.add_argument('--wait', type=int, default=5)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, 10_000)
+    seed_posts(cursor, 100_000)
+    seed_friendships(cursor, PROBE_USER, range(2, FRIENDS + 2))
+    analyze(cursor, 'users', 'posts', 'friends')
+    conn.commit()
+    conn.close()
+
+    posts = load_handler('posts')
+    friends = load_handler('friends')
+    rows = [
+        run_polling(posts, friends, args.rounds, args.writes_per_round, since_mode=False),
+        run_polling(posts, friends, args.rounds, args.writes_per_round, since_mode=True),
+        run_long_poll(posts, args.long_poll_rounds, args.wait),
+    ]
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''Сравнение ленты друзей: fan-out-on-read против материализованных timelines.
+
+Меряет чтение первой страницы и стоимость create_post для авторов с 10, 500
+и 5000 друзьями в обоих режимах. Перед материализованным прогоном timelines
+пересобираются из friends и posts.
+
+    DATABASE_URL=... python benchmarks/timeline_strategies.py [--users N] [--posts N]
+'''
+import argparse
+import os
+import sys
+from psycopg2.extras import RealDictCursor
+from common import ROOT, analyze, connect, get_event, load_handler, measure, post_event, report, seed_friendships, seed_posts, seed_users, summarize
+
+FRIEND_COUNTS = (10, 500, 5000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--posts', type=int, default=10_000_000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--fanout-limit', type=int, default=1000)
+    args = parser.parse_args()
+    
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, args.users)
+    conn.commit()
+    seed_posts(cursor, args.posts)
+    cursor.execute('SELECT MIN(id) FROM users')
+    first_id = cursor.fetchone()[0]
+    probes = {}
+    for i, friend_count in enumerate(FRIEND_COUNTS):
+        probe_id = first_id + i
+        friend_start = first_id + 10_000 * (i + 1)
+        seed_friendships(cursor, probe_id, range(friend_start, friend_start + friend_count))
+        probes[friend_count] = probe_id
+    analyze(cursor, 'users', 'posts', 'friends')
+    conn.commit()
+    
+    handler = load_handler('posts')
+    sys.path.insert(0, str(ROOT / 'backend' / 'posts'))
+    import timeline
+    
+    rows = []
+    os.environ['TIMELINE_FANOUT_LIMIT'] = str(args.fanout_limit)
+    for mode in ('read', 'materialized'):
+        os.environ['TIMELINE_MODE'] = mode
+        if mode == 'materialized':
+            with conn.cursor(cursor_factory=RealDictCursor) as dict_cursor:
+                timeline.rebuild(dict_cursor)
+            analyze(cursor, 'timelines')
+            conn.commit()
+        for friend_count, probe_id in probes.items():
+            feed = {'feed': 'friends', 'user_id': probe_id, 'limit': 20}
+            rows.append(summarize(f'{mode}: feed read, {friend_count} friends',
+                                  measure(lambda: handler(get_event(feed), None), args.iterations)))
+            body = {'action': 'create', 'user_id': probe_id, 'content': 'benchmark'}
+            rows.append(summarize(f'{mode}: create_post, author with {friend_count} friends',
+                                  measure(lambda: handler(post_event(body), None), args.iterations // 4)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
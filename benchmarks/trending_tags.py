@@ -0,0 +1,91 @@
+'''Тренды хэштегов и лента тега при росте posts до 50M.
+
+Добивает posts до каждого размера из --sizes, примерно треть постов
+получает 1-3 хэштега со скошенной популярностью (post_tags), затем
+tags.py --backfill пересобирает корзины окна. На каждом размере меряет
+p50/p99 GET posts?view=trending из корзин (кэш трендов выключен), тот же
+топ через GROUP BY по post_tags за окно, первую и вторую страницу ленты
+популярного тега и create_post с тегами.
+
+    DATABASE_URL=... python benchmarks/trending_tags.py [--sizes 1000000,10000000,50000000]
+'''
+import argparse
+import json
+import os
+from common import analyze, connect, count_rows, get_event, load_handler, measure, post_event, report, seed_posts, seed_users, summarize
+
+os.environ.setdefault('TRENDING_CACHE_TTL', '0')
+
+TAGS = 20_000
+
+NAIVE_SQL = '''
+    SELECT tag, COUNT(*) AS posts
+    FROM post_tags
+    WHERE created_at > now()::timestamp - make_interval(secs => %s) AND left(tag, 1) = '#'
+    GROUP BY tag
+    ORDER BY posts DESC, tag
+    LIMIT 10
+'''
+
+
+def seed_tags(cursor, lo, hi):
+    '''Теги постов с id в [lo, hi]: '#tag' || k, где k скошено к малым номерам.'''
+    batch = 1_000_000
+    for start in range(lo, hi + 1, batch):
+        cursor.execute('''
+            INSERT INTO post_tags (tag, created_at, post_id)
+            SELECT '#tag' || floor(power(random(), 3) * %s)::int, p.created_at, p.id
+            FROM posts p, generate_series(1, 1 + floor(random() * 3)::int)
+            WHERE p.id >= %s AND p.id < %s AND random() < 0.33
+            ON CONFLICT DO NOTHING
+        ''', (TAGS, start, min(start + batch, hi + 1)))
+        cursor.connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000000,10000000,50000000')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    conn = connect()
+    cursor = conn.cursor()
+    seed_users(cursor, 100_000)
+    conn.commit()
+    handler = load_handler('posts')
+    import tags
+    rows = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        cursor.execute('SELECT COALESCE(MAX(post_id), 0) FROM post_tags')
+        tagged_up_to = cursor.fetchone()[0]
+        seed_posts(cursor, size)
+        cursor.execute('SELECT MAX(id) FROM posts')
+        seed_tags(cursor, tagged_up_to + 1, cursor.fetchone()[0])
+        tags.backfill(conn)
+        analyze(cursor, 'posts', 'post_tags', 'tag_buckets')
+        conn.commit()
+        label = f'{size} posts ({count_rows(cursor, "post_tags")} tags, {count_rows(cursor, "tag_buckets")} buckets)'
+
+        trending = {'view': 'trending', 'limit': 10}
+        rows.append(summarize(f'{label}: trending from buckets',
+                              measure(lambda: handler(get_event(trending), None), args.iterations)))
+
+        def naive():
+            cursor.execute(NAIVE_SQL, (tags.TRENDING_WINDOW,))
+            cursor.fetchall()
+        rows.append(summarize(f'{label}: trending GROUP BY post_tags', measure(naive, max(args.iterations // 20, 5), warmup=1)))
+
+        feed = {'view': 'tag', 'tag': 'tag1', 'limit': 20}
+        rows.append(summarize(f'{label}: tag feed', measure(lambda: handler(get_event(feed), None), args.iterations)))
+        page_two = {**feed, 'cursor': json.loads(handler(get_event(feed), None)['body'])['next_cursor']}
+        rows.append(summarize(f'{label}: tag feed page 2',
+                              measure(lambda: handler(get_event(page_two), None), args.iterations)))
+
+        create = post_event({'action': 'create', 'user_id': 1, 'content': 'Бенчмарк #tag1 #tag2 @anna'})
+        rows.append(summarize(f'{label}: create_post with tags', measure(lambda: handler(create, None), args.iterations)))
+    conn.close()
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
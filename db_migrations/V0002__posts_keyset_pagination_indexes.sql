@@ -0,0 +1,3 @@
+-- Индексы для постраничной выдачи ленты по ключу (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_posts_created_at_id ON posts(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_id_created_at_id ON posts(user_id, created_at DESC, id DESC);
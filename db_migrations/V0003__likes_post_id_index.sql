@@ -0,0 +1,6 @@
+-- Индекс для пересчёта и проверки счётчиков лайков по посту
+CREATE INDEX IF NOT EXISTS idx_likes_post_id ON likes(post_id);
+
+-- Счётчик не может быть NULL: лента читает его напрямую
+UPDATE posts SET likes_count = 0 WHERE likes_count IS NULL;
+ALTER TABLE posts ALTER COLUMN likes_count SET NOT NULL;
@@ -0,0 +1,3 @@
+-- Индексы для двусторонней выборки принятых друзей (лента друзей)
+CREATE INDEX IF NOT EXISTS idx_friends_accepted_user_id ON friends(user_id, friend_id) WHERE status = 'accepted';
+CREATE INDEX IF NOT EXISTS idx_friends_accepted_friend_id ON friends(friend_id, user_id) WHERE status = 'accepted';
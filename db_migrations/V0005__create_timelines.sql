@@ -0,0 +1,17 @@
+-- Материализованные домашние ленты (fan-out-on-write)
+CREATE TABLE IF NOT EXISTS timelines (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    author_id INTEGER NOT NULL REFERENCES users(id),
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+);
+
+-- Авторы с большим числом друзей: их посты подмешиваются при чтении
+CREATE TABLE IF NOT EXISTS timeline_pull_authors (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_timelines_user_created_at ON timelines(user_id, created_at DESC, post_id DESC);
+CREATE INDEX IF NOT EXISTS idx_timelines_user_author ON timelines(user_id, author_id);
@@ -0,0 +1,2 @@
+-- Входящие заявки в друзья: выборка по friend_id без полного сканирования
+CREATE INDEX IF NOT EXISTS idx_friends_pending_friend_id ON friends(friend_id, created_at DESC) WHERE status = 'pending';
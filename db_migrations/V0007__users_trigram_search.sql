@@ -0,0 +1,8 @@
+-- Поиск людей: триграммные индексы по «имя фамилия» и телефону
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS search_name TEXT
+    GENERATED ALWAYS AS (lower(first_name || ' ' || last_name)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_users_search_name_trgm ON users USING GIN (search_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_phone_trgm ON users USING GIN (phone gin_trgm_ops);
@@ -0,0 +1,14 @@
+-- Комментарии к постам с ветками ответов
+CREATE TABLE IF NOT EXISTS comments (
+    id SERIAL PRIMARY KEY,
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    parent_id INTEGER REFERENCES comments(id),
+    content TEXT NOT NULL,
+    replies_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_comments_post_created_at ON comments(post_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_comments_top_level ON comments(post_id, created_at DESC, id DESC) WHERE parent_id IS NULL;
+CREATE INDEX IF NOT EXISTS idx_comments_replies ON comments(parent_id, created_at, id) WHERE parent_id IS NOT NULL;
@@ -0,0 +1,9 @@
+-- Журнал лайков для отложенного обновления posts.likes_count
+CREATE TABLE IF NOT EXISTS like_events (
+    id BIGSERIAL PRIMARY KEY,
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    delta SMALLINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_like_events_post_id ON like_events(post_id);
@@ -0,0 +1,11 @@
+-- Репосты хранят ссылку на исходный пост вместо копии содержимого
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS original_post_id INTEGER REFERENCES posts(id);
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS reposts_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_posts_original_post_id ON posts(original_post_id) WHERE original_post_id IS NOT NULL;
+
+-- Старые репосты не переводятся в ссылки. Прежний repost копировал
+-- content, media_urls и post_type исходного поста и ничем не помечал
+-- копию, поэтому она неотличима от поста другого автора с тем же текстом.
+-- Такие строки остаются полными постами; ссылками хранятся только
+-- репосты, сделанные после этой миграции.
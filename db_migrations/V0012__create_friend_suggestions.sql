@@ -0,0 +1,15 @@
+-- Рекомендации «возможно, вы знакомы»: кандидаты на пользователя, пересчитываются офлайн-задачей
+CREATE TABLE IF NOT EXISTS friend_suggestions (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    candidate_id INTEGER NOT NULL REFERENCES users(id),
+    mutual_count INTEGER NOT NULL,
+    shared_interests INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, candidate_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_friend_suggestions_user_score ON friend_suggestions(user_id, score DESC, candidate_id);
+
+-- Интересы читаются офлайн-задачей целиком, а в API — по пользователю
+CREATE INDEX IF NOT EXISTS idx_user_interests_user_id ON user_interests(user_id);
@@ -0,0 +1,37 @@
+-- Входящие: последнее сообщение чата и счётчик непрочитанных у участника
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_id INTEGER REFERENCES messages(id);
+
+ALTER TABLE chat_members ADD COLUMN IF NOT EXISTS unread_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_members ADD COLUMN IF NOT EXISTS last_read_message_id INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_members ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- История чата постранично по (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_messages_chat_created_at ON messages(chat_id, created_at DESC, id DESC);
+
+-- Список чатов пользователя по последней активности
+CREATE INDEX IF NOT EXISTS idx_chat_members_user_last_message ON chat_members(user_id, last_message_at DESC, chat_id DESC);
+
+-- Заполнение для уже существующих сообщений
+UPDATE chats c
+SET last_message_id = m.id
+FROM (
+    SELECT DISTINCT ON (chat_id) chat_id, id
+    FROM messages
+    WHERE chat_id IS NOT NULL
+    ORDER BY chat_id, created_at DESC, id DESC
+) m
+WHERE c.id = m.chat_id;
+
+UPDATE chat_members cm
+SET last_message_at = COALESCE(m.created_at, cm.joined_at),
+    unread_count = (
+        SELECT COUNT(*) FROM messages u
+        WHERE u.chat_id = cm.chat_id AND u.sender_id != cm.user_id AND NOT u.is_read
+    ),
+    last_read_message_id = COALESCE((
+        SELECT MAX(r.id) FROM messages r
+        WHERE r.chat_id = cm.chat_id AND (r.is_read OR r.sender_id = cm.user_id)
+    ), 0)
+FROM chats c
+LEFT JOIN messages m ON m.id = c.last_message_id
+WHERE c.id = cm.chat_id;
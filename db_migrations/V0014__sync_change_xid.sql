@@ -0,0 +1,32 @@
+-- Синхронизация since: транзакция создания и последнего изменения поста
+-- (счётчики, текст) и транзакция создания заявки в друзья. Водяной знак
+-- строится по xid и не уходит дальше xmin снимка, поэтому записи,
+-- закоммиченные не в порядке номеров, не теряются. У старых строк '0'
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS created_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE posts ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE posts ALTER COLUMN created_xid SET DEFAULT pg_current_xact_id();
+
+CREATE INDEX IF NOT EXISTS idx_posts_change_xid ON posts(change_xid, id);
+
+CREATE OR REPLACE FUNCTION posts_bump_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS posts_change_xid ON posts;
+CREATE TRIGGER posts_change_xid
+    BEFORE UPDATE OF likes_count, comments_count, reposts_count, content ON posts
+    FOR EACH ROW
+    WHEN (OLD.likes_count IS DISTINCT FROM NEW.likes_count
+          OR OLD.comments_count IS DISTINCT FROM NEW.comments_count
+          OR OLD.reposts_count IS DISTINCT FROM NEW.reposts_count
+          OR OLD.content IS DISTINCT FROM NEW.content)
+    EXECUTE FUNCTION posts_bump_change_xid();
+
+ALTER TABLE friends ADD COLUMN IF NOT EXISTS created_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE friends ALTER COLUMN created_xid SET DEFAULT pg_current_xact_id();
+
+CREATE INDEX IF NOT EXISTS idx_friends_pending_xid ON friends(friend_id, created_xid, id) WHERE status = 'pending';
@@ -0,0 +1,10 @@
+-- Лента сообщества постранично по (created_at, id); индекс же отдаёт
+-- (created_at, id) для слияния ленты «мои сообщества» без чтения строк
+CREATE INDEX IF NOT EXISTS idx_community_posts_feed ON community_posts(community_id, created_at DESC, id DESC);
+
+-- Список сообществ по числу участников
+CREATE INDEX IF NOT EXISTS idx_communities_members_count ON communities((COALESCE(members_count, 0)) DESC, id DESC);
+
+-- Пересчёт счётчиков, которые до этого никто не поддерживал
+UPDATE communities c
+SET members_count = (SELECT COUNT(*) FROM community_members m WHERE m.community_id = c.id);
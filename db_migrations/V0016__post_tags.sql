@@ -0,0 +1,17 @@
+-- Хэштеги и упоминания постов; ключ совпадает с порядком ленты тега
+CREATE TABLE IF NOT EXISTS post_tags (
+    tag TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    PRIMARY KEY (tag, created_at, post_id)
+);
+
+-- Счётчики тегов по 5-минутным корзинам (номер корзины = epoch / 300) для трендов
+CREATE TABLE IF NOT EXISTS tag_buckets (
+    tag TEXT NOT NULL,
+    bucket BIGINT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tag, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tag_buckets_bucket ON tag_buckets(bucket);